@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:14
+
+import assessments.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0002_examsession_score_section_a_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examsession',
+            name='seed',
+            field=models.PositiveIntegerField(default=assessments.models.new_session_seed),
+        ),
+    ]
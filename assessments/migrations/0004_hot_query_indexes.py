@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0003_examsession_seed'),
+        ('exams', '0012_exam_candidate_forms'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(condition=models.Q(('end_time__isnull', False), ('is_graded', False)), fields=['end_time'], name='assess_session_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(fields=['end_time'], name='assess_session_end_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(fields=['user', 'exam', 'end_time'], name='assess_session_user_exam_idx'),
+        ),
+    ]
@@ -1,14 +1,23 @@
 # assessments/models.py
+import secrets
+
 from django.db import models
 from django.conf import settings
 from exams.models import Exam, Question, Option
 
+def new_session_seed():
+    return secrets.randbelow(2 ** 31)
+
+
 class ExamSession(models.Model):
     """Tracks a candidate's specific attempt with CPT sectional weighting."""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE)
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True)
+
+    # Question draw, order and option order are derived from this seed on demand
+    seed = models.PositiveIntegerField(default=new_session_seed)
     
     # --- CPT SECTIONAL BREAKDOWN ---
     # Raw percentages per section (0.00 to 100.00)
@@ -21,6 +30,20 @@ class ExamSession(models.Model):
     passed = models.BooleanField(null=True)
     is_graded = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Grading queue: submitted but not graded (small partial index)
+            models.Index(
+                fields=['end_time'],
+                condition=models.Q(end_time__isnull=False, is_graded=False),
+                name='assess_session_pending_idx'
+            ),
+            # Graded history / exports ordered by end_time: walked newest first, stops at the page size
+            models.Index(fields=['end_time'], name='assess_session_end_time_idx'),
+            # Active session lookup on start
+            models.Index(fields=['user', 'exam', 'end_time'], name='assess_session_user_exam_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.exam.title} ({self.score}%)"
 
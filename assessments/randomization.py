@@ -0,0 +1,145 @@
+"""
+Seeded per-candidate exam forms.
+
+Nothing about a candidate's form is stored except `ExamSession.seed`: the
+questions drawn from each section pool, their order and the order of MCQ
+options are recomputed from the seed (and session id) whenever they are
+needed. The exam's questions and options are read once into a cached
+"paper" that doubles as the answer key, so rendering and scoring a session
+do not load questions or options at all. The cache key carries a version
+read from the database (counts, id sums and latest `updated_at` of the exam's
+questions and options), so an edit made through any process changes the key
+everywhere, whatever the cache backend.
+
+Forms are stable as long as the exam's questions don't change; assembled
+instances (exams.assembly) lock their questions for that reason.
+"""
+import hashlib
+import random
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+
+from exams.models import Question, Option
+
+PAPER_TIMEOUT = 60 * 60
+
+# Questions without a recognised section label are shown last
+SECTION_ORDER = ['Section A', 'Section B', 'Section C']
+
+
+def load_paper(exam_id):
+    questions = list(Question.objects.filter(exam_id=exam_id).order_by('id').values(
+        'id', 'section', 'text', 'question_type', 'points', 'difficulty',
+        'source_text', 'translation_brief',
+    ))
+    options = {}
+    for option_id, question_id, text, is_correct in Option.objects.filter(
+        question__exam_id=exam_id
+    ).order_by('id').values_list('id', 'question_id', 'text', 'is_correct'):
+        options.setdefault(question_id, []).append({"id": option_id, "text": text, "is_correct": is_correct})
+    for q in questions:
+        q['options'] = options.get(q['id'], [])
+    return questions
+
+
+def paper_version(exam_id):
+    """Changes whenever a question or option of the exam is added, removed, moved or edited."""
+    state = [
+        model.objects.filter(**{lookup: exam_id}).aggregate(n=Count('id'), ids=Sum('id'), changed=Max('updated_at'))
+        for model, lookup in ((Question, 'exam_id'), (Option, 'question__exam_id'))
+    ]
+    return hashlib.sha1(repr(state).encode('utf-8')).hexdigest()[:16]
+
+
+def exam_paper(exam_id):
+    """The exam's questions with options (answer key included), cached per paper version."""
+    key = f"exam_paper:{exam_id}:{paper_version(exam_id)}"
+    paper = cache.get(key)
+    if paper is None:
+        paper = load_paper(exam_id)
+        cache.set(key, paper, PAPER_TIMEOUT)
+    return paper
+
+
+def section_rank(section):
+    try:
+        return SECTION_ORDER.index(section), ''
+    except ValueError:
+        return len(SECTION_ORDER), section or ''
+
+
+def session_form(session, paper=None):
+    """
+    The candidate's questions in display order; each carries its options in
+    display order. Pure function of the seed, the session id and the paper.
+    """
+    exam = session.exam
+    if paper is None:
+        paper = exam_paper(exam.id)
+    rng = random.Random(f"{session.seed}:{session.pk}")
+
+    pools = {}
+    for q in paper:
+        pools.setdefault(q['section'], []).append(q)
+
+    form = []
+    for section in sorted(pools, key=section_rank):
+        pool = pools[section]
+        if exam.randomize_questions or exam.questions_per_section:
+            pool = pool[:]
+            rng.shuffle(pool)
+        if exam.questions_per_section:
+            pool = pool[:exam.questions_per_section]
+            if not exam.randomize_questions:
+                pool.sort(key=lambda q: q['id'])
+
+        for q in pool:
+            options = q['options']
+            if exam.shuffle_options and q['question_type'] == Question.QuestionType.MCQ:
+                options = options[:]
+                rng.shuffle(options)
+            form.append(dict(q, options=options))
+    return form
+
+
+def candidate_view(form):
+    """Strips the answer key from a form for the exam client."""
+    return [
+        {
+            "id": q['id'],
+            "section": q['section'],
+            "question_text": q['text'],
+            "question_type": q['question_type'],
+            "points": q['points'],
+            "source_text": q['source_text'],
+            "translation_brief": q['translation_brief'],
+            "options": [{"id": opt['id'], "index": i, "text": opt['text']} for i, opt in enumerate(q['options'])],
+        }
+        for q in form
+    ]
+
+
+def resolve_option(question, ans):
+    """
+    Maps a submitted MCQ answer to one of the question's options. Accepts an
+    option id (`answer` / `selected_option_id`) or the displayed position
+    (`option_index`); ids from other questions are ignored.
+    """
+    options = question['options']
+    if ans.get('option_index') not in (None, ''):
+        try:
+            index = int(ans['option_index'])
+        except (TypeError, ValueError):
+            return None
+        return options[index] if 0 <= index < len(options) else None
+
+    raw = ans.get('answer') or ans.get('selected_option_id')
+    try:
+        option_id = int(raw)
+    except (TypeError, ValueError):
+        return None
+    for opt in options:
+        if opt['id'] == option_id:
+            return opt
+    return None
@@ -1,3 +1,54 @@
+from unittest import mock
+
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from exams.models import Exam, Option, Question
+from .randomization import exam_paper
+
+
+class ExamPaperCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.exam = Exam.objects.create(title='Translation I', duration_minutes=60)
+        self.question = Question.objects.create(exam=self.exam, section='Section A', text='2 + 2?', question_type='MCQ')
+        self.right = Option.objects.create(question=self.question, text='4', is_correct=False)
+        self.wrong = Option.objects.create(question=self.question, text='5', is_correct=True)
+
+    def answer_key(self):
+        return {opt['text']: opt['is_correct'] for opt in exam_paper(self.exam.id)[0]['options']}
+
+    def test_paper_is_cached(self):
+        exam_paper(self.exam.id)
+        with mock.patch('assessments.randomization.load_paper') as load_paper:
+            exam_paper(self.exam.id)
+        load_paper.assert_not_called()
+
+    def test_answer_key_fix_is_seen_without_a_shared_cache(self):
+        self.assertEqual(self.answer_key(), {'4': False, '5': True})
+
+        # Nothing invalidates the cache: the edit is seen through the paper version alone,
+        # as it would be in a worker whose cache the saving process never touched
+        self.right.is_correct = True
+        self.right.save()
+        self.wrong.is_correct = False
+        self.wrong.save()
+
+        self.assertEqual(self.answer_key(), {'4': True, '5': False})
+
+    def test_new_and_deleted_options_change_the_paper(self):
+        exam_paper(self.exam.id)
+        extra = Option.objects.create(question=self.question, text='22', is_correct=False)
+        self.assertEqual(len(exam_paper(self.exam.id)[0]['options']), 3)
+        extra.delete()
+        self.assertEqual(len(exam_paper(self.exam.id)[0]['options']), 2)
+
+    def test_sync_import_changes_the_paper(self):
+        from exams.importers import plan_question_import
+
+        exam_paper(self.exam.id)
+        plan_question_import([(2, {
+            'exam_id': str(self.exam.id), 'section': 'Section A', 'question_text': '2 + 2?',
+            'options': '4|5', 'correct_answer': '4',
+        })]).apply()
+        self.assertEqual(self.answer_key(), {'4': True, '5': False})
@@ -1,4 +1,3 @@
-import random
 from decimal import Decimal
 import json
 import logging
@@ -23,10 +22,11 @@ from reportlab.lib import colors
 
 # --- Models ---
 from .models import ExamSession, StudentAnswer
+from .randomization import resolve_option, session_form
 from exams.models import Exam, Question, Option
-from payments.models import Payment 
+from payments.entitlements import can_sit
 from certificates.models import Certificate
-from cores.models import AuditLog
+from cores.audit import record as record_audit
 
 # --- Serializers ---
 from .serializers import (
@@ -102,9 +102,12 @@ class SubmitGradeView(views.APIView):
         sectional_results = {}
 
         for sec in sections:
-            # Get all questions in this specific CPT section
-            q_in_sec = exam.questions.filter(section=sec)
-            total_possible = q_in_sec.aggregate(total=Sum('points'))['total'] or Decimal('0.00')
+            # Points available in this CPT section of the candidate's form
+            total_possible = StudentAnswer.objects.filter(
+                session=session,
+                question__section=sec
+            ).aggregate(total=Sum('question__points'))['total'] or Decimal('0.00')
+            total_possible = Decimal(str(total_possible))
             
             # Get marks awarded to the student in this section
             total_earned = StudentAnswer.objects.filter(
@@ -145,8 +148,8 @@ class SubmitGradeView(views.APIView):
             Certificate.objects.get_or_create(session=session)
 
         # Audit Log
-        AuditLog.objects.create(
-            actor=request.user,
+        record_audit(
+            request,
             action='GRADE',
             target_model='ExamSession',
             target_object_id=str(session.id),
@@ -171,28 +174,22 @@ class SubmitGradeView(views.APIView):
 class StartExamView(views.APIView):
     """
     Starts an exam session. 
-    Implements Randomization: Shuffles questions and creates placeholder answers.
+    Randomization: the session's seed determines the questions drawn from each
+    section pool, their order and the MCQ option order (see assessments.randomization).
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, exam_id):
         exam = get_object_or_404(Exam, id=exam_id)
         
-        # 1. Payment Check
-        if exam.price > 0:
-            has_paid = Payment.objects.filter(
-                user=request.user, 
-                exam=exam, 
-                status='success'
-            ).exists()
-
-            if not has_paid:
-                 return Response(
-                     {"error": "Payment Required", "detail": "You must pay for this exam before starting."}, 
-                     status=status.HTTP_402_PAYMENT_REQUIRED
-                 )
-
-        # 2. Create Session
+        # 1. Payment Check (cached per student, see payments.entitlements)
+        if not can_sit(request.user, exam):
+            return Response(
+                {"error": "Payment Required", "detail": "You must pay for this exam before starting."},
+                status=status.HTTP_402_PAYMENT_REQUIRED
+            )
+
+        # 2. Create Session (the form itself is derived from session.seed, nothing else is stored)
         session, created = ExamSession.objects.get_or_create(
             user=request.user, 
             exam=exam, 
@@ -200,17 +197,6 @@ class StartExamView(views.APIView):
             defaults={'start_time': timezone.now()}
         )
 
-        # 3. RANDOMIZATION LOGIC
-        if not session.answers.exists():
-            questions = list(exam.questions.all())
-            
-            if getattr(exam, 'randomize_questions', False):
-                random.shuffle(questions)
-            
-            StudentAnswer.objects.bulk_create([
-                StudentAnswer(session=session, question=q) for q in questions
-            ])
-
         serializer = ExamSessionStartSerializer(session)
         return Response(serializer.data)
 
@@ -219,7 +205,7 @@ class SubmitExamView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, session_id):
-        session = get_object_or_404(ExamSession, id=session_id, user=request.user)
+        session = get_object_or_404(ExamSession.objects.select_related('exam'), id=session_id, user=request.user)
         
         if session.end_time:
             return Response({"error": "Exam already submitted"}, status=status.HTTP_400_BAD_REQUEST)
@@ -238,48 +224,50 @@ class SubmitExamView(views.APIView):
         if not isinstance(answers_data, list):
             return Response({"error": "Invalid format. Expected a list of answers."}, status=400)
 
-        has_manual_questions = False
-        
+        # The candidate's form doubles as the answer key (cached, no per-answer queries)
+        form = {q['id']: q for q in session_form(session)}
+        submitted = {}
         for ans in answers_data:
             if not isinstance(ans, dict): continue
-
-            q_id = ans.get('question_id')
-            if not q_id: continue
-
-            student_answer, created = StudentAnswer.objects.get_or_create(
-                session=session,
-                question_id=q_id
-            )
-            
-            question = student_answer.question 
-
-            if question.question_type == Question.QuestionType.MCQ:
-                selected_opt_id = ans.get('answer') or ans.get('selected_option_id')
-                if selected_opt_id:
-                    try:
-                        option = Option.objects.get(id=int(selected_opt_id))
-                        student_answer.selected_option = option
-                        if option.is_correct:
-                            student_answer.awarded_marks = question.points
-                        else:
-                            student_answer.awarded_marks = 0
-                        student_answer.save()
-                    except (Option.DoesNotExist, ValueError, TypeError):
-                        pass 
-            
+            try:
+                q_id = int(ans.get('question_id'))
+            except (TypeError, ValueError):
+                continue
+            if q_id in form:
+                submitted[q_id] = ans
+
+        existing = {a.question_id: a for a in StudentAnswer.objects.filter(session=session)}
+        to_create, to_update = [], []
+        has_manual_questions = False
+        total_earned = Decimal('0.00')
+        total_possible = Decimal('0.00')
+
+        # Every drawn question gets an answer row, answered or not
+        for q_id, question in form.items():
+            ans = submitted.get(q_id, {})
+            student_answer = existing.get(q_id) or StudentAnswer(session=session, question_id=q_id)
+            points = Decimal(str(question['points']))
+            total_possible += points
+
+            if question['question_type'] == Question.QuestionType.MCQ:
+                option = resolve_option(question, ans)
+                student_answer.selected_option_id = option['id'] if option else None
+                student_answer.awarded_marks = points if option and option['is_correct'] else 0
             else:
                 has_manual_questions = True
                 student_answer.awarded_marks = 0 
                 student_answer.text_answer = ans.get('text_answer', '')
-                student_answer.save()
+            total_earned += Decimal(str(student_answer.awarded_marks))
+
+            (to_update if student_answer.pk else to_create).append(student_answer)
+
+        StudentAnswer.objects.bulk_create(to_create)
+        StudentAnswer.objects.bulk_update(to_update, ['selected_option', 'text_answer', 'awarded_marks'])
 
         session.end_time = timezone.now()
         
-        total_earned = StudentAnswer.objects.filter(session=session).aggregate(sum=Sum('awarded_marks'))['sum'] or 0
-        total_possible = session.exam.questions.aggregate(sum=Sum('points'))['sum'] or 0
-        
         if total_possible > 0:
-            session.score = (total_earned / total_possible) * 100
+            session.score = (total_earned / total_possible * 100).quantize(Decimal('0.01'))
         else:
             session.score = 0
             
@@ -497,8 +485,8 @@ class ResetSessionView(views.APIView):
         session = get_object_or_404(ExamSession, id=session_id)
         
         # Log the action before deleting
-        AuditLog.objects.create(
-            actor=request.user,
+        record_audit(
+            request,
             action='DELETE',
             target_model='ExamSession',
             details=f"Reset attempt for user {session.user.email} on exam {session.exam.title}"
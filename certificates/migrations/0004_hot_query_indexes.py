@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:20
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assessments', '0004_hot_query_indexes'),
+        ('certificates', '0003_certificate_is_revoked_certificate_revocation_reason_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='certificate',
+            index=models.Index(django.db.models.functions.text.Upper('certificate_code'), name='cert_code_upper_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 import uuid
 
 class Certificate(models.Model):
@@ -17,6 +18,12 @@ class Certificate(models.Model):
     revocation_reason = models.TextField(blank=True, null=True)
     revoked_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Case-insensitive verification lookups (see VerifyCertificateView)
+            models.Index(Upper('certificate_code'), name='cert_code_upper_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.certificate_code:
             self.certificate_code = f"CERT-{uuid.uuid4().hex[:8].upper()}"
@@ -16,6 +16,7 @@ from reportlab.lib.pagesizes import landscape, A4
 from reportlab.lib.units import inch
 from reportlab.lib.utils import ImageReader 
 from django.utils import timezone
+from django.db.models.functions import Upper
 
 # Models
 from .models import Certificate
@@ -164,7 +165,8 @@ class VerifyCertificateView(views.APIView):
 
     def get(self, request, code):
         try:
-            cert = Certificate.objects.get(certificate_code__iexact=code)
+            # Matches the Upper(certificate_code) index; iexact would scan the table
+            cert = Certificate.objects.alias(code_upper=Upper('certificate_code')).get(code_upper=code.upper())
         except Certificate.DoesNotExist:
             return response.Response({"is_valid": False, "status": "not_found"}, status=404)
         
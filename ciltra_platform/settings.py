@@ -14,6 +14,8 @@ from pathlib import Path
 from datetime import timedelta  # <--- 1. ADD THIS IMPORT AT THE TOP
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -60,6 +62,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cores.middleware.RestoreMaintenanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -93,12 +96,59 @@ WSGI_APPLICATION = 'ciltra_platform.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_MODE selects the database setup:
+#   sqlite      - plain SQLite file (default, development)
+#   sqlite-wal  - SQLite tuned for concurrent requests: WAL journal, synchronous=NORMAL,
+#                 a busy timeout and IMMEDIATE write transactions (no lock-upgrade deadlocks)
+#   postgres    - PostgreSQL with persistent, health-checked connections (POSTGRES_* env vars);
+#                 DB_POOL=true uses psycopg's connection pool instead
+#                 (pip install -r requirements-postgres.txt for psycopg and its pool)
+DB_MODE = os.environ.get('DB_MODE', 'sqlite')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3')
+
+if DB_MODE == 'postgres':
+    DB_POOL = os.environ.get('DB_POOL', 'false').lower() == 'true'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'ciltra'),
+            'USER': os.environ.get('POSTGRES_USER', 'ciltra'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Persistent connections can't be combined with the pool
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'pool': True} if DB_POOL else {},
+        }
     }
-}
+elif DB_MODE == 'sqlite-wal':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+            'OPTIONS': {
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', '20')),  # seconds
+                'transaction_mode': 'IMMEDIATE',
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA temp_store=MEMORY;'
+                    'PRAGMA mmap_size=134217728;'
+                ),
+            },
+        }
+    }
+elif DB_MODE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+        }
+    }
+else:
+    # A typo must not quietly fall back to a local SQLite file
+    raise ImproperlyConfigured(f"Unknown DB_MODE '{DB_MODE}' (expected sqlite, sqlite-wal or postgres)")
 
 
 REST_FRAMEWORK = {
@@ -203,11 +253,74 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# --- BACKGROUND JOBS ---
+# Files produced/consumed by `python manage.py run_jobs` (exports, uploads)
+JOBS_DIR = os.path.join(MEDIA_ROOT, 'jobs')
+
+# --- AUDIT LOG ---
+# Entries are queued in-process and written in batches (cores.audit);
+# set AUDIT_LOG_ASYNC=false to write each entry inside the request instead.
+AUDIT_LOG_ASYNC = os.environ.get('AUDIT_LOG_ASYNC', 'true').lower() == 'true'
+AUDIT_LOG_BATCH_SIZE = 100
+AUDIT_LOG_FLUSH_INTERVAL = 2.0  # seconds
+AUDIT_LOG_QUEUE_SIZE = 10000
+# Proxies whose X-Forwarded-For is believed (addresses or CIDRs, comma-separated);
+# the default is Nginx on the same host
+TRUSTED_PROXIES = [p.strip() for p in os.environ.get('TRUSTED_PROXIES', '127.0.0.1,::1').split(',') if p.strip()]
+# `python manage.py archive_audit_logs` moves older entries out of the live table
+AUDIT_LOG_RETENTION_DAYS = 180
+AUDIT_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archives', 'audit_logs')
+
+# --- BACKUPS ---
+# Snapshots are taken with SQLite's online backup API (scripts/backup_local.py):
+# BACKUP_STEP_PAGES pages are copied per step, releasing the database lock for
+# BACKUP_STEP_SLEEP seconds in between so requests keep writing.
+BACKUP_DIR = os.path.join(BASE_DIR, 'backups')
+BACKUP_STEP_PAGES = 1024
+BACKUP_STEP_SLEEP = 0.005  # seconds
+BACKUP_COMPRESSLEVEL = 6  # gzip level, 1 (fast) - 9 (small)
+# URL prefix of an nginx `internal` location aliased to BACKUP_DIR; when set, backup
+# downloads are handed to nginx with X-Accel-Redirect instead of streamed by Django
+BACKUP_ACCEL_REDIRECT = os.environ.get('BACKUP_ACCEL_REDIRECT', '')
+# Incremental snapshots (scripts/backup_store.py) keep each distinct chunk once;
+# `python manage.py prune_backups` keeps the newest BACKUP_SNAPSHOT_KEEP_LAST
+# snapshots plus any younger than BACKUP_SNAPSHOT_KEEP_DAYS, then drops unused chunks.
+BACKUP_CHUNK_SIZE = 256 * 1024  # bytes, a multiple of the SQLite page size
+BACKUP_SNAPSHOT_KEEP_LAST = 48
+BACKUP_SNAPSHOT_KEEP_DAYS = 7
+# `python manage.py backup_scheduler` snapshots every BACKUP_SCHEDULE_MINUTES when the
+# database changed, keeps the newest scheduled backup per hour/day/week/month for the
+# counts below, and deletes the oldest ones while backups use more than BACKUP_DISK_BUDGET_MB
+BACKUP_SCHEDULE_MINUTES = 15
+BACKUP_KEEP_HOURLY = 24
+BACKUP_KEEP_DAILY = 7
+BACKUP_KEEP_WEEKLY = 4
+BACKUP_KEEP_MONTHLY = 6
+BACKUP_DISK_BUDGET_MB = int(os.environ.get('BACKUP_DISK_BUDGET_MB', '0'))  # 0 = no limit
+# While `restore_db` swaps the database file it holds this flag; requests get a
+# 503 meanwhile (cores.middleware). Requests and jobs hold RESTORE_LOCK_FILE shared
+# while they run; the swap waits up to RESTORE_DRAIN_SECONDS for them to finish and
+# is called off otherwise. A flag older than RESTORE_FLAG_MAX_AGE is treated as stale.
+RESTORE_FLAG_FILE = os.path.join(BASE_DIR, '.restore_in_progress')
+RESTORE_LOCK_FILE = os.path.join(BASE_DIR, '.restore.lock')
+RESTORE_DRAIN_SECONDS = 30.0
+RESTORE_FLAG_MAX_AGE = 10 * 60  # seconds
+
 # --- PAYSTACK CONFIGURATION ---
 # The Backend needs the SECRET key to verify payments
 # Replace 'sk_test_...' with your actual Secret Key from Paystack Dashboard
 PAYSTACK_SECRET_KEY = "sk_test_f4bc777ea48e3fe932aecea60f0ebd8db0e7cd3c" 
 PAYSTACK_PUBLIC_KEY = "pk_test_ffd91b2e7cc6c88a030f82fa5e7407892ec5ae3b"
+# payments.paystack: one pooled session per process; (connect, read) timeout in seconds.
+# Successful verifications are cached per reference for PAYSTACK_VERIFY_CACHE_TTL,
+# failed/unknown references for PAYSTACK_RETRY_TTL (the student may still pay).
+PAYSTACK_BASE_URL = os.environ.get('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+PAYSTACK_TIMEOUT = (3.05, 10)
+PAYSTACK_POOL_SIZE = 10
+PAYSTACK_VERIFY_CACHE_TTL = 24 * 60 * 60
+PAYSTACK_RETRY_TTL = 30
+# `reconcile_payments` (cron) compares this many days of Paystack transactions with local records
+PAYSTACK_RECONCILE_DAYS = 3
 
 
 
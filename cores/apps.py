@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cores'
+
+    def ready(self):
+        # Let every app register its background job handlers (<app>/jobs.py)
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('jobs')
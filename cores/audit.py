@@ -0,0 +1,186 @@
+"""
+Audit log sink.
+
+`record()` builds an AuditLog row (with the client IP) and hands it to an
+in-process queue; a daemon thread writes queued rows with bulk_create every
+AUDIT_LOG_FLUSH_INTERVAL seconds or as soon as AUDIT_LOG_BATCH_SIZE rows are
+waiting. Whatever is still queued is flushed at interpreter exit.
+
+The queue is bounded: when it is full, or when AUDIT_LOG_ASYNC is off, the
+row is written synchronously instead. A batch the database refuses is
+retried row by row, so one bad row doesn't lose the others; rows that still
+fail are kept for the next flush, and after WRITE_ATTEMPTS failures they
+are written to the error log rather than kept forever.
+
+The client IP is REMOTE_ADDR unless that is one of TRUSTED_PROXIES; only
+then is X-Forwarded-For read, from the right, skipping the trusted proxies,
+since anything left of them is whatever the client chose to send.
+"""
+import atexit
+import ipaddress
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+WRITE_ATTEMPTS = 3
+
+
+def _parse_ip(value):
+    try:
+        return ipaddress.ip_address((value or '').strip())
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=8)
+def _networks(proxies):
+    return tuple(ipaddress.ip_network(p, strict=False) for p in proxies)
+
+
+def _trusted(ip):
+    return any(ip in network for network in _networks(tuple(getattr(settings, 'TRUSTED_PROXIES', ()))))
+
+
+def client_ip(request):
+    """
+    REMOTE_ADDR, or, when that is a trusted proxy (Nginx), the right-most
+    X-Forwarded-For address that isn't one.
+    """
+    if request is None:
+        return None
+    ip = _parse_ip(request.META.get('REMOTE_ADDR'))
+    if ip is None or not _trusted(ip):
+        return str(ip) if ip is not None else None
+    for hop in reversed(request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')):
+        hop = _parse_ip(hop)
+        if hop is None:
+            # Garbage from the client: the last proxy is all we can vouch for
+            break
+        ip = hop
+        if not _trusted(hop):
+            break
+    return str(ip)
+
+
+class AuditSink:
+    def __init__(self, batch_size=100, flush_interval=2.0, max_queue=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        # Rows that failed to write, retried on the next flush
+        self.retry = deque()
+        self.wakeup = threading.Event()
+        # Held while writing so a shutdown flush waits for the batch in flight
+        self.write_lock = threading.Lock()
+        self.start_lock = threading.Lock()
+        self.thread = None
+        self.pid = None
+
+    def ensure_worker(self):
+        # Started lazily, and again in a forked worker process (gunicorn)
+        if self.thread is not None and self.thread.is_alive() and self.pid == os.getpid():
+            return
+        with self.start_lock:
+            if self.thread is None or not self.thread.is_alive() or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.thread = threading.Thread(target=self.run, name='audit-log-writer', daemon=True)
+                self.thread.start()
+
+    def put(self, entry):
+        try:
+            self.ensure_worker()
+            self.queue.put_nowait(entry)
+        except (queue.Full, RuntimeError):
+            self.write([entry])
+            return
+        if self.queue.qsize() >= self.batch_size:
+            self.wakeup.set()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+            connection.close()
+
+    def write(self, entries):
+        try:
+            AuditLog.objects.bulk_create(entries, batch_size=self.batch_size)
+            return
+        except Exception:
+            logger.exception("Failed to write %d audit log entries; retrying one by one", len(entries))
+        for entry in entries:
+            try:
+                entry.save(force_insert=True)
+            except Exception:
+                self.write_failed(entry)
+
+    def write_failed(self, entry):
+        entry._write_attempts = getattr(entry, '_write_attempts', 0) + 1
+        if entry._write_attempts < WRITE_ATTEMPTS:
+            self.retry.append(entry)
+            self.ensure_worker()
+            return
+        logger.error(
+            "Audit log entry not written after %d attempts: actor=%s action=%s target=%s:%s ip=%s details=%r",
+            entry._write_attempts, entry.actor_id, entry.action, entry.target_model,
+            entry.target_object_id, entry.ip_address, entry.details,
+        )
+
+    def flush(self):
+        """Writes everything queued so far, and retries rows that failed before."""
+        with self.write_lock:
+            # Only the rows failed so far: a row failing again waits for the next flush
+            retry = [self.retry.popleft() for _ in range(len(self.retry))]
+            for start in range(0, len(retry), self.batch_size):
+                self.write(retry[start:start + self.batch_size])
+            while True:
+                batch = []
+                while len(batch) < self.batch_size:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not batch:
+                    return
+                self.write(batch)
+
+
+sink = AuditSink(
+    batch_size=getattr(settings, 'AUDIT_LOG_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'AUDIT_LOG_FLUSH_INTERVAL', 2.0),
+    max_queue=getattr(settings, 'AUDIT_LOG_QUEUE_SIZE', 10000),
+)
+atexit.register(sink.flush)
+
+
+def record(request, action, target_model, target_object_id=None, details='', actor=None):
+    """
+    Logs an admin action. The actor defaults to request.user; the entry is
+    timestamped now even though it may be written a moment later.
+    """
+    if actor is None and request is not None and request.user.is_authenticated:
+        actor = request.user
+    entry = AuditLog(
+        actor=actor,
+        action=action,
+        target_model=target_model,
+        target_object_id=str(target_object_id) if target_object_id is not None else None,
+        details=details,
+        ip_address=client_ip(request),
+    )
+    if getattr(settings, 'AUDIT_LOG_ASYNC', True):
+        sink.put(entry)
+    else:
+        sink.write([entry])
+    return entry
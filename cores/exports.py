@@ -0,0 +1,270 @@
+"""
+Streaming CSV exports.
+
+Every exporter describes its columns once (header -> ORM path or callable)
+and the base class takes care of column selection, query-string filters and
+streaming the rows through ``StreamingHttpResponse``. Rows are pulled with
+``values_list(...).iterator(chunk_size=...)`` so memory stays flat no matter
+how many rows the table holds.
+"""
+import csv
+from datetime import datetime, time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from assessments.models import ExamSession
+from .maintenance import streams_from_database
+from .models import AuditLog
+
+User = get_user_model()
+
+
+class Echo:
+    """File-like object whose ``write`` hands the value straight back."""
+
+    def write(self, value):
+        return value
+
+
+class ExportError(ValueError):
+    pass
+
+
+class CSVExporter:
+    """
+    Base class for streaming exports.
+
+    Subclasses set ``columns`` (an ordered mapping of CSV header to the ORM
+    path read with ``values_list``), ``default_columns`` and ``filters``
+    (query param -> ORM lookup). Columns whose path is a callable receive the
+    full row dict and can derive a value without another query.
+    """
+    name = None
+    columns = {}
+    default_columns = None
+    filters = {}
+    ordering = ('pk',)
+    chunk_size = 2000
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def get_queryset(self):
+        raise NotImplementedError
+
+    # --- Column selection ---
+    def selected_columns(self):
+        raw = self.params.get('columns')
+        if not raw:
+            return list(self.default_columns or self.columns)
+        selected = [c.strip() for c in raw.split(',') if c.strip()]
+        unknown = [c for c in selected if c not in self.columns]
+        if unknown:
+            raise ExportError(f"Unknown column(s): {', '.join(unknown)}")
+        return selected
+
+    # --- Filtering ---
+    def parse_filter_value(self, lookup, value):
+        if value.lower() in ('true', 'false'):
+            return value.lower() == 'true'
+        if lookup.endswith(('__gte', '__lte', '__gt', '__lt')):
+            # Dates first: parse_datetime would also read a bare date, as midnight
+            day = parse_date(value)
+            if day is not None:
+                # A bare date covers the whole day: `date_to=2026-03-01` includes that day
+                end_of_day = lookup.endswith(('__lte', '__gt'))
+                parsed = datetime.combine(day, time.max if end_of_day else time.min)
+            else:
+                parsed = parse_datetime(value)
+                if parsed is None:
+                    raise ExportError(f"Invalid date: {value}")
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            return parsed
+        if lookup.endswith('__in'):
+            return [v for v in value.split(',') if v]
+        if lookup.endswith('_id'):
+            try:
+                return int(value)
+            except ValueError:
+                raise ExportError(f"Invalid id: {value}")
+        return value
+
+    def apply_filters(self, queryset):
+        for param, lookup in self.filters.items():
+            value = self.params.get(param)
+            if value not in (None, ''):
+                try:
+                    queryset = queryset.filter(**{lookup: self.parse_filter_value(lookup, value)})
+                except ExportError:
+                    raise
+                except (ValueError, ValidationError):
+                    raise ExportError(f"Invalid value for {param}: {value}")
+        return queryset
+
+    # --- Row production ---
+    def prepare(self):
+        """
+        (headers, ORM paths, filtered queryset). Raises ExportError for bad
+        columns or filter values, so callers can answer 400 before streaming.
+        """
+        selected = self.selected_columns()
+        paths = []
+        for header in selected:
+            source = self.columns[header]
+            for path in getattr(source, 'requires', (source,)):
+                if not callable(path) and path not in paths:
+                    paths.append(path)
+
+        queryset = self.apply_filters(self.get_queryset()).order_by(*self.ordering)
+        return selected, paths, queryset
+
+    def iter_rows(self, prepared=None):
+        selected, paths, queryset = prepared or self.prepare()
+        yield selected
+        for values in queryset.values_list(*paths).iterator(chunk_size=self.chunk_size):
+            row = dict(zip(paths, values))
+            yield [self.format_value(self.resolve(self.columns[h], row)) for h in selected]
+
+    @staticmethod
+    def resolve(source, row):
+        if callable(source):
+            return source(row)
+        return row[source]
+
+    @staticmethod
+    def format_value(value):
+        if value is None:
+            return ''
+        if isinstance(value, datetime):
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        return value
+
+    def stream(self, prepared=None):
+        writer = csv.writer(Echo())
+        for row in self.iter_rows(prepared):
+            yield writer.writerow(row)
+
+    def filename(self):
+        return f"{self.name}_{timezone.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+    def as_response(self):
+        # Columns and filters are validated before the response starts streaming
+        prepared = self.prepare()
+        response = StreamingHttpResponse(self.stream(prepared), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{self.filename()}"'
+        return streams_from_database(response)
+
+
+def derived(*requires):
+    """Marks a callable column and the ORM paths it reads from the row."""
+    def decorator(func):
+        func.requires = requires
+        return func
+    return decorator
+
+
+@derived('user__first_name', 'user__last_name')
+def _full_name(row):
+    return f"{row['user__first_name']} {row['user__last_name']}".strip()
+
+
+@derived('passed')
+def _pass_status(row):
+    if row['passed'] is None:
+        return 'Pending'
+    return 'Passed' if row['passed'] else 'Failed'
+
+
+class ExamResultsExporter(CSVExporter):
+    name = 'exam_results'
+    columns = {
+        'session_id': 'id',
+        'student_name': _full_name,
+        'email': 'user__email',
+        'exam': 'exam__title',
+        'started_at': 'start_time',
+        'submitted_at': 'end_time',
+        'score_section_a': 'score_section_a',
+        'score_section_b': 'score_section_b',
+        'score_section_c': 'score_section_c',
+        'score': 'score',
+        'status': _pass_status,
+        'is_graded': 'is_graded',
+        'certificate_code': 'certificate__certificate_code',
+    }
+    default_columns = ['student_name', 'email', 'exam', 'submitted_at', 'score', 'status', 'certificate_code']
+    filters = {
+        'exam_id': 'exam_id',
+        'user_id': 'user_id',
+        'is_graded': 'is_graded',
+        'date_from': 'end_time__gte',
+        'date_to': 'end_time__lte',
+    }
+    ordering = ('exam_id', '-score', 'id')
+
+    def get_queryset(self):
+        return ExamSession.objects.filter(end_time__isnull=False)
+
+
+class CandidateExporter(CSVExporter):
+    name = 'candidates'
+    columns = {
+        'id': 'id',
+        'email': 'email',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'phone_number': 'phone_number',
+        'is_active': 'is_active',
+        'date_joined': 'date_joined',
+        'last_login': 'last_login',
+        'exams_taken': 'exams_taken',
+    }
+    default_columns = ['id', 'email', 'first_name', 'last_name', 'is_active', 'date_joined']
+    filters = {
+        'is_active': 'is_active',
+        'joined_from': 'date_joined__gte',
+        'joined_to': 'date_joined__lte',
+    }
+
+    def get_queryset(self):
+        queryset = User.objects.filter(role='candidate')
+        if 'exams_taken' in self.selected_columns():
+            queryset = queryset.annotate(exams_taken=Count('examsession'))
+        return queryset
+
+
+class AuditLogExporter(CSVExporter):
+    name = 'audit_logs'
+    columns = {
+        'id': 'id',
+        'timestamp': 'timestamp',
+        'actor_email': 'actor__email',
+        'action': 'action',
+        'target_model': 'target_model',
+        'target_object_id': 'target_object_id',
+        'details': 'details',
+        'ip_address': 'ip_address',
+    }
+    filters = {
+        'action': 'action',
+        'actor_id': 'actor_id',
+        'target_model': 'target_model',
+        'date_from': 'timestamp__gte',
+        'date_to': 'timestamp__lte',
+    }
+    ordering = ('-timestamp', '-id')
+
+    def get_queryset(self):
+        return AuditLog.objects.all()
+
+
+EXPORTERS = {
+    exporter.name: exporter
+    for exporter in (ExamResultsExporter, CandidateExporter, AuditLogExporter)
+}
@@ -0,0 +1,147 @@
+"""
+In-project background job queue.
+
+Jobs live in the `BackgroundJob` table, so no external broker is needed.
+Apps register handlers in their own `jobs.py` module (autodiscovered when
+the `cores` app loads):
+
+    from cores.jobs import register
+
+    @register('backup')
+    def backup(job, **payload):
+        ...
+        return {"filename": name}
+
+A handler receives the job row (for `job.set_progress`) plus the payload as
+keyword arguments; whatever it returns is stored as the job result.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def register(kind):
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, user=None):
+    """Queues a job and returns it immediately; a worker runs it later."""
+    if kind not in HANDLERS:
+        raise ValueError(f"No job handler registered for '{kind}'")
+    return BackgroundJob.objects.create(
+        kind=kind,
+        payload=payload or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next(worker=None):
+    """
+    Atomically moves the oldest pending job to RUNNING and returns it.
+    The conditional UPDATE makes this safe with several worker processes.
+    """
+    worker = worker or worker_name()
+    candidates = (
+        BackgroundJob.objects.filter(status=BackgroundJob.Status.PENDING)
+        .order_by('created_at', 'id')
+        .values_list('id', flat=True)[:5]
+    )
+    for job_id in candidates:
+        claimed = BackgroundJob.objects.filter(id=job_id, status=BackgroundJob.Status.PENDING).update(
+            status=BackgroundJob.Status.RUNNING,
+            started_at=timezone.now(),
+            worker=worker,
+        )
+        if claimed:
+            return BackgroundJob.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"No job handler registered for '{job.kind}'")
+        result = handler(job, **job.payload)
+    except Exception as e:
+        logger.exception("Background job %s failed", job.pk)
+        finish(job, status=BackgroundJob.Status.FAILED, error=f"{e}\n\n{traceback.format_exc()}")
+        return False
+
+    finish(job, status=BackgroundJob.Status.SUCCESS, result=result, progress=100)
+    return True
+
+
+def finish(job, **fields):
+    """
+    Records a job's outcome. A restore replaces the whole database, job table
+    included, so a row that is gone afterwards is written back.
+    """
+    fields['finished_at'] = timezone.now()
+    close_old_connections()
+    if BackgroundJob.objects.filter(pk=job.pk, kind=job.kind, created_at=job.created_at).update(**fields):
+        return
+    for name, value in fields.items():
+        setattr(job, name, value)
+    if job.created_by_id is not None and not get_user_model().objects.filter(pk=job.created_by_id).exists():
+        job.created_by = None
+    if BackgroundJob.objects.filter(pk=job.pk).exists():
+        # The restored database used this id for another job
+        logger.warning("Job %s: id taken in the restored database, recording the outcome under a new id", job.pk)
+        job.pk = None
+    job.save(force_insert=True)
+
+
+def fail_stale_jobs(older_than_minutes):
+    """Jobs left RUNNING by a worker that died are marked as failed."""
+    cutoff = timezone.now() - timedelta(minutes=older_than_minutes)
+    return BackgroundJob.objects.filter(
+        status=BackgroundJob.Status.RUNNING, started_at__lt=cutoff
+    ).update(
+        status=BackgroundJob.Status.FAILED,
+        error="Worker stopped before the job finished.",
+        finished_at=timezone.now(),
+    )
+
+
+def job_file_path(filename):
+    """Location for files produced or consumed by jobs (exports, uploads)."""
+    os.makedirs(settings.JOBS_DIR, exist_ok=True)
+    return os.path.join(settings.JOBS_DIR, filename)
+
+
+@register('export')
+def export(job, kind, params=None):
+    from .exports import EXPORTERS
+
+    exporter = EXPORTERS[kind](params or {})
+    filename = exporter.filename()
+    path = job_file_path(f"job{job.pk}_{filename}")
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8') as fh:
+        for line in exporter.stream():
+            fh.write(line)
+            rows += 1
+            if rows % 50000 == 0:
+                job.set_progress(0, f"{rows} rows written")
+    return {"file": os.path.basename(path), "rows": max(rows - 1, 0)}
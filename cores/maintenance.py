@@ -0,0 +1,169 @@
+"""
+Maintenance window for database restores.
+
+`restore_db` writes RESTORE_FLAG_FILE for the few seconds it needs to swap
+the database file. Every web process checks for the flag on each request
+(one stat call, see cores.middleware) and answers 503 until it is gone; job
+workers stop claiming jobs meanwhile. Processes also notice when the SQLite
+file itself was replaced (its inode changed) and drop their connection, so
+the next query opens the restored database rather than the old file.
+
+The flag alone can't stop requests that were already running when it
+appeared, so every request (and every job but the restore itself) also
+holds a shared flock on RESTORE_LOCK_FILE while it uses the database.
+`restore_db` takes the lock exclusively after raising the flag: the swap
+waits until the last in-flight request is done, and a request that can't
+get the shared lock gets the 503. Without flock (Windows) the drain is a
+plain RESTORE_DRAIN_SECONDS wait.
+
+A flag older than RESTORE_FLAG_MAX_AGE is ignored, so a restore that was
+killed mid-way can't keep the site down.
+"""
+import json
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+
+def restore_state():
+    """The flag's contents while a restore is swapping files, else None."""
+    try:
+        stats = os.stat(settings.RESTORE_FLAG_FILE)
+    except FileNotFoundError:
+        return None
+    if time.time() - stats.st_mtime > settings.RESTORE_FLAG_MAX_AGE:
+        return None
+    try:
+        with open(settings.RESTORE_FLAG_FILE) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+class DrainTimeout(Exception):
+    """Requests were still using the database when the drain ran out."""
+
+
+class DatabaseHold:
+    """A shared lock on RESTORE_LOCK_FILE; closing the descriptor releases it."""
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def release(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def hold_database():
+    """A DatabaseHold for one request or job, or None while a restore holds the lock."""
+    if fcntl is None:
+        return DatabaseHold(None)
+    fd = os.open(settings.RESTORE_LOCK_FILE, os.O_RDONLY | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return DatabaseHold(fd)
+
+
+def streams_from_database(response):
+    """
+    Marks a streaming response whose content is queried while it is sent:
+    the middleware then keeps the request's hold until the last byte. Other
+    streams (backup files) release it before streaming, so a slow download
+    doesn't hold off a restore.
+    """
+    response.holds_database = True
+    return response
+
+
+class MaintenanceWindow:
+    """
+    Holds the restore flag for the duration of a `with` block, waits up to
+    `drain` seconds for in-flight requests and jobs, and times the window.
+    """
+
+    def __init__(self, filename, drain=None):
+        self.filename = filename
+        self.drain = settings.RESTORE_DRAIN_SECONDS if drain is None else drain
+        self.lock_fd = None
+        self.downtime = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        tmp_path = settings.RESTORE_FLAG_FILE + '.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump({
+                "filename": self.filename,
+                "pid": os.getpid(),
+                "started_at": timezone.now().isoformat(),
+            }, fh)
+        os.replace(tmp_path, settings.RESTORE_FLAG_FILE)
+        try:
+            self.wait_for_requests()
+        except BaseException:
+            self.__exit__(None, None, None)
+            raise
+        return self
+
+    def wait_for_requests(self):
+        if fcntl is None:
+            time.sleep(self.drain)
+            return
+        self.lock_fd = os.open(settings.RESTORE_LOCK_FILE, os.O_RDONLY | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.drain
+        while True:
+            try:
+                fcntl.flock(self.lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    raise DrainTimeout(
+                        f"Requests or jobs were still using the database after {self.drain:g}s"
+                    )
+                time.sleep(0.05)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.lock_fd is not None:
+            os.close(self.lock_fd)
+            self.lock_fd = None
+        try:
+            os.remove(settings.RESTORE_FLAG_FILE)
+        except FileNotFoundError:
+            pass
+        self.downtime = time.perf_counter() - self.started
+        return False
+
+
+def database_identity():
+    database = settings.DATABASES['default']
+    if database['ENGINE'] != 'django.db.backends.sqlite3':
+        return None
+    try:
+        stats = os.stat(database['NAME'])
+    except (OSError, TypeError, ValueError):
+        return None
+    return stats.st_dev, stats.st_ino
+
+
+_identity = None
+
+
+def reconnect_if_swapped():
+    """Closes this process's connection if the database file was replaced since the last call."""
+    global _identity
+    current = database_identity()
+    if _identity is not None and current != _identity:
+        connections['default'].close()
+    _identity = current
@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from cores.models import AuditLog
+
+FIELDS = [AuditLog._meta.get_field(name) for name in (
+    'id', 'actor', 'action', 'target_model', 'target_object_id', 'details', 'ip_address', 'timestamp',
+)]
+ATTNAMES = [field.attname for field in FIELDS]
+
+
+def month_bounds(month_start):
+    next_month = (month_start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return month_start, next_month
+
+
+class Command(BaseCommand):
+    help = 'Moves audit log entries older than the retention period into monthly archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'AUDIT_LOG_RETENTION_DAYS', 180),
+                            help='Keep this many days of entries in the live table')
+        parser.add_argument('--format', choices=['jsonl', 'table'], default='jsonl',
+                            help='jsonl: gzip files in AUDIT_ARCHIVE_DIR; table: cores_auditlog_YYYYMM tables')
+        parser.add_argument('--dir', default=getattr(settings, 'AUDIT_ARCHIVE_DIR', None))
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        old = AuditLog.objects.filter(timestamp__lt=cutoff)
+        months = sorted(set(
+            old.annotate(month=TruncMonth('timestamp')).values_list('month', flat=True)
+        ))
+        if not months:
+            self.stdout.write("Nothing to archive")
+            return
+        if options['format'] == 'jsonl':
+            if not options['dir']:
+                raise CommandError("Set AUDIT_ARCHIVE_DIR or pass --dir")
+            os.makedirs(options['dir'], exist_ok=True)
+
+        total = 0
+        for month in months:
+            start, end = month_bounds(month)
+            rows = old.filter(timestamp__gte=start, timestamp__lt=min(end, cutoff))
+            label = start.strftime('%Y%m')
+            count = rows.count()
+            if options['dry_run']:
+                self.stdout.write(f"{label}: {count} entries would be archived")
+                continue
+            # Never delete more than what was copied, even if rows arrive meanwhile
+            max_id = rows.order_by('-id').values_list('id', flat=True).first()
+            rows = rows.filter(id__lte=max_id)
+            if options['format'] == 'jsonl':
+                target = self.archive_jsonl(rows, options['dir'], label)
+            else:
+                target = self.archive_table(rows, label)
+            total += count
+            self.stdout.write(f"{label}: archived {count} entries to {target}")
+
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Archived {total} audit log entries older than {cutoff:%Y-%m-%d}"))
+
+    def archive_jsonl(self, rows, directory, label):
+        path = os.path.join(directory, f"audit_logs_{label}.jsonl.gz")
+        # Appending adds a gzip member; readers see one continuous stream
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as fh:
+                for row in rows.order_by('id').values(*ATTNAMES).iterator(chunk_size=2000):
+                    fh.write((json.dumps(row, cls=DjangoJSONEncoder) + '\n').encode('utf-8'))
+            # On disk before the rows leave the database
+            raw.flush()
+            os.fsync(raw.fileno())
+        rows.delete()
+        return path
+
+    def archive_table(self, rows, label):
+        table = connection.ops.quote_name(f"{AuditLog._meta.db_table}_{label}")
+        source = connection.ops.quote_name(AuditLog._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in FIELDS)
+        select_sql, params = rows.values_list(*ATTNAMES).query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} AS SELECT {columns} FROM {source} WHERE 1 = 0")
+            cursor.execute(f"INSERT INTO {table} ({columns}) {select_sql}", params)
+            rows.delete()
+        return table
@@ -0,0 +1,71 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from cores.jobs import claim_next, run_job, fail_stale_jobs, worker_name
+from cores.maintenance import hold_database, reconnect_if_swapped, restore_state
+
+# Jobs that must not hold the restore lock, as they take it exclusively themselves
+EXCLUSIVE_JOBS = {'restore'}
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (backups, restores, exports, bulk uploads)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit instead of polling forever')
+        parser.add_argument('--poll', type=float, default=2.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--max-jobs', type=int, default=0, help='Exit after this many jobs (0 = no limit)')
+        parser.add_argument('--stale-minutes', type=int, default=120, help='Fail RUNNING jobs older than this on startup')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+        worker = worker_name()
+        stale = fail_stale_jobs(options['stale_minutes'])
+        if stale:
+            self.stdout.write(self.style.WARNING(f"Marked {stale} stale job(s) as failed"))
+        self.stdout.write(f"Job worker {worker} started")
+
+        processed = 0
+        while not self.stopping:
+            hold = hold_database()
+            if hold is None or restore_state() is not None:
+                # Another process is swapping the database file
+                if hold is not None:
+                    hold.release()
+                time.sleep(options['poll'])
+                continue
+            try:
+                reconnect_if_swapped()
+                close_old_connections()
+                job = claim_next(worker)
+                if job is None:
+                    hold.release()
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+
+                if job.kind in EXCLUSIVE_JOBS:
+                    hold.release()
+                self.stdout.write(f"Running {job.kind} #{job.pk}...")
+                ok = run_job(job)
+            finally:
+                hold.release()
+            style = self.style.SUCCESS if ok else self.style.ERROR
+            self.stdout.write(style(f"{job.kind} #{job.pk} {'finished' if ok else 'failed'}"))
+
+            processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(f"Job worker {worker} stopped after {processed} job(s)")
+
+    def request_stop(self, signum, frame):
+        # Finish the current job, then leave the loop
+        self.stopping = True
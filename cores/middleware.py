@@ -0,0 +1,50 @@
+from django.http import JsonResponse
+
+from .maintenance import hold_database, reconnect_if_swapped, restore_state
+
+
+class RestoreMaintenanceMiddleware:
+    """
+    Answers 503 while a database restore is swapping files, and holds the
+    shared restore lock while a request runs (see cores.maintenance), and
+    while the content of a response marked with streams_from_database is sent.
+    Listed first so sessions and everything else are saved inside the hold.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Lock before looking at the flag: a restore that raises the flag afterwards waits for us
+        hold = hold_database()
+        state = restore_state()
+        if hold is None or state is not None:
+            if hold is not None:
+                hold.release()
+            response = JsonResponse({
+                "error": "The platform is briefly unavailable while the database is restored.",
+                "restore_started_at": (state or {}).get('started_at'),
+            }, status=503)
+            response['Retry-After'] = '5'
+            return response
+
+        try:
+            reconnect_if_swapped()
+            response = self.get_response(request)
+        except BaseException:
+            hold.release()
+            raise
+        if response.streaming and getattr(response, 'holds_database', False):
+            # Streamed exports keep querying until the last row is sent
+            response.streaming_content = self.release_after(response.streaming_content, hold)
+        else:
+            hold.release()
+        return response
+
+    @staticmethod
+    def release_after(content, hold):
+        # The response closes this generator when it is closed, sent or not
+        try:
+            yield from content
+        finally:
+            hold.release()
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.core.cache import cache
 from django.conf import settings
 
@@ -69,10 +70,17 @@ class AuditLog(models.Model):
     target_object_id = models.CharField(max_length=100, blank=True, null=True)
     details = models.TextField(blank=True, help_text="Description of changes")
     ip_address = models.GenericIPAddressField(null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the (possibly batched) row is written
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['action', 'timestamp'], name='cores_audit_action_ts_idx'),
+            models.Index(fields=['target_model', 'target_object_id'], name='cores_audit_target_idx'),
+            models.Index(fields=['actor', 'timestamp'], name='cores_audit_actor_ts_idx'),
+            models.Index(fields=['timestamp'], name='cores_audit_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.actor} - {self.action} - {self.timestamp}"
@@ -84,4 +92,47 @@ class LanguagePair(models.Model):
     pair_code = models.CharField(max_length=10, unique=True, help_text="e.g. EN-FR")
 
     def __str__(self):
-        return self.pair_code
\ No newline at end of file
+        return self.pair_code
+
+class BackgroundJob(models.Model):
+    """
+    A unit of heavy admin work (backup, restore, export, bulk upload) that is
+    queued by a request and picked up by the `run_jobs` worker command.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        SUCCESS = 'success', 'Success'
+        FAILED = 'failed', 'Failed'
+
+    kind = models.CharField(max_length=50, help_text="Registered handler name, e.g. backup")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    payload = models.JSONField(default=dict, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    progress = models.PositiveSmallIntegerField(default=0, help_text="0-100")
+    progress_message = models.CharField(max_length=255, blank=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='background_jobs')
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='cores_job_status_created_idx'),
+        ]
+
+    def set_progress(self, progress, message=''):
+        """Persists progress without touching the rest of the row."""
+        self.progress = max(0, min(100, int(progress)))
+        self.progress_message = message[:255]
+        BackgroundJob.objects.filter(pk=self.pk).update(
+            progress=self.progress, progress_message=self.progress_message
+        )
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import PlatformSetting, AuditLog
+from .models import PlatformSetting, AuditLog, BackgroundJob
 
 class PlatformSettingSerializer(serializers.ModelSerializer):
     class Meta:
@@ -14,4 +14,15 @@ class AuditLogSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = AuditLog
-        fields = ['id', 'actor', 'actor_email', 'actor_role', 'action', 'target_model', 'target_object_id', 'timestamp', 'details']
\ No newline at end of file
+        fields = ['id', 'actor', 'actor_email', 'actor_role', 'action', 'target_model', 'target_object_id', 'timestamp', 'details', 'ip_address']
+
+class BackgroundJobSerializer(serializers.ModelSerializer):
+    created_by_email = serializers.CharField(source='created_by.email', read_only=True)
+
+    class Meta:
+        model = BackgroundJob
+        fields = [
+            'id', 'kind', 'status', 'progress', 'progress_message', 'result', 'error',
+            'created_by_email', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
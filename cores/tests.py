@@ -1,3 +1,378 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from assessments.models import ExamSession
+from exams.models import Exam
+from users.models import User
+from .audit import AuditSink, client_ip
+from .exports import ExamResultsExporter, ExportError
+from .jobs import HANDLERS, claim_next, enqueue, run_job
+from .maintenance import DrainTimeout, MaintenanceWindow, hold_database, streams_from_database
+from .middleware import RestoreMaintenanceMiddleware
+from .models import AuditLog, BackgroundJob
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', is_staff=True, role=User.Role.ADMIN
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        self.ada = User.objects.create_user(
+            email='ada@example.com', username='ada', password='pw', first_name='Ada', last_name='Obi'
+        )
+        self.ben = User.objects.create_user(email='ben@example.com', username='ben', password='pw', first_name='Ben')
+        self.exam = Exam.objects.create(title='Translation I', duration_minutes=60)
+        self.other_exam = Exam.objects.create(title='Translation II', duration_minutes=60)
+        self.graded = ExamSession.objects.create(
+            user=self.ada, exam=self.exam, end_time=timezone.make_aware(datetime(2026, 3, 1, 12)),
+            score=80, passed=True, is_graded=True,
+        )
+        self.pending = ExamSession.objects.create(
+            user=self.ben, exam=self.other_exam, end_time=timezone.make_aware(datetime(2026, 3, 5, 12)),
+        )
+        # Not submitted: never exported
+        ExamSession.objects.create(user=self.ben, exam=self.exam)
+
+    def export(self, kind='exam_results', **params):
+        return self.api.get(f'/api/core/exports/{kind}/', params)
+
+    def rows(self, response):
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(io.StringIO(content)))
+
+    def test_default_columns_and_rows(self):
+        rows = self.rows(self.export())
+
+        self.assertEqual(rows[0], ExamResultsExporter.default_columns)
+        self.assertEqual(rows[1], [
+            'Ada Obi', 'ada@example.com', 'Translation I', '2026-03-01 12:00:00', '80.00', 'Passed', '',
+        ])
+        self.assertEqual(rows[2][0], 'Ben')
+        self.assertEqual(rows[2][5], 'Pending')
+        self.assertEqual(len(rows), 3)
+
+    def test_column_selection(self):
+        rows = self.rows(self.export(columns='email,session_id'))
+        self.assertEqual(rows, [
+            ['email', 'session_id'],
+            ['ada@example.com', str(self.graded.id)],
+            ['ben@example.com', str(self.pending.id)],
+        ])
+
+    def test_filters(self):
+        cases = [
+            ({'exam_id': str(self.exam.id)}, ['ada@example.com']),
+            ({'is_graded': 'false'}, ['ben@example.com']),
+            ({'date_from': '2026-03-02'}, ['ben@example.com']),
+            ({'date_to': '2026-03-01T23:00:00'}, ['ada@example.com']),
+            # A bare date includes the whole day
+            ({'date_to': '2026-03-01'}, ['ada@example.com']),
+            ({'date_to': '2026-02-28'}, []),
+            ({'date_from': '2026-03-05', 'date_to': '2026-03-05'}, ['ben@example.com']),
+        ]
+        for params, emails in cases:
+            with self.subTest(params=params):
+                rows = self.rows(self.export(columns='email', **params))
+                self.assertEqual([row[0] for row in rows[1:]], emails)
+
+    def test_bad_input_is_a_400_before_streaming(self):
+        for params in ({'columns': 'email,nope'}, {'date_from': 'yesterday'}, {'date_to': '2026-02-30'},
+                       {'exam_id': 'abc'}, {'is_graded': 'maybe'}):
+            with self.subTest(params=params):
+                response = self.export(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.streaming)
+                self.assertIn('error', response.data)
+
+    def test_unknown_export(self):
+        self.assertEqual(self.export(kind='nope').status_code, 404)
+
+    def test_prepare_validates_filters(self):
+        with self.assertRaises(ExportError):
+            ExamResultsExporter({'user_id': '1.5'}).prepare()
+
+
+class AuditLogListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', is_staff=True, role=User.Role.ADMIN
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        AuditLog.objects.create(actor=self.admin, action='UPDATE', target_model='Exam')
+        AuditLog.objects.create(action='DELETE', target_model='Exam')
+
+    def test_actor_filter(self):
+        response = self.api.get('/api/core/audit-logs/', {'actor': self.admin.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['action'] for entry in response.data], ['UPDATE'])
+
+    def test_date_only_until_includes_that_day(self):
+        AuditLog.objects.update(timestamp=timezone.make_aware(datetime(2026, 3, 1, 12)))
+        for params, count in [({'until': '2026-03-01'}, 2), ({'until': '2026-02-28'}, 0),
+                              ({'since': '2026-03-01', 'until': '2026-03-01'}, 2), ({'since': '2026-03-02'}, 0)]:
+            with self.subTest(params=params):
+                response = self.api.get('/api/core/audit-logs/', params)
+                self.assertEqual(len(response.data), count)
+
+    def test_bad_filters_are_a_400(self):
+        for params in ({'actor': 'abc'}, {'since': 'yesterday'}, {'until': '2026-02-30'}):
+            with self.subTest(params=params):
+                response = self.api.get('/api/core/audit-logs/', params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', is_staff=True, role=User.Role.ADMIN
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        overrides = override_settings(JOBS_DIR=tmp.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_claim_next_takes_each_job_once_oldest_first(self):
+        first, second, third = (enqueue('export', {"kind": "exam_results"}) for _ in range(3))
+        # Already taken by another worker
+        BackgroundJob.objects.filter(pk=first.pk).update(status=BackgroundJob.Status.RUNNING)
+
+        claimed = claim_next('worker-a')
+        self.assertEqual(
+            (claimed.pk, claimed.status, claimed.worker), (second.pk, BackgroundJob.Status.RUNNING, 'worker-a')
+        )
+        self.assertIsNotNone(claimed.started_at)
+        self.assertEqual(claim_next('worker-b').pk, third.pk)
+        self.assertIsNone(claim_next('worker-c'))
+
+    def test_claim_skips_a_job_taken_in_between(self):
+        job = enqueue('export', {"kind": "exam_results"})
+        later = enqueue('export', {"kind": "exam_results"})
+        real_filter = BackgroundJob.objects.filter
+
+        def racing_filter(*args, **kwargs):
+            # Another worker claims the first candidate between the SELECT and our UPDATE
+            if kwargs.get('id') == job.pk:
+                real_filter(pk=job.pk).update(status=BackgroundJob.Status.RUNNING, worker='other')
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(BackgroundJob.objects, 'filter', side_effect=racing_filter):
+            claimed = claim_next('me')
+        self.assertEqual(claimed.pk, later.pk)
+        self.assertEqual(BackgroundJob.objects.get(pk=job.pk).worker, 'other')
+
+    def test_unknown_kind_cannot_be_queued(self):
+        with self.assertRaises(ValueError):
+            enqueue('nope')
+
+    def test_queued_export_status_and_download(self):
+        ExamSession.objects.create(
+            user=self.admin, exam=Exam.objects.create(title='Translation I', duration_minutes=60),
+            end_time=timezone.now(), score=70, passed=True, is_graded=True,
+        )
+        response = self.api.get('/api/core/exports/exam_results/', {'background': 'true', 'columns': 'email'})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['job_id']
+
+        status = self.api.get(f'/api/core/jobs/{job_id}/').data
+        self.assertEqual((status['status'], status['created_by_email']), ('pending', 'admin@example.com'))
+        self.assertEqual(self.api.get(f'/api/core/jobs/{job_id}/download/').status_code, 404)
+
+        self.assertTrue(run_job(claim_next()))
+        status = self.api.get(f'/api/core/jobs/{job_id}/').data
+        self.assertEqual((status['status'], status['progress'], status['result']['rows']), ('success', 100, 1))
+        download = self.api.get(f'/api/core/jobs/{job_id}/download/')
+        self.assertEqual(b''.join(download.streaming_content).decode().split(), ['email', 'admin@example.com'])
+
+    def test_job_list_filters(self):
+        enqueue('export', {"kind": "exam_results"})
+        BackgroundJob.objects.filter(pk=enqueue('backup').pk).update(status=BackgroundJob.Status.FAILED)
+
+        self.assertEqual(len(self.api.get('/api/core/jobs/').data), 2)
+        self.assertEqual([j['kind'] for j in self.api.get('/api/core/jobs/', {'status': 'failed'}).data], ['backup'])
+        self.assertEqual([j['kind'] for j in self.api.get('/api/core/jobs/', {'kind': 'export'}).data], ['export'])
+        self.assertEqual(self.api.get('/api/core/jobs/999/').status_code, 404)
+
+    def test_job_endpoints_are_admin_only(self):
+        job = enqueue('backup')
+        student = User.objects.create_user(email='s@example.com', username='s', password='pw')
+        self.api.force_authenticate(student)
+        self.assertEqual(self.api.get(f'/api/core/jobs/{job.pk}/').status_code, 403)
+        self.assertEqual(self.api.post('/api/admin/backups/create/').status_code, 403)
+
+    def test_backup_endpoint_queues_a_job(self):
+        response = self.api.post('/api/admin/backups/create/', {'incremental': 'true'}, format='json')
+        self.assertEqual(response.status_code, 202)
+        job = BackgroundJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual((job.kind, job.payload, job.created_by), ('backup', {"incremental": True}, self.admin))
+
+
+@override_settings(TRUSTED_PROXIES=['127.0.0.1', '10.0.0.0/8'])
+class ClientIpTests(TestCase):
+    def ip(self, remote_addr, forwarded=None):
+        extra = {'HTTP_X_FORWARDED_FOR': forwarded} if forwarded is not None else {}
+        return client_ip(RequestFactory().get('/', REMOTE_ADDR=remote_addr, **extra))
+
+    def test_forwarded_for_is_ignored_from_untrusted_clients(self):
+        self.assertEqual(self.ip('203.0.113.9', '1.2.3.4'), '203.0.113.9')
+
+    def test_right_most_untrusted_address_behind_proxies(self):
+        self.assertEqual(self.ip('127.0.0.1', '198.51.100.7'), '198.51.100.7')
+        # The client's own header is left of what the proxies appended
+        self.assertEqual(self.ip('127.0.0.1', '1.2.3.4, 198.51.100.7, 10.1.2.3'), '198.51.100.7')
+        self.assertEqual(self.ip('127.0.0.1', 'junk, 198.51.100.7'), '198.51.100.7')
+
+    def test_unusable_header_falls_back_to_the_proxy(self):
+        self.assertEqual(self.ip('127.0.0.1'), '127.0.0.1')
+        self.assertEqual(self.ip('127.0.0.1', '198.51.100.7, junk'), '127.0.0.1')
+        self.assertIsNone(self.ip('not-an-ip', '198.51.100.7'))
+
+
+@mock.patch.object(AuditSink, 'ensure_worker')
+class AuditSinkTests(TestCase):
+    def entries(self, *actions):
+        return [AuditLog(action=action, target_model='Exam') for action in actions]
+
+    def test_failed_batch_is_written_row_by_row(self, ensure_worker):
+        sink = AuditSink()
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError('locked')), \
+                self.assertLogs('cores.audit') as logs:
+            sink.write(self.entries('a', 'b'))
+        self.assertIn('retrying one by one', logs.output[0])
+        self.assertEqual(sorted(AuditLog.objects.values_list('action', flat=True)), ['a', 'b'])
+        self.assertFalse(sink.retry)
+
+    def test_failing_rows_are_retried_then_logged(self, ensure_worker):
+        sink = AuditSink()
+        good, bad = self.entries('good', 'bad')
+        real_save = AuditLog.save
+
+        def save(entry, *args, **kwargs):
+            if entry.action == 'bad':
+                raise RuntimeError('disk I/O error')
+            return real_save(entry, *args, **kwargs)
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError('locked')), \
+                mock.patch.object(AuditLog, 'save', save), self.assertLogs('cores.audit'):
+            sink.write([good, bad])
+            self.assertEqual(list(sink.retry), [bad])
+            sink.flush()
+            self.assertEqual(list(sink.retry), [bad])
+            with self.assertLogs('cores.audit', 'ERROR') as logs:
+                sink.flush()
+
+        self.assertFalse(sink.retry)
+        self.assertIn('action=bad', logs.output[-1])
+        self.assertEqual(list(AuditLog.objects.values_list('action', flat=True)), ['good'])
+
+    def test_retried_rows_are_written_once_the_database_recovers(self, ensure_worker):
+        sink = AuditSink()
+        entry, = self.entries('late')
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError('locked')), \
+                mock.patch.object(AuditLog, 'save', side_effect=RuntimeError('locked')), \
+                self.assertLogs('cores.audit'):
+            sink.write([entry])
+        sink.flush()
+        self.assertFalse(sink.retry)
+        self.assertTrue(AuditLog.objects.filter(action='late').exists())
+
+
+class RestoreWindowTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.flag = os.path.join(tmp.name, '.restore_in_progress')
+        overrides = override_settings(RESTORE_FLAG_FILE=self.flag, RESTORE_LOCK_FILE=os.path.join(tmp.name, '.lock'))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.api = APIClient()
+
+    def test_swap_waits_for_requests_in_flight(self):
+        hold = hold_database()
+        with self.assertRaises(DrainTimeout):
+            with MaintenanceWindow('b.sqlite3', drain=0.1):
+                self.fail("entered while a request held the database")
+        self.assertFalse(os.path.exists(self.flag))
+
+        hold.release()
+        with MaintenanceWindow('b.sqlite3', drain=0.1) as window:
+            self.assertIsNone(hold_database())
+        self.assertGreater(window.downtime, 0)
+        hold_database().release()
+
+    def test_requests_get_503_during_the_window(self):
+        with MaintenanceWindow('b.sqlite3', drain=0.1):
+            response = self.api.get('/api/core/audit-logs/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        # Released afterwards: the next request gets through to authentication
+        self.assertEqual(self.api.get('/api/core/audit-logs/').status_code, 401)
+
+
+    def test_only_database_streams_keep_the_hold(self):
+        responses = []
+        middleware = RestoreMaintenanceMiddleware(lambda request: responses.pop())
+        request = RequestFactory().get('/')
+
+        # A backup download reads files only: a restore may start while it is sent
+        responses.append(StreamingHttpResponse(iter([b'backup'])))
+        download = middleware(request)
+        with MaintenanceWindow('b.sqlite3', drain=0.1):
+            pass
+        self.assertEqual(b''.join(download.streaming_content), b'backup')
+
+        responses.append(streams_from_database(StreamingHttpResponse(iter([b'rows']))))
+        export = middleware(request)
+        with self.assertRaises(DrainTimeout):
+            with MaintenanceWindow('b.sqlite3', drain=0.1):
+                pass
+        self.assertEqual(b''.join(export.streaming_content), b'rows')
+        with MaintenanceWindow('b.sqlite3', drain=0.1):
+            pass
+
+class JobOutcomeTests(TestCase):
+    def test_outcome_is_written_back_when_the_row_is_gone(self):
+        def replace_database(job):
+            # What a restore looks like from the job's side: its row isn't in the new database
+            BackgroundJob.objects.filter(pk=job.pk).delete()
+            return {"restored": True}
+
+        with mock.patch.dict(HANDLERS, {'restore_like': replace_database}):
+            job = enqueue('restore_like')
+            self.assertTrue(run_job(job))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.progress), (BackgroundJob.Status.SUCCESS, {"restored": True}, 100))
+
+    def test_an_id_reused_by_the_restored_database_is_left_alone(self):
+        def replace_database(job):
+            BackgroundJob.objects.filter(pk=job.pk).delete()
+            BackgroundJob.objects.create(pk=job.pk, kind='backup')
+            raise RuntimeError('boom')
+
+        with mock.patch.dict(HANDLERS, {'restore_like': replace_database}), self.assertLogs('cores.jobs'):
+            job = enqueue('restore_like')
+            job_id = job.pk
+            self.assertFalse(run_job(job))
+
+        self.assertEqual(BackgroundJob.objects.get(pk=job_id).kind, 'backup')
+        self.assertEqual(BackgroundJob.objects.get(pk=job_id).status, BackgroundJob.Status.PENDING)
+        failed = BackgroundJob.objects.get(kind='restore_like')
+        self.assertNotEqual(failed.pk, job_id)
+        self.assertIn('boom', failed.error)
@@ -1,7 +1,18 @@
 from django.urls import path
-from .views import PlatformSettingView, AuditLogListView
+from .views import (
+    PlatformSettingView,
+    AuditLogListView,
+    StreamingExportView,
+    BackgroundJobListView,
+    BackgroundJobDetailView,
+    BackgroundJobDownloadView,
+)
 
 urlpatterns = [
     path('settings/', PlatformSettingView.as_view(), name='platform-settings'),
     path('audit-logs/', AuditLogListView.as_view(), name='audit-logs'),
+    path('exports/<str:kind>/', StreamingExportView.as_view(), name='streaming-export'),
+    path('jobs/', BackgroundJobListView.as_view(), name='background-jobs'),
+    path('jobs/<int:pk>/', BackgroundJobDetailView.as_view(), name='background-job-detail'),
+    path('jobs/<int:pk>/download/', BackgroundJobDownloadView.as_view(), name='background-job-download'),
 ]
\ No newline at end of file
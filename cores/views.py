@@ -1,9 +1,21 @@
+import os
+from datetime import datetime, time
+
+from django.http import FileResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.shortcuts import get_object_or_404
 from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser
-from .models import PlatformSetting, AuditLog
-from .serializers import PlatformSettingSerializer, AuditLogSerializer
+from .models import PlatformSetting, AuditLog, BackgroundJob
+from .serializers import PlatformSettingSerializer, AuditLogSerializer, BackgroundJobSerializer
+from .exports import EXPORTERS, ExportError
+from .jobs import enqueue, job_file_path
+from .audit import record as record_audit
 
 class PlatformSettingView(APIView):
     permission_classes = [IsAdminUser]
@@ -19,8 +31,8 @@ class PlatformSettingView(APIView):
         if serializer.is_valid():
             serializer.save()
             # Auto-Log this action
-            AuditLog.objects.create(
-                actor=request.user,
+            record_audit(
+                request,
                 action='SETTINGS',
                 target_model='PlatformSetting',
                 details='Updated platform configuration variables'
@@ -28,15 +40,133 @@ class PlatformSettingView(APIView):
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class AuditLogCursorPagination(CursorPagination):
+    """Keyset pages over (timestamp, id); cost doesn't grow with the page number."""
+    ordering = ('-timestamp', '-id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
 class AuditLogListView(generics.ListAPIView):
+    """
+    Filters: ?action=, ?actor=<user id>, ?target_model=, ?target_object_id=,
+    ?since= / ?until= (ISO date or datetime).
+    Sending ?page_size= (or following a `next` cursor) switches to keyset pages.
+    """
     # Select related avoids N+1 queries when fetching users
-    queryset = AuditLog.objects.select_related('actor').all().order_by('-timestamp')
+    queryset = AuditLog.objects.select_related('actor').all().order_by('-timestamp', '-id')
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdminUser]
-    
+    pagination_class = AuditLogCursorPagination
+
+    filter_params = {
+        'action': 'action',
+        'target_model': 'target_model',
+        'target_object_id': 'target_object_id',
+    }
+
+    def parse_actor(self, value):
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({"error": f"Invalid actor id '{value}'"})
+
+    def parse_moment(self, value, end_of_day=False):
+        try:
+            # Dates first: parse_datetime would also read a bare date, as midnight
+            day = parse_date(value)
+            moment = parse_datetime(value) if day is None else None
+        except ValueError:
+            # Well-formed but impossible, e.g. 2026-02-30
+            moment = day = None
+        if day is not None:
+            moment = datetime.combine(day, time.max if end_of_day else time.min)
+        elif moment is None:
+            raise ValidationError({"error": f"Invalid date '{value}'"})
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
     def get_queryset(self):
         queryset = super().get_queryset()
-        action = self.request.query_params.get('action')
-        if action:
-            queryset = queryset.filter(action=action)
-        return queryset
\ No newline at end of file
+        params = self.request.query_params
+        for param, lookup in self.filter_params.items():
+            value = params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: value})
+        if params.get('actor'):
+            queryset = queryset.filter(actor_id=self.parse_actor(params['actor']))
+        if params.get('since'):
+            queryset = queryset.filter(timestamp__gte=self.parse_moment(params['since']))
+        if params.get('until'):
+            queryset = queryset.filter(timestamp__lte=self.parse_moment(params['until'], end_of_day=True))
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        # Unpaginated list unless the client opts in (the dashboard expects a plain list)
+        if 'cursor' not in self.request.query_params and 'page_size' not in self.request.query_params:
+            return None
+        return super().paginate_queryset(queryset)
+
+class StreamingExportView(APIView):
+    """
+    Streams a CSV export row by row.
+    GET /api/core/exports/<kind>/?columns=a,b&<filters>
+    Add ?background=true to build the file in the job worker instead.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, kind):
+        exporter_class = EXPORTERS.get(kind)
+        if exporter_class is None:
+            return Response(
+                {"error": f"Unknown export '{kind}'.", "available": sorted(EXPORTERS)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        params = {k: v for k, v in request.query_params.items() if k != 'background'}
+        try:
+            exporter = exporter_class(params)
+            if request.query_params.get('background') == 'true':
+                exporter.prepare()
+                job = enqueue('export', {"kind": kind, "params": params}, user=request.user)
+                return Response({"status": "queued", "job_id": job.id}, status=status.HTTP_202_ACCEPTED)
+            return exporter.as_response()
+        except ExportError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class BackgroundJobListView(generics.ListAPIView):
+    queryset = BackgroundJob.objects.select_related('created_by').all()
+    serializer_class = BackgroundJobSerializer
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for param in ('kind', 'status'):
+            value = self.request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(**{param: value})
+        return queryset[:100]
+
+
+class BackgroundJobDetailView(generics.RetrieveAPIView):
+    """Status/progress polling endpoint for a queued job."""
+    queryset = BackgroundJob.objects.select_related('created_by').all()
+    serializer_class = BackgroundJobSerializer
+    permission_classes = [IsAdminUser]
+
+
+class BackgroundJobDownloadView(APIView):
+    """Downloads the file produced by a finished export job."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, pk):
+        job = get_object_or_404(BackgroundJob, pk=pk)
+        filename = (job.result or {}).get('file')
+        if job.status != BackgroundJob.Status.SUCCESS or not filename:
+            return Response({"error": "This job has no file to download."}, status=status.HTTP_404_NOT_FOUND)
+        path = job_file_path(os.path.basename(filename))
+        if not os.path.exists(path):
+            return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename.split('_', 1)[-1])
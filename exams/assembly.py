@@ -0,0 +1,266 @@
+"""
+Automatic paper assembly from a blueprint.
+
+The eligible bank (approved/locked questions outside assembled instances,
+filtered by language pair and specialization) is loaded once into memory as
+pools keyed by (section, difficulty). Each form then fills its per-section
+point targets pool by pool: the pool is shuffled with the form's seed and
+walked largest-points-first, taking every question that still fits the
+remaining target. Any section shortfall is topped up from the other
+difficulties of that section. With `no_overlap`, questions used by one form
+are removed from the pools before the next form is built.
+
+Selected questions are copied (with their options) into a new instance Exam
+per form, so the same bank question can appear in several forms.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Exam, Question, Option
+from .signals import questions_changed
+
+# Blueprint weight field for each section label used in the bank
+SECTION_WEIGHTS = {
+    'Section A': 'weight_section_a',
+    'Section B': 'weight_section_b',
+    'Section C': 'weight_section_c',
+}
+
+DEFAULT_TOTAL_POINTS = 100.0
+MAX_FORMS = 50
+
+# Floating point slack when comparing points against targets
+EPSILON = 1e-6
+
+BANK_STATUSES = (Question.ApprovalStatus.APPROVED, Question.ApprovalStatus.LOCKED)
+
+
+class AssemblyError(ValueError):
+    pass
+
+
+def section_key(label):
+    """Maps free-text section labels ('section b', ' Section B ') onto SECTION_WEIGHTS keys."""
+    label = (label or '').strip().lower()
+    for key in SECTION_WEIGHTS:
+        if key.lower() == label:
+            return key
+    return None
+
+
+def section_targets(blueprint, total_points=DEFAULT_TOTAL_POINTS, overrides=None):
+    """Points per section: the blueprint's weights applied to `total_points`, unless overridden."""
+    if overrides:
+        targets = {}
+        for label, points in overrides.items():
+            key = section_key(label)
+            if key is None:
+                raise AssemblyError(f"Unknown section '{label}'")
+            targets[key] = float(points)
+        return targets
+    return {
+        key: round(total_points * getattr(blueprint, field) / 100.0, 2)
+        for key, field in SECTION_WEIGHTS.items()
+        if getattr(blueprint, field) > 0
+    }
+
+
+def normalize_mix(mix):
+    """{'easy': 3, 'hard': 1} -> {'easy': 0.75, 'hard': 0.25}."""
+    if not mix:
+        return None
+    valid = set(Question.Difficulty.values)
+    unknown = set(mix) - valid
+    if unknown:
+        raise AssemblyError(f"Unknown difficulty: {', '.join(sorted(unknown))}")
+    total = sum(float(v) for v in mix.values())
+    if total <= 0:
+        raise AssemblyError("difficulty_mix must have a positive total")
+    return {level: float(share) / total for level, share in mix.items() if float(share) > 0}
+
+
+class BankIndex:
+    """In-memory pools of (question_id, points) keyed by (section, difficulty)."""
+
+    def __init__(self, rows):
+        self.pools = {}
+        self.size = 0
+        for question_id, section, difficulty, points in rows:
+            key = section_key(section)
+            if key is None or points <= 0:
+                continue
+            self.pools.setdefault((key, difficulty), []).append((question_id, points))
+            self.size += 1
+
+    @classmethod
+    def load(cls, language_pair=None, specialization=None):
+        queryset = Question.objects.filter(status__in=BANK_STATUSES, exam__blueprint__isnull=True)
+        if language_pair is not None:
+            queryset = queryset.filter(exam__language_pair=language_pair)
+        if specialization:
+            # General questions fit every track
+            queryset = queryset.filter(Q(specialization__iexact=specialization) | Q(specialization=''))
+        return cls(queryset.values_list('id', 'section', 'difficulty', 'points').iterator(chunk_size=2000))
+
+    def available(self, section):
+        return sum(points for (key, _), pool in self.pools.items() if key == section for _, points in pool)
+
+    def remove(self, question_ids):
+        for key, pool in self.pools.items():
+            self.pools[key] = [item for item in pool if item[0] not in question_ids]
+
+
+def fill(pool, target, rng, taken):
+    """Greedy subset-sum: shuffled, then largest first; returns (ids, points)."""
+    candidates = [item for item in pool if item[0] not in taken]
+    rng.shuffle(candidates)
+    candidates.sort(key=lambda item: -item[1])  # stable: equal points keep the shuffled order
+    picked, total = [], 0.0
+    for question_id, points in candidates:
+        if total + points <= target + EPSILON:
+            picked.append(question_id)
+            taken.add(question_id)
+            total += points
+            if total >= target - EPSILON:
+                break
+    return picked, total
+
+
+def select_form(index, targets, mix, rng):
+    """Returns ({section: [question ids]}, report) for one form."""
+    taken = set()
+    selection, report = {}, {}
+    for section, target in targets.items():
+        picked, total = [], 0.0
+        if mix:
+            for level, share in mix.items():
+                ids, points = fill(index.pools.get((section, level), []), target * share, rng, taken)
+                picked += ids
+                total += points
+        # Top up any shortfall from the whole section
+        if total < target - EPSILON:
+            for level in Question.Difficulty.values:
+                ids, points = fill(index.pools.get((section, level), []), target - total, rng, taken)
+                picked += ids
+                total += points
+        selection[section] = picked
+        report[section] = {
+            "target_points": target,
+            "points": round(total, 2),
+            "questions": len(picked),
+            "shortfall": round(max(target - total, 0.0), 2),
+        }
+    return selection, report
+
+
+def plan_forms(index, targets, forms=1, mix=None, no_overlap=False, seed=None):
+    """Selects question ids for `forms` parallel forms without touching the database."""
+    if seed is None:
+        seed = random.SystemRandom().randrange(1 << 31)
+    plans = []
+    for number in range(forms):
+        rng = random.Random(f"{seed}:{number}")
+        selection, report = select_form(index, targets, mix, rng)
+        if no_overlap:
+            index.remove({qid for ids in selection.values() for qid in ids})
+        plans.append({"form": number + 1, "selection": selection, "sections": report})
+    return seed, plans
+
+
+def clone_form(blueprint, number, question_ids, language_pair=None):
+    """Creates an instance Exam holding copies of the given bank questions."""
+    exam = Exam.objects.create(
+        title=f"{blueprint.title} - Form {number}",
+        description=blueprint.description,
+        category=blueprint.category,
+        language_pair=language_pair or blueprint.language_pair,
+        is_blueprint=False,
+        blueprint=blueprint,
+        weight_section_a=blueprint.weight_section_a,
+        weight_section_b=blueprint.weight_section_b,
+        weight_section_c=blueprint.weight_section_c,
+        duration_minutes=blueprint.duration_minutes,
+        pass_mark_percentage=blueprint.pass_mark_percentage,
+        grading_type=blueprint.grading_type,
+        # Payments are checked against the form's own price
+        price=blueprint.price,
+        randomize_questions=blueprint.randomize_questions,
+        shuffle_options=blueprint.shuffle_options,
+        questions_per_section=blueprint.questions_per_section,
+    )
+
+    originals = Question.objects.in_bulk(question_ids)
+    clones = []
+    for question_id in question_ids:
+        q = originals[question_id]
+        clones.append(Question(
+            exam=exam,
+            section=q.section,
+            status=Question.ApprovalStatus.LOCKED,
+            approved_by_id=q.approved_by_id,
+            text=q.text,
+            source_text=q.source_text,
+            reference_translation=q.reference_translation,
+            translation_brief=q.translation_brief,
+            question_type=q.question_type,
+            points=q.points,
+            difficulty=q.difficulty,
+            specialization=q.specialization,
+        ))
+    clones = Question.objects.bulk_create(clones, batch_size=500)
+    clone_of = {original: clone.pk for original, clone in zip(question_ids, clones)}
+
+    options = [
+        Option(question_id=clone_of[question_id], text=text, is_correct=is_correct)
+        for question_id, text, is_correct in Option.objects.filter(
+            question_id__in=question_ids
+        ).order_by('id').values_list('question_id', 'text', 'is_correct')
+    ]
+    Option.objects.bulk_create(options, batch_size=1000)
+    return exam, [clone.pk for clone in clones]
+
+
+def assemble(blueprint, forms=1, total_points=DEFAULT_TOTAL_POINTS, section_points=None,
+             difficulty_mix=None, specialization=None, language_pair=None,
+             no_overlap=False, seed=None, dry_run=False):
+    """
+    Builds `forms` parallel papers from `blueprint` and returns a report.
+    `language_pair` defaults to the blueprint's; with dry_run nothing is created.
+    """
+    if not blueprint.is_blueprint:
+        raise AssemblyError("Exam is not a blueprint")
+    if not 1 <= forms <= MAX_FORMS:
+        raise AssemblyError(f"forms must be between 1 and {MAX_FORMS}")
+
+    targets = section_targets(blueprint, total_points, section_points)
+    mix = normalize_mix(difficulty_mix)
+    language_pair = language_pair or blueprint.language_pair
+    index = BankIndex.load(language_pair, specialization)
+
+    if no_overlap:
+        for section, target in targets.items():
+            if index.available(section) < target * forms - EPSILON:
+                raise AssemblyError(
+                    f"{section}: the bank has {index.available(section):g} points, "
+                    f"{target * forms:g} are needed for {forms} non-overlapping forms"
+                )
+
+    seed, plans = plan_forms(index, targets, forms, mix, no_overlap, seed)
+    result = {"seed": seed, "bank_size": index.size, "forms": []}
+
+    created_ids = []
+    with transaction.atomic():
+        for plan in plans:
+            ids = [qid for section_ids in plan["selection"].values() for qid in section_ids]
+            entry = {"form": plan["form"], "sections": plan["sections"], "question_ids": ids}
+            if not dry_run:
+                exam, clone_ids = clone_form(blueprint, plan["form"], ids, language_pair)
+                entry["exam_id"] = exam.id
+                created_ids += clone_ids
+            result["forms"].append(entry)
+    if created_ids:
+        # Copies of bank questions: searchable, but kept out of the duplicate index
+        questions_changed(created_ids, text_changed=False)
+    return result
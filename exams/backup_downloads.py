@@ -0,0 +1,183 @@
+"""
+Backup downloads.
+
+Full backups and reassembled snapshots are served with single-range support
+(`Range` / `If-Range` / 206), so an interrupted download resumes where it
+stopped. Every response carries `Repr-Digest` (sha-256 of the whole file,
+RFC 9530) when the checksum is on record, plus `Content-Digest` when the
+body is the whole file. Checksums are only read from the sidecar or the
+catalogue, never computed while a request waits; backups without one are
+served without digests (`rebuild_backup_catalog` records them).
+
+`?compress=gzip` streams an uncompressed database (.sqlite3 file or
+snapshot) gzip-compressed on the fly as a .sqlite3.gz download. Its bytes
+aren't known in advance, so that variant is not resumable.
+
+When BACKUP_ACCEL_REDIRECT is set (the URL prefix of an nginx `internal`
+location aliased to BACKUP_DIR) full backup files are handed to nginx with
+`X-Accel-Redirect`; nginx then serves the bytes and ranges itself.
+"""
+import base64
+import os
+import zlib
+
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+
+BLOCK_SIZE = 256 * 1024
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single `bytes=` range, None to ignore the
+    header and send everything, False when it can't be satisfied.
+    """
+    units, _, spec = header.partition('=')
+    # Multiple ranges are legal to ignore; a 200 with the whole file is fine
+    if units.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if first == '':
+            length = int(last)
+            if length <= 0:
+                return False
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def digest_header(hexdigest):
+    return f"sha-256=:{base64.b64encode(bytes.fromhex(hexdigest)).decode()}:"
+
+
+def file_digest(path, entry=None):
+    """
+    sha256 of the file as served: from its `<file>.sha256` sidecar, else from
+    its catalogue entry if that still describes a file of this size, else None.
+    """
+    sidecar = path + '.sha256'
+    if os.path.exists(sidecar):
+        with open(sidecar) as fh:
+            return fh.read().split()[0]
+    if entry and entry.get('file_sha256') and entry.get('size') == os.path.getsize(path):
+        return entry['file_sha256']
+    return None
+
+
+def wants_gzip(request):
+    return request.GET.get('compress') == 'gzip'
+
+
+def gzip_stream(blocks, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for block in blocks:
+        out = compressor.compress(block)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def iter_file(path, start=0, end=None):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = None if end is None else end - start + 1
+        while remaining is None or remaining > 0:
+            block = fh.read(BLOCK_SIZE if remaining is None else min(BLOCK_SIZE, remaining))
+            if not block:
+                return
+            if remaining is not None:
+                remaining -= len(block)
+            yield block
+
+
+def iter_snapshot_range(store, manifest, start, end):
+    chunk_size = manifest['chunk_size']
+    for index in range(start // chunk_size, end // chunk_size + 1):
+        data = store.get_chunk(manifest['chunks'][index])
+        offset = index * chunk_size
+        yield data[max(start - offset, 0):end - offset + 1]
+
+
+def ranged_response(request, size, etag, digest, filename, body):
+    """
+    Builds the 200/206/416 response; body(start, end) yields the bytes of
+    the inclusive range.
+    """
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and request.META.get('HTTP_IF_RANGE', etag) == etag:
+        byte_range = parse_range(header, size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(body(start, end), status=206, content_type='application/octet-stream')
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = StreamingHttpResponse(body(0, size - 1) if size else iter(()), content_type='application/octet-stream')
+        response['Content-Length'] = str(size)
+        if digest:
+            response['Content-Digest'] = digest_header(digest)
+    if digest:
+        response['Repr-Digest'] = digest_header(digest)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def gzip_response(blocks, filename):
+    response = StreamingHttpResponse(
+        gzip_stream(blocks, getattr(settings, 'BACKUP_COMPRESSLEVEL', 6)), content_type='application/gzip'
+    )
+    response['Accept-Ranges'] = 'none'
+    response['Content-Disposition'] = f'attachment; filename="{filename}.gz"'
+    return response
+
+
+def serve_backup_file(request, path, entry=None):
+    """Serves a full backup; `entry` is its catalogue entry, for the checksum."""
+    filename = os.path.basename(path)
+    if wants_gzip(request) and not filename.endswith('.gz'):
+        return gzip_response(iter_file(path), filename)
+
+    accel = getattr(settings, 'BACKUP_ACCEL_REDIRECT', '')
+    if accel:
+        # nginx streams the file and handles Range
+        response = HttpResponse(content_type='application/octet-stream')
+        response['X-Accel-Redirect'] = accel.rstrip('/') + '/' + filename
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        digest = file_digest(path, entry)
+        if digest:
+            response['Repr-Digest'] = digest_header(digest)
+        return response
+
+    stats = os.stat(path)
+    digest = file_digest(path, entry)
+    # Without a checksum the ETag changes whenever the file might have
+    etag = f'"{digest}"' if digest else f'"{stats.st_size:x}-{stats.st_mtime_ns:x}"'
+    return ranged_response(
+        request, stats.st_size, etag, digest, filename,
+        lambda start, end: iter_file(path, start, end),
+    )
+
+
+def serve_snapshot(request, store, manifest):
+    filename = f"{manifest['name']}.sqlite3"
+    if wants_gzip(request):
+        return gzip_response(store.iter_snapshot(manifest['name']), filename)
+    return ranged_response(
+        request, manifest['size'], f'"{manifest["sha256"]}"', manifest['sha256'], filename,
+        lambda start, end: iter_snapshot_range(store, manifest, start, end),
+    )
@@ -0,0 +1,217 @@
+"""
+Near-duplicate detection for the question bank (MinHash + LSH).
+
+Each question's text and source passage are shingled into word 3-grams and
+summarised by a 64-value MinHash signature. The signature is split into 16
+bands of 4 values; every band is hashed into a bucket stored in
+`QuestionLSHBucket`. Two texts with Jaccard similarity s share at least one
+bucket with probability 1 - (1 - s^4)^16 (~0.5 at s=0.5, >0.99 at s=0.8),
+so a lookup only touches the handful of questions in the same buckets
+instead of comparing against the whole bank.
+
+Questions of assembled forms (exams with a blueprint) are copies of bank
+questions and are left out of the index.
+"""
+import hashlib
+import random
+import re
+import struct
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Question, QuestionSignature, QuestionLSHBucket
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.6
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(20260319)
+PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+# Signatures of bulk-changed batches above this size are built by the job worker
+SYNC_INDEX_LIMIT = 200
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+KINDS = {
+    QuestionSignature.Kind.TEXT: 'text',
+    QuestionSignature.Kind.SOURCE: 'source_text',
+}
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def shingles(text):
+    words = WORD_RE.findall((text or '').casefold())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """Returns the signature as a tuple of NUM_PERM ints, or None for empty text."""
+    hashes = [_hash64(s) for s in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in PERMUTATIONS
+    )
+
+
+def band_buckets(signature):
+    """[(band, bucket)] for a signature; buckets fit a signed 64-bit column."""
+    buckets = []
+    for band in range(BANDS):
+        chunk = struct.pack(f'>{ROWS}I', *signature[band * ROWS:(band + 1) * ROWS])
+        digest = hashlib.blake2b(chunk, digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, 'big', signed=True)))
+    return buckets
+
+
+def pack(signature):
+    return struct.pack(f'>{NUM_PERM}I', *signature)
+
+
+def unpack(data):
+    return struct.unpack(f'>{NUM_PERM}I', bytes(data))
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+
+# --- Index maintenance ---
+
+def index_questions(question_ids):
+    """(Re)builds signatures and buckets for the given questions; form copies are only unindexed."""
+    question_ids = list(question_ids)
+    if not question_ids:
+        return
+    signatures, buckets = [], []
+    rows = Question.objects.filter(
+        id__in=question_ids, exam__blueprint__isnull=True,
+    ).values_list('id', 'text', 'source_text')
+    for question_id, text, source_text in rows.iterator(chunk_size=1000):
+        for kind, value in ((QuestionSignature.Kind.TEXT, text), (QuestionSignature.Kind.SOURCE, source_text)):
+            signature = minhash(value)
+            if signature is None:
+                continue
+            signatures.append(QuestionSignature(question_id=question_id, kind=kind, minhash=pack(signature)))
+            buckets.extend(
+                QuestionLSHBucket(question_id=question_id, kind=kind, band=band, bucket=bucket)
+                for band, bucket in band_buckets(signature)
+            )
+
+    with transaction.atomic():
+        QuestionSignature.objects.filter(question_id__in=question_ids).delete()
+        QuestionLSHBucket.objects.filter(question_id__in=question_ids).delete()
+        QuestionSignature.objects.bulk_create(signatures, batch_size=1000)
+        QuestionLSHBucket.objects.bulk_create(buckets, batch_size=2000)
+
+
+# --- Lookups ---
+
+def find_similar(signature, kind, threshold=DEFAULT_THRESHOLD, exclude_id=None, limit=20):
+    """
+    Returns [(question_id, similarity)] for indexed questions sharing at
+    least one LSH bucket with `signature`, best match first.
+    """
+    lookup = Q()
+    for band, bucket in band_buckets(signature):
+        lookup |= Q(band=band, bucket=bucket)
+    candidate_ids = set(
+        QuestionLSHBucket.objects.filter(lookup, kind=kind).values_list('question_id', flat=True)
+    )
+    candidate_ids.discard(exclude_id)
+    if not candidate_ids:
+        return []
+
+    matches = []
+    for question_id, data in QuestionSignature.objects.filter(
+        question_id__in=candidate_ids, kind=kind
+    ).values_list('question_id', 'minhash'):
+        score = similarity(signature, unpack(data))
+        if score >= threshold:
+            matches.append((question_id, score))
+    matches.sort(key=lambda m: (-m[1], m[0]))
+    return matches[:limit]
+
+
+def describe(matches_by_kind):
+    """Attaches question details to [(question_id, similarity)] lists with one query."""
+    ids = {qid for matches in matches_by_kind.values() for qid, _ in matches}
+    details = {
+        q['id']: q for q in Question.objects.filter(id__in=ids).values('id', 'exam_id', 'section', 'text', 'status')
+    }
+    result = []
+    for kind, matches in matches_by_kind.items():
+        for question_id, score in matches:
+            q = details.get(question_id)
+            if q:
+                result.append({
+                    "question_id": question_id,
+                    "exam_id": q['exam_id'],
+                    "section": q['section'],
+                    "status": q['status'],
+                    "text": q['text'][:200],
+                    "match_on": kind,
+                    "similarity": round(score, 2),
+                })
+    result.sort(key=lambda item: -item["similarity"])
+    return result
+
+
+def duplicates_of_question(question, threshold=DEFAULT_THRESHOLD):
+    found = {}
+    for kind, field in KINDS.items():
+        signature = minhash(getattr(question, field))
+        if signature is not None:
+            found[kind] = find_similar(signature, kind, threshold, exclude_id=question.pk)
+    return describe(found)
+
+
+def duplicates_in_rows(rows, threshold=DEFAULT_THRESHOLD):
+    """
+    Checks an import (iterable of (row_number, row_dict)) against the bank and
+    against earlier rows of the same file. Only rows with matches are returned.
+    """
+    report = []
+    seen = {kind: {} for kind in KINDS}   # kind -> {(band, bucket): [(row_number, signature)]}
+    for row_number, row in rows:
+        texts = {
+            QuestionSignature.Kind.TEXT: row.get('question_text') or row.get('text'),
+            QuestionSignature.Kind.SOURCE: row.get('source_text') or row.get('source_text_reference'),
+        }
+        bank_matches, file_matches = {}, []
+        for kind, text in texts.items():
+            signature = minhash(text if isinstance(text, str) else '')
+            if signature is None:
+                continue
+            bank_matches[kind] = find_similar(signature, kind, threshold)
+
+            earlier = {}
+            for key in band_buckets(signature):
+                for other_row, other_sig in seen[kind].get(key, []):
+                    earlier[other_row] = other_sig
+                seen[kind].setdefault(key, []).append((row_number, signature))
+            for other_row, other_sig in earlier.items():
+                score = similarity(signature, other_sig)
+                if score >= threshold:
+                    file_matches.append({"row": other_row, "match_on": kind, "similarity": round(score, 2)})
+
+        bank = describe(bank_matches)
+        if bank or file_matches:
+            report.append({"row": row_number, "bank_matches": bank, "file_matches": file_matches})
+    return report
@@ -0,0 +1,98 @@
+import csv
+import json
+import tempfile
+
+import openpyxl
+
+from cores.exports import Echo
+from .models import Option
+
+# Questions are read in chunks; each chunk's options come from one query
+CHUNK_SIZE = 1000
+
+BANK_COLUMNS = [
+    'exam_id', 'exam_title', 'section', 'question_text', 'question_type', 'points', 'status',
+    'difficulty', 'specialization', 'source_text', 'reference_translation', 'translation_brief', 'options', 'correct_answer',
+]
+
+QUESTION_FIELDS = (
+    'id', 'exam_id', 'exam__title', 'section', 'text', 'question_type', 'points', 'status',
+    'difficulty', 'specialization',
+    'source_text', 'reference_translation', 'translation_brief',
+)
+
+
+def iter_bank(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Yields one dict per question (options included) in constant memory:
+    questions are paged by primary key and each page's options are loaded
+    with a single query.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = 0
+    while True:
+        page = list(queryset.filter(pk__gt=last_pk).values(*QUESTION_FIELDS)[:chunk_size])
+        if not page:
+            return
+        last_pk = page[-1]['id']
+
+        options = {}
+        for question_id, text, is_correct in Option.objects.filter(
+            question_id__in=[q['id'] for q in page]
+        ).order_by('id').values_list('question_id', 'text', 'is_correct'):
+            options.setdefault(question_id, []).append({"text": text, "is_correct": is_correct})
+
+        for q in page:
+            yield {
+                'exam_id': q['exam_id'],
+                'exam_title': q['exam__title'],
+                'section': q['section'] or '',
+                'question_text': q['text'],
+                'question_type': q['question_type'].lower(),
+                'points': q['points'],
+                'status': q['status'],
+                'difficulty': q['difficulty'],
+                'specialization': q['specialization'],
+                'source_text': q['source_text'] or '',
+                'reference_translation': q['reference_translation'] or '',
+                'translation_brief': q['translation_brief'] or '',
+                'options': options.get(q['id'], []),
+            }
+
+
+def flat_row(item):
+    """CSV/XLSX layout: options joined with '|' plus a correct_answer column."""
+    correct = [opt['text'] for opt in item['options'] if opt['is_correct']]
+    row = dict(item)
+    row['options'] = '|'.join(opt['text'] for opt in item['options'])
+    row['correct_answer'] = correct[0] if correct else ''
+    return [row[col] for col in BANK_COLUMNS]
+
+
+def stream_jsonl(queryset):
+    for item in iter_bank(queryset):
+        yield json.dumps(item, ensure_ascii=False) + '\n'
+
+
+def stream_csv(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(BANK_COLUMNS)
+    for item in iter_bank(queryset):
+        yield writer.writerow(flat_row(item))
+
+
+def write_xlsx(queryset):
+    """
+    Writes the bank with openpyxl's write-only workbook into a temporary
+    file (deleted when closed) and returns it rewound for streaming.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Question Bank")
+    sheet.append(BANK_COLUMNS)
+    for item in iter_bank(queryset):
+        sheet.append(flat_row(item))
+
+    tmp = tempfile.TemporaryFile()
+    workbook.save(tmp)
+    tmp.seek(0)
+    return tmp
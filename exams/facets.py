@@ -0,0 +1,77 @@
+"""
+Question bank facet counts.
+
+All facets are computed from a single GROUP BY over the filtered queryset and
+folded in Python. Results are cached per filter signature and bank version.
+
+The version is read from the database (like the exam paper's, see
+assessments.randomization.paper_version): question count, id sum and latest
+`updated_at`, plus every exam's language pair. Any committed change moves it
+in every process, so the cache may be per-process (the default LocMemCache).
+Code that changes questions with queryset.update() must set updated_at.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Sum
+
+from cores.models import LanguagePair
+from .models import Exam, Question
+
+FACET_FIELDS = {
+    'section': 'section',
+    'difficulty': 'difficulty',
+    'status': 'status',
+    'specialization': 'specialization',
+    'language_pair': 'exam__language_pair__pair_code',
+}
+
+CACHE_TIMEOUT = 60 * 10
+
+
+def bank_version():
+    """Changes whenever a question is added, removed or edited, or an exam's language pair changes."""
+    state = [
+        Question.objects.aggregate(n=Count('id'), ids=Sum('id'), changed=Max('updated_at')),
+        list(Exam.objects.order_by('id').values_list('id', 'language_pair_id')),
+        list(LanguagePair.objects.order_by('id').values_list('id', 'pair_code')),
+    ]
+    return hashlib.sha1(repr(state).encode('utf-8')).hexdigest()[:16]
+
+
+def facet_cache_key(params):
+    signature = '&'.join(f"{k}={v}" for k, v in sorted(params.items()) if v)
+    digest = hashlib.sha1(signature.encode('utf-8')).hexdigest()
+    return f"question_facets:{bank_version()}:{digest}"
+
+
+def compute_facets(queryset):
+    paths = list(FACET_FIELDS.values())
+    facets = {name: {} for name in FACET_FIELDS}
+    total = 0
+    grouped = queryset.order_by().values(*paths).annotate(n=Count('id'))
+    for row in grouped:
+        total += row['n']
+        for name, path in FACET_FIELDS.items():
+            value = row[path] or ''
+            facets[name][value] = facets[name].get(value, 0) + row['n']
+
+    return {
+        "total": total,
+        "facets": {
+            name: [
+                {"value": value, "count": count}
+                for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            ]
+            for name, counts in facets.items()
+        },
+    }
+
+
+def cached_facets(queryset, params):
+    key = facet_cache_key(params)
+    data = cache.get(key)
+    if data is None:
+        data = compute_facets(queryset)
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
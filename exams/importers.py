@@ -0,0 +1,457 @@
+import codecs
+import csv
+import hashlib
+import json
+import os
+
+import openpyxl
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Exam, Question, Option
+from .signals import questions_changed
+
+# Rows are validated and inserted in chunks; each chunk is its own short
+# transaction so the SQLite write lock is released between chunks.
+CHUNK_SIZE = 500
+
+# Only the first MAX_REPORTED_ERRORS row errors are kept in the report
+MAX_REPORTED_ERRORS = 1000
+
+QUESTION_TYPES = {
+    'mcq': Question.QuestionType.MCQ,
+    'theory': Question.QuestionType.THEORY,
+    'essay': Question.QuestionType.THEORY,
+    'translation': Question.QuestionType.THEORY,
+}
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": message})
+
+    def as_dict(self):
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "failed": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def iter_csv_rows(file_obj):
+    """
+    Yields (row_number, row_dict) from an uploaded CSV without decoding the
+    whole file in memory. Row numbers match the spreadsheet (header = 1).
+    """
+    lines = codecs.iterdecode(file_obj, 'utf-8-sig')
+    reader = csv.DictReader(lines)
+    for index, row in enumerate(reader, start=2):
+        yield index, {(k or '').strip().lower(): (v or '').strip() for k, v in row.items()}
+
+
+def clean_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def iter_xlsx_rows(file_obj):
+    """Yields rows from the first worksheet using openpyxl's read-only mode."""
+    workbook = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [clean_value(h).lower() for h in next(rows, ())]
+        for index, values in enumerate(rows, start=2):
+            yield index, {h: clean_value(v) for h, v in zip(header, values) if h}
+    finally:
+        workbook.close()
+
+
+def iter_jsonl_rows(file_obj):
+    """
+    Yields rows from JSON Lines (one question object per line). `options` may
+    be a list of strings or of {"text": ..., "is_correct": ...} objects.
+    """
+    for index, line in enumerate(codecs.iterdecode(file_obj, 'utf-8-sig'), start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield index, {'_error': f"Invalid JSON: {e.msg}"}
+            continue
+        if not isinstance(obj, dict):
+            yield index, {'_error': "Each line must be a JSON object"}
+            continue
+        yield index, {
+            k.strip().lower(): v if isinstance(v, list) else clean_value(v)
+            for k, v in obj.items()
+        }
+
+
+ROW_READERS = {
+    '.csv': iter_csv_rows,
+    '.xlsx': iter_xlsx_rows,
+    '.jsonl': iter_jsonl_rows,
+    '.ndjson': iter_jsonl_rows,
+}
+
+
+def iter_upload_rows(file_obj, filename=None):
+    """Picks the row reader from the file extension (CSV by default)."""
+    ext = os.path.splitext(filename or getattr(file_obj, 'name', '') or '')[1].lower()
+    return ROW_READERS.get(ext, iter_csv_rows)(file_obj)
+
+
+def split_options(raw):
+    separator = '|' if '|' in raw else ';'
+    return [opt.strip() for opt in raw.split(separator) if opt.strip()]
+
+
+def parse_options(row):
+    """Returns [(text, is_correct)] from either a delimited string or a list."""
+    raw = row.get('options') or ''
+    correct = clean_value(row.get('correct_answer')).lower()
+    if isinstance(raw, list):
+        options = []
+        for opt in raw:
+            if isinstance(opt, dict):
+                text = clean_value(opt.get('text'))
+                is_correct = bool(opt.get('is_correct')) or (bool(correct) and text.lower() == correct)
+            else:
+                text = clean_value(opt)
+                is_correct = text.lower() == correct
+            if text:
+                options.append((text, is_correct))
+        return options
+    return [(opt, opt.lower() == correct) for opt in split_options(raw)]
+
+
+class QuestionRowValidator:
+    """
+    Turns a raw row into unsaved Question kwargs plus its options.
+    An exam_id given for the whole upload overrides the rows' exam_id column,
+    so a bank exported from one environment can be loaded into another.
+    """
+
+    def __init__(self, exam_id=None):
+        self.exam_id = exam_id
+        self.known_exam_ids = set()
+
+    def load_exams(self, rows):
+        # One query per chunk for exam ids we have not seen yet
+        wanted = {self.exam_id or row.get('exam_id') for _, row in rows}
+        wanted = {int(e) for e in wanted if e and str(e).isdigit()} - self.known_exam_ids
+        if wanted:
+            self.known_exam_ids.update(Exam.objects.filter(id__in=wanted).values_list('id', flat=True))
+
+    def validate(self, row):
+        if '_error' in row:
+            raise RowError(row['_error'])
+
+        text = row.get('question_text') or row.get('text')
+        if not text:
+            raise RowError("question_text is required")
+
+        exam_id = self.exam_id or row.get('exam_id')
+        if not exam_id:
+            raise RowError("exam_id is required (column or upload field)")
+        if not str(exam_id).isdigit() or int(exam_id) not in self.known_exam_ids:
+            raise RowError(f"Exam {exam_id} does not exist")
+
+        raw_type = (row.get('question_type') or 'mcq').lower()
+        if raw_type not in QUESTION_TYPES:
+            raise RowError(f"Unknown question_type '{raw_type}'")
+        question_type = QUESTION_TYPES[raw_type]
+
+        difficulty = (row.get('difficulty') or Question.Difficulty.MEDIUM).lower()
+        if difficulty not in Question.Difficulty.values:
+            raise RowError(f"Unknown difficulty '{difficulty}'")
+
+        try:
+            points = float(row.get('points') or 1)
+        except ValueError:
+            raise RowError(f"Invalid points value '{row.get('points')}'")
+        if points <= 0:
+            raise RowError("points must be greater than zero")
+
+        options = []
+        if question_type == Question.QuestionType.MCQ:
+            options = parse_options(row)
+            if len(options) < 2:
+                raise RowError("MCQ questions need at least two options")
+            if any(len(text) > 255 for text, _ in options):
+                raise RowError("Options are limited to 255 characters")
+            if not any(is_correct for _, is_correct in options):
+                raise RowError("correct_answer does not match any option")
+
+        question = Question(
+            exam_id=int(exam_id),
+            section=row.get('section') or None,
+            text=text,
+            question_type=question_type,
+            points=points,
+            difficulty=difficulty,
+            specialization=row.get('specialization', '')[:100],
+            source_text=row.get('source_text') or row.get('source_text_reference') or None,
+            reference_translation=row.get('reference_translation') or None,
+            translation_brief=row.get('translation_brief') or None,
+        )
+        return question, options
+
+
+def insert_chunk(validated):
+    """Inserts a validated chunk with two bulk_create calls in one transaction."""
+    with transaction.atomic():
+        questions = Question.objects.bulk_create([question for question, _ in validated])
+        Option.objects.bulk_create([
+            Option(question_id=question.pk, text=text, is_correct=is_correct)
+            for question, (_, options) in zip(questions, validated)
+            for text, is_correct in options
+        ])
+        # bulk_create skips post_save, so announce the new rows explicitly
+        questions_changed([question.pk for question in questions])
+    return len(questions)
+
+
+def import_question_rows(rows, exam_id=None, chunk_size=CHUNK_SIZE, on_progress=None):
+    """
+    Validates and bulk-inserts (row_number, row_dict) pairs.
+    Invalid rows are skipped and listed in the returned ImportReport.
+    """
+    report = ImportReport()
+    validator = QuestionRowValidator(exam_id=exam_id)
+
+    chunk = []
+
+    def flush():
+        validator.load_exams(chunk)
+        validated = []
+        for row_number, row in chunk:
+            try:
+                validated.append(validator.validate(row))
+            except RowError as e:
+                report.add_error(row_number, str(e))
+        if validated:
+            report.created += insert_chunk(validated)
+        chunk.clear()
+        if on_progress:
+            on_progress(report)
+
+    for row_number, row in rows:
+        if not any(row.values()):
+            continue
+        report.rows += 1
+        chunk.append((row_number, row))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    return report
+
+
+def import_questions_file(file_obj, exam_id=None, filename=None, **kwargs):
+    """
+    Imports questions from an uploaded CSV, XLSX or JSONL file.
+    Expected columns/keys: exam_id (optional), section, question_text, question_type, points,
+    difficulty, specialization, source_text, reference_translation, translation_brief, options, correct_answer
+    """
+    return import_question_rows(iter_upload_rows(file_obj, filename), exam_id=exam_id, **kwargs)
+
+
+# --- Sync mode: fingerprint rows against the existing bank ---
+
+# Fields compared (and bulk-updated) when a row matches an existing question
+SYNC_FIELDS = ['text', 'question_type', 'points', 'difficulty', 'specialization', 'source_text', 'reference_translation', 'translation_brief']
+
+# Only the first MAX_PLAN_ENTRIES rows of each plan bucket are echoed back
+MAX_PLAN_ENTRIES = 500
+
+
+def normalize_text(text):
+    return ' '.join((text or '').casefold().split())
+
+
+def fingerprint(exam_id, section, text):
+    raw = f"{exam_id}\x1f{normalize_text(section)}\x1f{normalize_text(text)}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class ImportPlan:
+    """
+    In-memory insert/update/skip plan for a sync import. Build it with
+    `plan_question_import`, preview it with `as_dict()` and write it with
+    `apply()`.
+    """
+
+    def __init__(self):
+        self.report = ImportReport()
+        self.inserts = []   # (row_number, question, options)
+        self.updates = []   # (row_number, question, changed_fields, option_changes)
+        self.skips = []     # (row_number, question_id)
+
+    def as_dict(self):
+        data = self.report.as_dict()
+        data.update({
+            "to_create": len(self.inserts),
+            "to_update": len(self.updates),
+            "unchanged": len(self.skips),
+            "plan": {
+                "create": [{"row": row} for row, _, _ in self.inserts[:MAX_PLAN_ENTRIES]],
+                "update": [
+                    {"row": row, "question_id": q.pk, "fields": fields + (['options'] if opts else [])}
+                    for row, q, fields, opts in self.updates[:MAX_PLAN_ENTRIES]
+                ],
+                "skip": [{"row": row, "question_id": pk} for row, pk in self.skips[:MAX_PLAN_ENTRIES]],
+            },
+        })
+        return data
+
+    def apply(self, chunk_size=CHUNK_SIZE):
+        with transaction.atomic():
+            for start in range(0, len(self.inserts), chunk_size):
+                part = self.inserts[start:start + chunk_size]
+                self.report.created += insert_chunk([(q, opts) for _, q, opts in part])
+
+            # bulk_update skips auto_now, so updated_at (the cached paper's version) is set here
+            now = timezone.now()
+            changed_fields = sorted({f for _, _, fields, _ in self.updates for f in fields})
+            if changed_fields:
+                changed = [q for _, q, fields, _ in self.updates if fields]
+                for question in changed:
+                    question.updated_at = now
+                Question.objects.bulk_update(changed, changed_fields + ['updated_at'], batch_size=chunk_size)
+
+            stale_option_ids, flipped, new_options = [], [], []
+            for _, question, _, option_changes in self.updates:
+                if not option_changes:
+                    continue
+                stale_option_ids.extend(option_changes['delete'])
+                flipped.extend(option_changes['flip'])
+                new_options.extend(
+                    Option(question_id=question.pk, text=text, is_correct=is_correct)
+                    for text, is_correct in option_changes['create']
+                )
+            if stale_option_ids:
+                Option.objects.filter(id__in=stale_option_ids).delete()
+            if flipped:
+                for option in flipped:
+                    option.updated_at = now
+                Option.objects.bulk_update(flipped, ['is_correct', 'updated_at'], batch_size=chunk_size)
+            if new_options:
+                Option.objects.bulk_create(new_options, batch_size=chunk_size)
+
+            questions_changed([q.pk for _, q, _, _ in self.updates])
+
+        data = self.as_dict()
+        data["updated"] = len(self.updates)
+        return data
+
+
+def diff_options(existing, wanted):
+    """
+    Compares existing options [(id, text, is_correct)] with wanted
+    [(text, is_correct)]. Options are matched by text so unchanged options
+    keep their ids (and any candidate answers pointing at them).
+    """
+    by_text = {text: (pk, is_correct) for pk, text, is_correct in existing}
+    wanted_texts = {text for text, _ in wanted}
+    changes = {
+        'delete': [pk for pk, text, _ in existing if text not in wanted_texts],
+        'flip': [],
+        'create': [],
+    }
+    for text, is_correct in wanted:
+        if text not in by_text:
+            changes['create'].append((text, is_correct))
+        elif by_text[text][1] != is_correct:
+            changes['flip'].append(Option(id=by_text[text][0], is_correct=is_correct))
+    if any(changes.values()):
+        return changes
+    return None
+
+
+def plan_question_import(rows, exam_id=None):
+    """
+    Fingerprints every row (normalized text + section + exam) and matches it
+    against the existing questions of the referenced exams, loaded with one
+    query for questions and one for their options.
+    """
+    plan = ImportPlan()
+    validator = QuestionRowValidator(exam_id=exam_id)
+
+    rows = [(n, row) for n, row in rows if any(row.values())]
+    plan.report.rows = len(rows)
+    validator.load_exams(rows)
+
+    validated = []
+    for row_number, row in rows:
+        try:
+            validated.append((row_number, *validator.validate(row)))
+        except RowError as e:
+            plan.report.add_error(row_number, str(e))
+
+    exam_ids = {question.exam_id for _, question, _ in validated}
+    existing = {}
+    for question in Question.objects.filter(exam_id__in=exam_ids).only('id', 'exam_id', 'section', 'text', 'status', *SYNC_FIELDS):
+        existing.setdefault(fingerprint(question.exam_id, question.section, question.text), question)
+    existing_options = {}
+    for pk, question_id, text, is_correct in Option.objects.filter(
+        question__exam_id__in=exam_ids
+    ).values_list('id', 'question_id', 'text', 'is_correct'):
+        existing_options.setdefault(question_id, []).append((pk, text, is_correct))
+
+    seen = {}
+    for row_number, question, options in validated:
+        key = fingerprint(question.exam_id, question.section, question.text)
+        if key in seen:
+            plan.report.add_error(row_number, f"Duplicate of row {seen[key]} in this file")
+            continue
+        seen[key] = row_number
+
+        current = existing.get(key)
+        if current is None:
+            plan.inserts.append((row_number, question, options))
+            continue
+
+        fields = [f for f in SYNC_FIELDS if (getattr(current, f) or None) != (getattr(question, f) or None)]
+        option_changes = diff_options(existing_options.get(current.pk, []), options)
+        if not fields and not option_changes:
+            plan.skips.append((row_number, current.pk))
+            continue
+        if current.status == Question.ApprovalStatus.LOCKED:
+            plan.report.add_error(row_number, f"Question {current.pk} is locked and cannot be changed")
+            continue
+
+        for f in fields:
+            setattr(current, f, getattr(question, f))
+        plan.updates.append((row_number, current, fields, option_changes))
+
+    return plan
+
+
+def sync_questions_file(file_obj, exam_id=None, dry_run=False, filename=None):
+    """Plans (and unless dry_run, applies) a sync import of an uploaded file."""
+    plan = plan_question_import(iter_upload_rows(file_obj, filename), exam_id=exam_id)
+    if dry_run:
+        data = plan.as_dict()
+        data["dry_run"] = True
+        return data
+    return plan.apply()
@@ -0,0 +1,62 @@
+import io
+import os
+
+from django.core.management import call_command
+
+from cores.jobs import register
+from .dedup import index_questions as index_duplicates
+from .importers import import_questions_file, sync_questions_file
+
+
+@register('backup')
+def backup(job, incremental=False):
+    from scripts.backup_local import BackupError, database_path
+    # Raises with the reason (not SQLite, database missing), so the job fails
+    database_path()
+    if incremental:
+        from scripts.backup_store import SNAPSHOT_SUFFIX, run_snapshot
+        manifest = run_snapshot()
+        if manifest is None:
+            raise BackupError("The snapshot was not taken; see the worker log")
+        return {
+            "filename": manifest['name'] + SNAPSHOT_SUFFIX,
+            "new_chunks": manifest['new_chunks'],
+            "stored_bytes": manifest['stored_bytes'],
+        }
+    from scripts.backup_local import run_backup
+    path = run_backup()
+    if path is None:
+        raise BackupError("The backup was not taken; see the worker log")
+    return {"filename": os.path.basename(path)}
+
+
+@register('restore')
+def restore(job, filename):
+    out = io.StringIO()
+    call_command('restore_db', filename, stdout=out)
+    return {"filename": filename, "output": out.getvalue().strip()}
+
+
+@register('question_bulk_upload')
+def question_bulk_upload(job, path, exam_id=None, mode='append', dry_run=False):
+    def on_progress(report):
+        job.set_progress(0, f"{report.rows} rows processed, {report.created} created")
+
+    try:
+        with open(path, 'rb') as fh:
+            if mode == 'sync':
+                return sync_questions_file(fh, exam_id=exam_id, dry_run=dry_run, filename=path)
+            report = import_questions_file(fh, exam_id=exam_id, filename=path, on_progress=on_progress)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+    return report.as_dict()
+
+
+@register('duplicate_index')
+def duplicate_index(job, question_ids):
+    step = 1000
+    for start in range(0, len(question_ids), step):
+        index_duplicates(question_ids[start:start + step])
+        job.set_progress(100 * (start + step) // max(len(question_ids), 1), f"{start + step} questions indexed")
+    return {"indexed": len(question_ids)}
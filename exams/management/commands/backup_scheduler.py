@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import signal
+import sqlite3
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scripts import backup_catalog
+from scripts.backup_local import run_backup
+from scripts.backup_store import SNAPSHOT_SUFFIX, default_store, run_snapshot
+
+logger = logging.getLogger(__name__)
+
+# (setting with the number of buckets to keep, strftime key of the bucket)
+GFS_BUCKETS = [
+    ('BACKUP_KEEP_HOURLY', '%Y-%m-%d %H'),
+    ('BACKUP_KEEP_DAILY', '%Y-%m-%d'),
+    ('BACKUP_KEEP_WEEKLY', '%G-W%V'),
+    ('BACKUP_KEEP_MONTHLY', '%Y-%m'),
+]
+
+
+def gfs_keep(entries, limits):
+    """
+    Grandfather-father-son: the filenames of the newest backup in each of
+    the most recent N hours, days, weeks and months (plus the newest overall).
+    `limits` is one count per GFS_BUCKETS entry.
+    """
+    entries = sorted(entries, key=lambda e: e['created_at'], reverse=True)
+    keep = {entries[0]['filename']} if entries else set()
+    for limit, (_, key_format) in zip(limits, GFS_BUCKETS):
+        seen = set()
+        for entry in entries:
+            if len(seen) >= limit:
+                break
+            key = datetime.fromisoformat(entry['created_at']).strftime(key_format)
+            if key not in seen:
+                seen.add(key)
+                keep.add(entry['filename'])
+    return keep
+
+
+class ChangeDetector:
+    """
+    Tells whether the database changed since the last scheduled backup
+    without opening it: the size, mtime and header change counter of the
+    database and its WAL are compared with what was recorded after the last
+    backup. The fingerprint is taken when the backup starts; a connection
+    held open meanwhile watches `PRAGMA data_version`, which moves whenever
+    another connection commits. It is recorded only if the backup succeeded
+    and nothing moved, so anything else makes the next run back up again.
+    """
+
+    def __init__(self, db_path, state_path):
+        self.db_path = db_path
+        self.state_path = state_path
+        self.conn = None
+        self.version = None
+        self.started = None
+
+    def fingerprint(self):
+        parts = []
+        with open(self.db_path, 'rb') as fh:
+            fh.seek(24)
+            parts.append(fh.read(4).hex())
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                stats = os.stat(path)
+            except FileNotFoundError:
+                parts.append(None)
+                continue
+            # An empty WAL appears whenever a connection opens; it's not a change
+            parts.append([stats.st_size, stats.st_mtime_ns] if stats.st_size else None)
+        return parts
+
+    def changed(self):
+        try:
+            with open(self.state_path) as fh:
+                return json.load(fh).get('fingerprint') != self.fingerprint()
+        except (FileNotFoundError, ValueError):
+            return True
+
+    def begin(self):
+        self.conn = sqlite3.connect(self.db_path, timeout=30)
+        self.version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        # After data_version: a commit in between moves it and the state is dropped
+        self.started = self.fingerprint()
+
+    def end(self, backed_up):
+        """
+        Records the state from begin() as backed up when the backup succeeded
+        and nobody wrote meanwhile, else forgets it; returns whether nobody wrote.
+        """
+        clean = self.conn.execute("PRAGMA data_version").fetchone()[0] == self.version
+        self.conn.close()
+        self.conn = None
+        if backed_up and clean:
+            tmp_path = self.state_path + '.tmp'
+            with open(tmp_path, 'w') as fh:
+                json.dump({"fingerprint": self.started, "backed_up_at": datetime.now().isoformat()}, fh)
+            os.replace(tmp_path, self.state_path)
+        elif os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        return clean
+
+
+class Command(BaseCommand):
+    help = 'Takes scheduled backups when the database changed and applies GFS retention and a disk budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run one round and exit (for cron)')
+        parser.add_argument('--interval', type=float, default=getattr(settings, 'BACKUP_SCHEDULE_MINUTES', 15),
+                            help='Minutes between rounds')
+        parser.add_argument('--full', action='store_true',
+                            help='Take full gzip backups instead of incremental snapshots')
+        parser.add_argument('--budget-mb', type=int, default=getattr(settings, 'BACKUP_DISK_BUDGET_MB', 0),
+                            help='Delete the oldest scheduled backups while BACKUP_DIR is larger (0 = no limit)')
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("backup_scheduler only supports SQLite databases")
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+
+        os.makedirs(settings.BACKUP_DIR, exist_ok=True)
+        detector = ChangeDetector(str(database['NAME']), os.path.join(settings.BACKUP_DIR, '.scheduler_state.json'))
+        while not self.stopping:
+            started = time.monotonic()
+            if options['once']:
+                self.run_round(detector, options)
+                break
+            try:
+                self.run_round(detector, options)
+            except Exception as e:
+                # One bad round (disk full, locked database) mustn't end the schedule
+                logger.exception("Scheduled backup round failed")
+                self.stderr.write(f"Backup round failed: {e}; retrying in {options['interval']:g} minutes")
+            # Sleep in short steps so SIGTERM is handled promptly
+            while not self.stopping and time.monotonic() - started < options['interval'] * 60:
+                time.sleep(1)
+
+    def run_round(self, detector, options):
+        if not detector.changed():
+            self.stdout.write("No changes since the last scheduled backup; skipped")
+        else:
+            detector.begin()
+            result = None
+            try:
+                if options['full']:
+                    result = run_backup(prefix='scheduled_backup', source='scheduled')
+                else:
+                    result = run_snapshot(prefix='scheduled', source='scheduled')
+            finally:
+                clean = detector.end(backed_up=result is not None)
+            if result is None:
+                # Retention is skipped too: no old backup goes before a new one exists
+                raise CommandError("Scheduled backup failed")
+            if not clean:
+                self.stdout.write("Database changed during the backup; the next round backs up again")
+        self.apply_retention(options['budget_mb'])
+
+    def apply_retention(self, budget_mb):
+        backup_dir = settings.BACKUP_DIR
+        store = default_store()
+        scheduled = [
+            e for e in (backup_catalog.load(backup_dir) or {}).values()
+            if e.get('source') == 'scheduled'
+        ]
+        keep = gfs_keep(scheduled, [getattr(settings, name, 0) for name, _ in GFS_BUCKETS])
+        removed_snapshot = False
+        for entry in scheduled:
+            if entry['filename'] not in keep:
+                backup_catalog.delete_backup(backup_dir, entry['filename'])
+                removed_snapshot |= entry['filename'].endswith(SNAPSHOT_SUFFIX)
+                self.stdout.write(f"Expired {entry['filename']}")
+        if removed_snapshot:
+            store.gc()
+
+        if not budget_mb:
+            return
+        budget = budget_mb * 1024 * 1024
+        remaining = sorted((e for e in scheduled if e['filename'] in keep), key=lambda e: e['created_at'])
+        used = directory_size(backup_dir)
+        # Oldest first, never the newest scheduled backup
+        while used > budget and len(remaining) > 1:
+            entry = remaining.pop(0)
+            backup_catalog.delete_backup(backup_dir, entry['filename'])
+            if entry['filename'].endswith(SNAPSHOT_SUFFIX):
+                store.gc()
+            used = directory_size(backup_dir)
+            self.stdout.write(f"Removed {entry['filename']} to stay within the {budget_mb} MB budget")
+        if used > budget:
+            self.stdout.write(self.style.WARNING(
+                f"Backups use {used / 1024 / 1024:.1f} MB, over the {budget_mb} MB budget"
+            ))
+
+    def request_stop(self, signum, frame):
+        # Finish the current round, then leave the loop
+        self.stopping = True
+
+
+def directory_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except FileNotFoundError:
+                continue
+    return total
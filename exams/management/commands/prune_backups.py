@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from scripts import backup_catalog
+from scripts.backup_store import GC_GRACE_SECONDS, SNAPSHOT_SUFFIX, default_store
+
+
+class Command(BaseCommand):
+    help = 'Applies the snapshot retention policy and removes chunks no snapshot uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-last', type=int, default=getattr(settings, 'BACKUP_SNAPSHOT_KEEP_LAST', 48),
+                            help='Always keep this many of the newest snapshots')
+        parser.add_argument('--keep-days', type=int, default=getattr(settings, 'BACKUP_SNAPSHOT_KEEP_DAYS', 7),
+                            help='Keep every snapshot younger than this many days')
+        parser.add_argument('--grace', type=int, default=GC_GRACE_SECONDS,
+                            help='Seconds a new unreferenced chunk survives (covers snapshots in progress)')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed')
+
+    def handle(self, *args, **options):
+        store = default_store()
+        cutoff = (datetime.now() - timedelta(days=options['keep_days'])).isoformat()
+        # manifests() is newest first; scheduled snapshots follow backup_scheduler's own retention
+        manifests = [m for m in store.manifests() if m.get('source') != 'scheduled']
+        expired = [
+            m for i, m in enumerate(manifests)
+            if i >= options['keep_last'] and m['created_at'] < cutoff
+        ]
+        for manifest in expired:
+            if not options['dry_run']:
+                backup_catalog.delete_backup(settings.BACKUP_DIR, manifest['name'] + SNAPSHOT_SUFFIX)
+            self.stdout.write(f"{'Would remove' if options['dry_run'] else 'Removed'} snapshot {manifest['name']}")
+
+        # A dry run keeps the manifests, so this only counts chunks that are already orphaned
+        removed, freed = store.gc(grace=options['grace'], dry_run=options['dry_run'])
+        verb = 'Would free' if options['dry_run'] else 'Freed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(expired)} snapshots expired; {verb} {removed} chunks ({freed / 1024 / 1024:.1f} MB)"
+        ))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from scripts import backup_catalog
+from scripts.backup_store import default_store
+
+
+class Command(BaseCommand):
+    help = 'Recreates backups/catalog.json from the backup files and snapshots on disk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quick', action='store_true',
+                            help='Only record names, sizes and dates (no checksums or row counts)')
+        parser.add_argument('--full', action='store_true',
+                            help='Re-read every backup instead of reusing existing catalogue entries')
+
+    def handle(self, *args, **options):
+        entries = backup_catalog.rebuild(
+            settings.BACKUP_DIR, default_store(),
+            describe=not options['quick'], reuse=not options['full'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Catalogued {len(entries)} backups in {backup_catalog.catalog_path(settings.BACKUP_DIR)}"
+        ))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from exams.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the question bank full-text search index from scratch'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {backend.__class__.__name__} index in {time.monotonic() - started:.2f}s"
+        ))
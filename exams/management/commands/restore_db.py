@@ -1,31 +1,158 @@
+import hashlib
 import os
 import shutil
-from django.core.management.base import BaseCommand
+import sqlite3
+import time
+import zlib
+
 from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from cores.maintenance import DrainTimeout, MaintenanceWindow
+from scripts import backup_catalog
+from scripts.backup_local import BackupError, open_backup
+from scripts.backup_store import SNAPSHOT_SUFFIX, default_store
+
 
 class Command(BaseCommand):
-    help = 'Restores the database from a specific backup file'
+    help = 'Verifies a backup and atomically swaps it in as the live database'
 
     def add_arguments(self, parser):
-        parser.add_argument('filename', type=str, help='The backup filename')
+        parser.add_argument('filename', type=str, help='The backup filename (or <name>.snapshot)')
+        parser.add_argument('--drain', type=float, default=getattr(settings, 'RESTORE_DRAIN_SECONDS', 30.0),
+                            help='Longest wait for in-flight requests and jobs before the swap is called off')
+        parser.add_argument('--force', action='store_true',
+                            help='Restore even if the backup has migrations this code does not know')
 
     def handle(self, *args, **options):
         filename = options['filename']
-        # Look in the local 'backups' folder
-        backup_file = os.path.join(settings.BASE_DIR, 'backups', filename)
-        db_path = os.path.join(settings.BASE_DIR, 'db.sqlite3')
+        database = settings.DATABASES['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError("restore_db only supports SQLite databases")
+        db_path = str(database['NAME'])
+
+        # Staged next to the live file so the final rename is atomic
+        staged = os.path.join(os.path.dirname(db_path), f".restore_{os.getpid()}.sqlite3")
+        # Known backups are checked from the catalogue before anything is read
+        entry = backup_catalog.get(settings.BACKUP_DIR, filename)
+        if entry and entry.get('migrations'):
+            self.check_compatibility(entry['migrations'], options['force'])
+        try:
+            started = time.perf_counter()
+            verified = self.stage(filename, staged, entry)
+            self.check_integrity(staged)
+            if not (entry and entry.get('migrations')):
+                conn = backup_catalog.connect_readonly(staged)
+                try:
+                    self.check_compatibility(backup_catalog.applied_migrations(conn), options['force'])
+                finally:
+                    conn.close()
+            prepared = time.perf_counter() - started
+
+            window = MaintenanceWindow(filename, drain=options['drain'])
+            with window:
+                safety_path = self.swap(staged, db_path)
+        except DrainTimeout as e:
+            raise CommandError(f"Restore called off, the live database is unchanged: {e}")
+        except (BackupError, OSError, EOFError, zlib.error) as e:
+            # OSError/EOFError/zlib.error also cover damaged gzip backups
+            raise CommandError(f"Restore failed: {e}")
+        finally:
+            if os.path.exists(staged):
+                os.remove(staged)
+
+        if safety_path:
+            self.stdout.write(f"Previous database kept at {safety_path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully restored {filename} ({verified}, prepared in {prepared:.2f}s); "
+            f"database unavailable for {window.downtime:.2f}s"
+        ))
 
-        if not os.path.exists(backup_file):
-            self.stdout.write(self.style.ERROR(f"Backup {filename} not found!"))
-            return
+    def check_compatibility(self, migrations, force):
+        status = backup_catalog.compatibility(migrations)
+        if status == 'newer' and not force:
+            raise CommandError(
+                "Backup was made by a newer version of the code (it has migrations this checkout "
+                "doesn't know); deploy that version first or pass --force"
+            )
+        if status == 'older':
+            self.stdout.write(self.style.WARNING(
+                "Backup predates the latest migrations; run `python manage.py migrate` after restoring"
+            ))
 
+    def stage(self, filename, staged, entry=None):
+        """Writes the backup's database into `staged` and checks its checksum."""
+        if filename.endswith(SNAPSHOT_SUFFIX):
+            try:
+                default_store().write_snapshot(filename[:-len(SNAPSHOT_SUFFIX)], staged)
+            except KeyError:
+                raise CommandError(f"Backup {filename} not found")
+            return "checksum verified"
+
+        backup_file = os.path.join(settings.BACKUP_DIR, filename)
+        if os.path.basename(filename) != filename or not os.path.isfile(backup_file):
+            raise CommandError(f"Backup {filename} not found")
+        digest = hashlib.sha256()
+        with open_backup(backup_file) as src, open(staged, 'wb') as dst:
+            for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                digest.update(chunk)
+                dst.write(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        # Written by scripts/backup_local.py; older backups only have one once catalogued
+        sidecar = os.path.join(settings.BACKUP_DIR, filename.removesuffix('.gz') + '.sha256')
+        if os.path.exists(sidecar):
+            with open(sidecar) as fh:
+                expected = fh.read().split()[0]
+        elif entry and entry.get('sha256'):
+            expected = entry['sha256']
+        else:
+            return "no checksum on record"
+        if digest.hexdigest() != expected:
+            raise BackupError(f"{filename} does not match its recorded sha256")
+        return "checksum verified"
+
+    def check_integrity(self, path):
         try:
-            # Step 1: Create a temporary safety copy of current DB
-            shutil.copy2(db_path, db_path + ".tmp")
-            
-            # Step 2: Overwrite current DB with backup
-            shutil.copy2(backup_file, db_path)
-            
-            self.stdout.write(self.style.SUCCESS(f"Successfully restored {filename}"))
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Restore failed: {e}"))
\ No newline at end of file
+            conn = sqlite3.connect(path)
+            try:
+                result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError as e:
+            raise BackupError(f"Backup is not a readable SQLite database: {e}")
+        if result != 'ok':
+            raise BackupError(f"Backup failed integrity check: {result}")
+
+    def swap(self, staged, db_path):
+        """
+        Replaces the live database with `staged`; returns where the old one was
+        kept. Runs inside the maintenance window, once nothing else uses the file.
+        """
+        connections.close_all()
+
+        safety_path = None
+        if os.path.exists(db_path):
+            # Fold any WAL frames into the main file so the safety copy is complete
+            conn = sqlite3.connect(db_path, timeout=30)
+            try:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                conn.close()
+            # Every restore keeps its own copy, so a second restore can't replace the first's
+            safety_path = f"{db_path}.pre-restore-{timezone.now():%Y%m%d-%H%M%S-%f}"
+            # A hard link keeps the old file without copying it
+            try:
+                os.link(db_path, safety_path)
+            except OSError:
+                shutil.copy2(db_path, safety_path)
+
+        os.replace(staged, db_path)
+        # A leftover WAL from the old file would be replayed onto the restored one
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        return safety_path
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0008_remove_exam_price_remove_exam_randomize_questions_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='difficulty',
+            field=models.CharField(choices=[('easy', 'Easy'), ('medium', 'Medium'), ('hard', 'Hard')], default='medium', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='specialization',
+            field=models.CharField(blank=True, help_text='B2 track, e.g. Legal, Medical', max_length=100),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+
+FTS_TABLE = 'exams_question_fts'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "text, source_text, reference_translation, category, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {FTS_TABLE} (rowid, text, source_text, reference_translation, category) "
+        "SELECT q.id, q.text, COALESCE(q.source_text, ''), COALESCE(q.reference_translation, ''), "
+        "COALESCE(c.name, '') FROM exams_question q "
+        "JOIN exams_exam e ON e.id = q.exam_id "
+        "LEFT JOIN exams_examcategory c ON c.id = e.category_id"
+    )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0009_question_difficulty_specialization'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0010_question_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionLSHBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('text', 'Question text'), ('source', 'Source passage')], max_length=10)),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BigIntegerField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='exams.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'band', 'bucket'], name='exams_lsh_lookup_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionSignature',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('text', 'Question text'), ('source', 'Source passage')], max_length=10)),
+                ('minhash', models.BinaryField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signatures', to='exams.question')),
+            ],
+            options={
+                'unique_together': {('question', 'kind')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0011_question_duplicate_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='questions_per_section',
+            field=models.PositiveIntegerField(blank=True, help_text='Draw this many questions from each section pool per candidate (blank = all)', null=True),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='randomize_questions',
+            field=models.BooleanField(default=False, help_text='Shuffle question order within each section per candidate'),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='shuffle_options',
+            field=models.BooleanField(default=False, help_text='Shuffle MCQ option order per candidate'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0012_exam_candidate_forms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+    ]
@@ -47,6 +47,17 @@ class Exam(models.Model):
     
     duration_minutes = models.IntegerField(help_text="Duration in minutes")
     pass_mark_percentage = models.FloatField(default=50.0)
+    # Paystack amounts are checked against this; 0 = free, no payment needed
+    price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    # --- PER-CANDIDATE FORMS (see assessments.randomization) ---
+    randomize_questions = models.BooleanField(default=False, help_text="Shuffle question order within each section per candidate")
+    shuffle_options = models.BooleanField(default=False, help_text="Shuffle MCQ option order per candidate")
+    questions_per_section = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Draw this many questions from each section pool per candidate (blank = all)"
+    )
     
     GRADING_TYPES = [
         ('auto', 'Automatic'),
@@ -93,6 +104,11 @@ class Question(models.Model):
         APPROVED = 'approved', 'Approved'
         LOCKED = 'locked', 'Locked'
 
+    class Difficulty(models.TextChoices):
+        EASY = 'easy', 'Easy'
+        MEDIUM = 'medium', 'Medium'
+        HARD = 'hard', 'Hard'
+
     exam = models.ForeignKey(Exam, related_name='questions', on_delete=models.CASCADE)
     section = models.CharField(max_length=100, blank=True, null=True, help_text="e.g., Section A")
     
@@ -122,6 +138,8 @@ class Question(models.Model):
     
     # Guidelines (e.g., 'Do not translate proper nouns')
     translation_brief = models.TextField(blank=True, null=True)
+    # Moves with every change to the question (assessments.randomization keys cached papers on it)
+    updated_at = models.DateTimeField(auto_now=True)
 
     question_type = models.CharField(
         max_length=10, 
@@ -130,6 +148,14 @@ class Question(models.Model):
     )
     points = models.FloatField(default=1.0)
 
+    # --- CPT BANK METADATA ---
+    difficulty = models.CharField(
+        max_length=10,
+        choices=Difficulty.choices,
+        default=Difficulty.MEDIUM
+    )
+    specialization = models.CharField(max_length=100, blank=True, help_text="B2 track, e.g. Legal, Medical")
+
     def __str__(self):
         return f"[{self.section}] {self.exam.title} - {self.text[:30]}"
 
@@ -137,6 +163,36 @@ class Option(models.Model):
     question = models.ForeignKey(Question, related_name='options', on_delete=models.CASCADE)
     text = models.CharField(max_length=255)
     is_correct = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return self.text
\ No newline at end of file
+        return self.text
+
+class QuestionSignature(models.Model):
+    """
+    MinHash signature of a question's text (or source passage), used by the
+    near-duplicate index in exams.dedup.
+    """
+    class Kind(models.TextChoices):
+        TEXT = 'text', 'Question text'
+        SOURCE = 'source', 'Source passage'
+
+    question = models.ForeignKey(Question, related_name='signatures', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    minhash = models.BinaryField()
+
+    class Meta:
+        unique_together = ('question', 'kind')
+
+
+class QuestionLSHBucket(models.Model):
+    """One LSH band of a signature; questions sharing a bucket are duplicate candidates."""
+    question = models.ForeignKey(Question, related_name='lsh_buckets', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=QuestionSignature.Kind.choices)
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'band', 'bucket'], name='exams_lsh_lookup_idx'),
+        ]
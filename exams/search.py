@@ -0,0 +1,184 @@
+"""
+Question bank search index.
+
+The default backend on SQLite is an FTS5 table (`exams_question_fts`, rowid =
+question id) over the question text, source passage, reference translation
+and the exam category. Other databases fall back to a LIKE based backend.
+Set QUESTION_SEARCH_BACKEND to a dotted path to plug in something else.
+
+The index is kept in sync by the Question/Exam signals in `exams.signals`;
+code paths that bypass post_save (bulk_create, update) send `bank_changed`.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, When
+from django.utils.module_loading import import_string
+from rest_framework.filters import BaseFilterBackend
+
+FTS_TABLE = 'exams_question_fts'
+
+# SQLite limits the number of bound parameters; stay well below it
+ID_BATCH = 500
+
+# Filters accepted by `search`, mapped to Question lookups (the same as
+# QuestionViewSet's query params, so a filtered search is cut off after filtering)
+FILTER_LOOKUPS = {
+    'section': 'section',
+    'status': 'status',
+    'difficulty': 'difficulty',
+    'exam_id': 'exam_id',
+    'specialization': 'specialization',
+    'language_pair': 'exam__language_pair__pair_code',
+}
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Copies question rows (plus their exam's category name) into the index
+INDEX_SQL = (
+    f"INSERT INTO {FTS_TABLE} (rowid, text, source_text, reference_translation, category) "
+    "SELECT q.id, q.text, COALESCE(q.source_text, ''), COALESCE(q.reference_translation, ''), "
+    "COALESCE(c.name, '') FROM exams_question q "
+    "JOIN exams_exam e ON e.id = q.exam_id "
+    "LEFT JOIN exams_examcategory c ON c.id = e.category_id"
+)
+
+
+class LikeSearchBackend:
+    """Portable fallback: ranked by nothing, matched with icontains."""
+
+    def search(self, query, filters=None, limit=1000):
+        from .models import Question
+
+        qs = Question.objects.all()
+        for term in TOKEN_RE.findall(query):
+            qs = qs.filter(
+                Q(text__icontains=term) | Q(source_text__icontains=term) |
+                Q(reference_translation__icontains=term) | Q(exam__category__name__icontains=term)
+            )
+        for key, value in (filters or {}).items():
+            qs = qs.filter(**{FILTER_LOOKUPS[key]: value})
+        return list(qs.order_by('-id').values_list('id', flat=True)[:limit])
+
+    def index(self, question_ids):
+        pass
+
+    def remove(self, question_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class SQLiteFTSBackend:
+    """FTS5 index with bm25 ranking; filters are applied inside the same query."""
+
+    def match_expression(self, query):
+        # Every word must match; the last one also matches as a prefix
+        tokens = TOKEN_RE.findall(query)
+        if not tokens:
+            return None
+        terms = [f'"{t}"' for t in tokens[:-1]] + [f'"{tokens[-1]}"*']
+        return ' '.join(terms)
+
+    def search(self, query, filters=None, limit=1000):
+        expression = self.match_expression(query)
+        if expression is None:
+            return []
+
+        sql = [f"SELECT f.rowid FROM {FTS_TABLE} f"]
+        params = [expression]
+        where = [f"{FTS_TABLE} MATCH %s"]
+        if filters:
+            from .models import Question
+
+            # The filters become a subquery of the ranked query, so LIMIT counts filtered rows only
+            matching = Question.objects.filter(**{FILTER_LOOKUPS[key]: value for key, value in filters.items()})
+            sub_sql, sub_params = matching.values('id').query.sql_with_params()
+            where.append(f"f.rowid IN ({sub_sql})")
+            params.extend(sub_params)
+        sql.append("WHERE " + " AND ".join(where))
+        # Weights: text, source_text, reference_translation, category
+        sql.append(f"ORDER BY bm25({FTS_TABLE}, 4.0, 2.0, 1.0, 1.0) LIMIT %s")
+        params.append(limit)
+
+        with connection.cursor() as cursor:
+            cursor.execute(' '.join(sql), params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def index(self, question_ids):
+        ids = list(question_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(ids), ID_BATCH):
+                batch = ids[start:start + ID_BATCH]
+                marks = ','.join(['%s'] * len(batch))
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({marks})", batch)
+                cursor.execute(f"{INDEX_SQL} WHERE q.id IN ({marks})", batch)
+
+    def remove(self, question_ids):
+        ids = list(question_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(ids), ID_BATCH):
+                batch = ids[start:start + ID_BATCH]
+                cursor.execute(
+                    f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({','.join(['%s'] * len(batch))})", batch
+                )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(INDEX_SQL)
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'QUESTION_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTSBackend()
+        else:
+            _backend = LikeSearchBackend()
+    return _backend
+
+
+def reindex_questions(question_ids):
+    if question_ids:
+        get_search_backend().index(question_ids)
+
+
+def search_questions(query, filters=None, limit=1000):
+    """Returns question ids, best match first."""
+    return get_search_backend().search(query, filters=filters, limit=limit)
+
+
+class QuestionSearchFilter(BaseFilterBackend):
+    """
+    Ranked ?search= for QuestionViewSet. Every filter query param the view
+    applies (FILTER_LOOKUPS) is pushed into the index query, so the top
+    max_results are taken from the filtered questions.
+    """
+    search_param = 'search'
+    max_results = 500
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        filters = {
+            key: request.query_params[key]
+            for key in FILTER_LOOKUPS if request.query_params.get(key)
+        }
+        ids = search_questions(query, filters=filters, limit=self.max_results)
+        if not ids:
+            return queryset.none()
+
+        rank = Case(*[When(pk=pk, then=pos) for pos, pk in enumerate(ids)], output_field=IntegerField())
+        return queryset.filter(pk__in=ids).order_by(rank)
@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from django.apps import apps
 from .models import Exam, Question, Option, ExamCategory
-from payments.models import Payment
+from payments.entitlements import paid_exam_ids
 from assessments.models import ExamSession
+from assessments.randomization import session_form, candidate_view
 from cores.models import LanguagePair
 from django.utils import timezone
 
@@ -35,7 +36,7 @@ class QuestionSerializer(serializers.ModelSerializer):
         model = Question
         fields = [
             'id', 'exam', 'exam_title', 'question_text', 'question_type', 'status',
-            'points', 'section',
+            'points', 'section', 'difficulty', 'specialization',
             'options', 'options_data'
         ]
 
@@ -78,9 +79,10 @@ class ExamSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'title', 'description', 'category', 'is_blueprint', 'blueprint',
             'language_pair_id', 'language_pair_display',
-            'duration_minutes', 'passing_score', 'grading_type',
+            'duration_minutes', 'passing_score', 'grading_type', 'price',
             'is_active', 'total_questions',
-            'weight_section_a', 'weight_section_b', 'weight_section_c'
+            'weight_section_a', 'weight_section_b', 'weight_section_c',
+            'randomize_questions', 'shuffle_options', 'questions_per_section'
         ]
 
     def validate(self, data):
@@ -129,7 +131,10 @@ class ExamListSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or not request.user.is_authenticated:
             return False
-        return Payment.objects.filter(user=request.user, exam=obj, status='success').exists()
+        # One cached set for the whole list (many=True shares this serializer)
+        if not hasattr(self, '_paid_exam_ids'):
+            self._paid_exam_ids = paid_exam_ids(request.user)
+        return obj.id in self._paid_exam_ids
 
 class ExamDetailSerializer(ExamSerializer):
     # Groups questions into sections for the CPT UI
@@ -154,16 +159,28 @@ class ExamSessionSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class ExamSessionStartSerializer(serializers.ModelSerializer):
-    questions = QuestionSerializer(source='exam.questions', many=True, read_only=True)
+    # The candidate's own form (seeded draw/order, no answer key)
+    questions = serializers.SerializerMethodField()
     exam_title = serializers.CharField(source='exam.title', read_only=True)
     duration_minutes = serializers.IntegerField(source='exam.duration_minutes', read_only=True)
-    total_questions = serializers.IntegerField(source='exam.questions.count', read_only=True)
+    total_questions = serializers.SerializerMethodField()
     time_remaining_seconds = serializers.SerializerMethodField()
 
     class Meta:
         model = ExamSession
         fields = ['id', 'exam', 'exam_title', 'duration_minutes', 'total_questions', 'questions', 'start_time', 'time_remaining_seconds']
 
+    def get_form(self, obj):
+        if getattr(self, '_form_for', None) != obj.pk:
+            self._form_for, self._form = obj.pk, session_form(obj)
+        return self._form
+
+    def get_questions(self, obj):
+        return candidate_view(self.get_form(obj))
+
+    def get_total_questions(self, obj):
+        return len(self.get_form(obj))
+
     def get_time_remaining_seconds(self, obj):
         if obj.end_time: return 0
         elapsed = (timezone.now() - obj.start_time).total_seconds()
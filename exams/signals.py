@@ -0,0 +1,53 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver, Signal
+
+from cores.jobs import enqueue
+from .dedup import SYNC_INDEX_LIMIT, index_questions as index_duplicates
+from .models import Exam, ExamCategory, Question
+from .search import get_search_backend, reindex_questions
+
+# Sent by code that changes questions without post_save (bulk_create,
+# bulk_update, queryset.update) with `question_ids`.
+bank_changed = Signal()
+
+
+def questions_changed(question_ids, text_changed=True):
+    bank_changed.send(sender=Question, question_ids=list(question_ids), text_changed=text_changed)
+
+
+@receiver(bank_changed)
+def sync_bank_indexes(sender, question_ids, text_changed=True, **kwargs):
+    reindex_questions(question_ids)
+    if not text_changed:
+        return
+    # Large batches (imports) get their duplicate signatures from the job worker
+    if len(question_ids) > SYNC_INDEX_LIMIT:
+        enqueue('duplicate_index', {"question_ids": question_ids})
+    else:
+        index_duplicates(question_ids)
+
+
+# --- Per-row changes ---
+
+@receiver(post_save, sender=Question)
+def index_question(sender, instance, raw=False, **kwargs):
+    if not raw:
+        questions_changed([instance.pk])
+
+
+@receiver(post_delete, sender=Question)
+def unindex_question(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Exam)
+def index_exam_questions(sender, instance, created=False, raw=False, **kwargs):
+    # The exam's category and language pair belong to every question's index entries
+    if not raw and not created:
+        reindex_questions(list(instance.questions.values_list('id', flat=True)))
+
+
+@receiver(post_save, sender=ExamCategory)
+def index_category_questions(sender, instance, created=False, raw=False, **kwargs):
+    if not raw and not created:
+        reindex_questions(list(Question.objects.filter(exam__category=instance).values_list('id', flat=True)))
@@ -1,3 +1,1127 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import zlib
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cores.jobs import enqueue, run_job
+from cores.models import AuditLog, BackgroundJob
+from cores.maintenance import MaintenanceWindow
+from cores.models import LanguagePair
+from scripts import backup_catalog
+from scripts.backup_local import BackupError, write_backup
+from scripts.backup_store import ChunkStore, run_snapshot
+from .assembly import AssemblyError, BankIndex, assemble, clone_form, plan_forms, select_form
+from .dedup import duplicates_in_rows, duplicates_of_question, minhash, similarity
+from . import facets
+from .management.commands.backup_scheduler import ChangeDetector, Command as SchedulerCommand, gfs_keep
+from .management.commands.restore_db import Command as RestoreCommand
+from .importers import (
+    diff_options, import_question_rows, import_questions_file, iter_upload_rows, parse_options, plan_question_import,
+    sync_questions_file,
+)
+from users.models import User
+from .models import Exam, ExamCategory, Option, Question, QuestionLSHBucket, QuestionSignature
+from .search import LikeSearchBackend, QuestionSearchFilter, SQLiteFTSBackend
+from .signals import questions_changed
+
+
+class BackupJobTests(TestCase):
+    def test_backup_without_a_database_fails(self):
+        # A copy: the test connection keeps using its own settings dict
+        missing = {'default': dict(settings.DATABASES['default'], NAME='/nonexistent/db.sqlite3')}
+        for payload in (None, {"incremental": True}):
+            with self.subTest(payload=payload), mock.patch.object(settings, 'DATABASES', missing):
+                job = enqueue('backup', payload)
+                self.assertFalse(run_job(job))
+
+                job.refresh_from_db()
+                self.assertEqual(job.status, BackgroundJob.Status.FAILED)
+                self.assertIn('Database not found at /nonexistent/db.sqlite3', job.error)
+
+
+class RestoreTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        overrides = override_settings(
+            BACKUP_DIR=self.dir,
+            RESTORE_FLAG_FILE=os.path.join(self.dir, '.restore_in_progress'),
+            RESTORE_LOCK_FILE=os.path.join(self.dir, '.restore.lock'),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.command = RestoreCommand(stdout=io.StringIO())
+
+    def make_db(self, path, value):
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE t (v TEXT)")
+        conn.execute("INSERT INTO t VALUES (?)", (value,))
+        conn.commit()
+        conn.close()
+
+    def value(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("SELECT v FROM t").fetchone()[0]
+        finally:
+            conn.close()
+
+    def make_backup(self, name, value, sidecar=True):
+        raw = os.path.join(self.dir, 'raw.sqlite3')
+        self.make_db(raw, value)
+        with open(raw, 'rb') as fh:
+            data = fh.read()
+        os.remove(raw)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(os.path.join(self.dir, name), 'wb') as fh:
+            fh.write(data)
+        if sidecar:
+            with open(os.path.join(self.dir, name.removesuffix('.gz') + '.sha256'), 'w') as fh:
+                fh.write(f"{hashlib.sha256(data).hexdigest()}  {name}\n")
+        return data
+
+    def test_stage_checks_the_recorded_checksum(self):
+        staged = os.path.join(self.dir, 'staged.sqlite3')
+        for name in ('b.sqlite3', 'c.sqlite3.gz'):
+            with self.subTest(name=name):
+                data = self.make_backup(name, 'backup')
+                self.assertEqual(self.command.stage(name, staged), 'checksum verified')
+                with open(staged, 'rb') as fh:
+                    self.assertEqual(fh.read(), data)
+                self.command.check_integrity(staged)
+
+        # Without a sidecar the catalogue entry's checksum is used
+        data = self.make_backup('d.sqlite3', 'backup', sidecar=False)
+        self.assertEqual(self.command.stage('d.sqlite3', staged), 'no checksum on record')
+        entry = {'sha256': hashlib.sha256(data).hexdigest()}
+        self.assertEqual(self.command.stage('d.sqlite3', staged, entry), 'checksum verified')
+
+    def test_written_backup_restores(self):
+        source = os.path.join(self.dir, 'source.sqlite3')
+        self.make_db(source, 'original')
+        entry = write_backup(source, self.dir, 'manual_backup_x', pages=1, sleep=0)
+
+        path = os.path.join(self.dir, 'manual_backup_x.sqlite3.gz')
+        self.assertEqual(entry['filename'], 'manual_backup_x.sqlite3.gz')
+        with open(path, 'rb') as fh:
+            compressed = fh.read()
+        data = gzip.decompress(compressed)
+        self.assertEqual(entry['sha256'], hashlib.sha256(data).hexdigest())
+        self.assertEqual(entry['file_sha256'], hashlib.sha256(compressed).hexdigest())
+        with open(os.path.join(self.dir, 'manual_backup_x.sqlite3.sha256')) as fh:
+            self.assertEqual(fh.read(), f"{entry['sha256']}  manual_backup_x.sqlite3\n")
+        with open(path + '.sha256') as fh:
+            self.assertEqual(fh.read(), f"{entry['file_sha256']}  manual_backup_x.sqlite3.gz\n")
+        # No snapshot or partial file is left behind
+        self.assertEqual(sorted(name for name in os.listdir(self.dir) if name.startswith('manual_backup_x')), [
+            'manual_backup_x.sqlite3.gz', 'manual_backup_x.sqlite3.gz.sha256', 'manual_backup_x.sqlite3.sha256',
+        ])
+        self.assertFalse([name for name in os.listdir(self.dir) if name.startswith('.snapshot_')])
+
+        staged = os.path.join(self.dir, 'staged.sqlite3')
+        self.assertEqual(self.command.stage(entry['filename'], staged), 'checksum verified')
+        self.command.check_integrity(staged)
+        live = os.path.join(self.dir, 'live.sqlite3')
+        self.make_db(live, 'live')
+        with MaintenanceWindow(entry['filename'], drain=0.1):
+            self.command.swap(staged, live)
+        self.assertEqual(self.value(live), 'original')
+
+    def test_stage_rejects_mismatches_and_unknown_files(self):
+        staged = os.path.join(self.dir, 'staged.sqlite3')
+        self.make_backup('b.sqlite3', 'backup')
+        with open(os.path.join(self.dir, 'b.sqlite3'), 'ab') as fh:
+            fh.write(b'tampered')
+        with self.assertRaisesMessage(BackupError, 'does not match its recorded sha256'):
+            self.command.stage('b.sqlite3', staged)
+        for name in ('missing.sqlite3', '../b.sqlite3'):
+            with self.subTest(name=name), self.assertRaisesMessage(Exception, 'not found'):
+                self.command.stage(name, staged)
+
+    def test_integrity_check_rejects_garbage(self):
+        path = os.path.join(self.dir, 'garbage.sqlite3')
+        with open(path, 'wb') as fh:
+            fh.write(b'not a database' * 100)
+        with self.assertRaises(BackupError):
+            self.command.check_integrity(path)
+
+    def test_swap_keeps_each_previous_database(self):
+        live = os.path.join(self.dir, 'live.sqlite3')
+        self.make_db(live, 'live')
+        with open(live + '-wal', 'wb') as fh:
+            fh.write(b'stale')
+
+        safety_paths = []
+        for value in ('first', 'second'):
+            staged = os.path.join(self.dir, f'{value}.sqlite3')
+            self.make_db(staged, value)
+            with MaintenanceWindow('b.sqlite3', drain=0.1):
+                safety_paths.append(self.command.swap(staged, live))
+
+        self.assertEqual(self.value(live), 'second')
+        self.assertFalse(os.path.exists(live + '-wal'))
+        self.assertNotEqual(safety_paths[0], safety_paths[1])
+        self.assertTrue(all('.pre-restore-' in path for path in safety_paths))
+        self.assertEqual([self.value(path) for path in safety_paths], ['live', 'first'])
+
+
+class BackupStoreTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.db = os.path.join(self.dir, 'live.sqlite3')
+        conn = sqlite3.connect(self.db)
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v BLOB)")
+        conn.executemany("INSERT INTO t (v) VALUES (?)", [(os.urandom(2000),) for _ in range(100)])
+        conn.commit()
+        conn.close()
+        self.store = ChunkStore(os.path.join(self.dir, 'backups', 'store'), chunk_size=4096)
+
+    def snapshot(self, name):
+        return self.store.create_snapshot(self.db, name, pages=16, sleep=0)
+
+    def restored(self, name):
+        path = os.path.join(self.dir, f'{name}.restored.sqlite3')
+        self.store.write_snapshot(name, path)
+        conn = sqlite3.connect(path)
+        try:
+            return dict(conn.execute("SELECT id, v FROM t"))
+        finally:
+            conn.close()
+
+    def rows(self):
+        conn = sqlite3.connect(self.db)
+        try:
+            return dict(conn.execute("SELECT id, v FROM t"))
+        finally:
+            conn.close()
+
+    def chunk_files(self):
+        return {name for _, _, names in os.walk(self.store.chunk_dir) for name in names}
+
+    def test_snapshot_round_trip(self):
+        manifest = self.snapshot('a')
+        self.assertGreater(len(manifest['chunks']), 10)
+        self.assertEqual(manifest['new_chunks'], len(set(manifest['chunks'])))
+        self.assertEqual(manifest['tables']['t'], 100)
+        self.assertEqual(self.restored('a'), self.rows())
+        self.assertEqual(hashlib.sha256(b''.join(self.store.iter_snapshot('a'))).hexdigest(), manifest['sha256'])
+
+    def test_corrupt_chunks_are_detected(self):
+        manifest = self.snapshot('a')
+        path = self.store.chunk_path(manifest['chunks'][3])
+        with open(path, 'wb') as fh:
+            fh.write(zlib.compress(b'x' * 4096))
+        with self.assertRaisesMessage(BackupError, 'is corrupt'):
+            self.store.write_snapshot('a', os.path.join(self.dir, 'out.sqlite3'))
+        os.remove(path)
+        with self.assertRaisesMessage(BackupError, 'missing or unreadable'):
+            self.store.write_snapshot('a', os.path.join(self.dir, 'out.sqlite3'))
+
+    def test_snapshots_share_unchanged_chunks(self):
+        first = self.snapshot('a')
+        conn = sqlite3.connect(self.db)
+        conn.execute("UPDATE t SET v = ? WHERE id = 50", (b'changed',))
+        conn.commit()
+        conn.close()
+        second = self.snapshot('b')
+
+        self.assertNotEqual(first['sha256'], second['sha256'])
+        self.assertLessEqual(second['new_chunks'], 3)
+        self.assertGreater(len(set(first['chunks']) & set(second['chunks'])), len(second['chunks']) - 4)
+        self.assertEqual(len(self.chunk_files()), len(set(first['chunks']) | set(second['chunks'])))
+        self.assertEqual(self.restored('b')[50], b'changed')
+        self.assertNotEqual(self.restored('a')[50], b'changed')
+
+    def test_names_are_unique(self):
+        self.snapshot('a')
+        with self.assertRaisesMessage(BackupError, 'Snapshot a already exists'):
+            self.snapshot('a')
+
+        databases = {'default': dict(settings.DATABASES['default'], NAME=self.db)}
+        with mock.patch.object(settings, 'DATABASES', databases), \
+                override_settings(BACKUP_DIR=os.path.join(self.dir, 'backups')), \
+                mock.patch('builtins.print'):
+            names = {run_snapshot()['name'] for _ in range(3)}
+        self.assertEqual(len(names), 3)
+        self.assertEqual(len(ChunkStore(self.store.root).manifests()), 4)
+
+    def test_gc_removes_only_unreferenced_chunks(self):
+        first = self.snapshot('a')
+        conn = sqlite3.connect(self.db)
+        conn.execute("UPDATE t SET v = randomblob(2000) WHERE id > 50")
+        conn.commit()
+        conn.close()
+        second = self.snapshot('b')
+        orphaned = set(first['chunks']) - set(second['chunks'])
+        self.assertTrue(orphaned)
+
+        self.store.delete_snapshot('a')
+        # Recent chunks are kept: a snapshot in progress may rely on them
+        self.assertEqual(self.store.gc(), (0, 0))
+        self.assertEqual(self.store.gc(grace=0, dry_run=True)[0], len(orphaned))
+        self.assertEqual(self.chunk_files(), set(first['chunks']) | set(second['chunks']))
+
+        removed, freed = self.store.gc(grace=0)
+        self.assertEqual(removed, len(orphaned))
+        self.assertGreater(freed, 0)
+        self.assertEqual(self.chunk_files(), set(second['chunks']))
+        self.assertEqual(self.restored('b'), self.rows())
+
+    def test_prune_keeps_recent_and_scheduled_snapshots(self):
+        backup_dir = os.path.join(self.dir, 'backups')
+        now = datetime.now()
+        for name, source, created_at in (
+            ('old_1', 'manual', now - timedelta(days=30)), ('old_2', 'manual', now - timedelta(days=31)),
+            ('scheduled_1', 'scheduled', now - timedelta(days=40)), ('new_1', 'manual', now),
+        ):
+            manifest = self.snapshot(name)
+            manifest.update(source=source, created_at=created_at.isoformat())
+            with open(self.store.manifest_path(name), 'w') as fh:
+                json.dump(manifest, fh)
+            backup_catalog.add(backup_dir, {'filename': f'{name}.snapshot', 'type': 'snapshot'})
+
+        with override_settings(BACKUP_DIR=backup_dir):
+            call_command('prune_backups', keep_last=2, keep_days=7, grace=0, stdout=io.StringIO())
+
+        self.assertEqual(sorted(m['name'] for m in self.store.manifests()), ['new_1', 'old_1', 'scheduled_1'])
+        self.assertNotIn('old_2.snapshot', backup_catalog.load(backup_dir))
+        self.assertEqual(self.chunk_files(), self.store.referenced_chunks())
+
+
+class DownloadBackupTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        overrides = override_settings(BACKUP_DIR=self.dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        for name in ('b.sqlite3', 'notes.txt', '.partial.sqlite3'):
+            with open(os.path.join(self.dir, name), 'wb') as fh:
+                fh.write(b'data')
+        with open(os.path.join(self.dir, 'b.sqlite3.sha256'), 'w') as fh:
+            fh.write(f"{hashlib.sha256(b'data').hexdigest()}  b.sqlite3\n")
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', is_staff=True, role=User.Role.ADMIN
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(admin)
+
+    def download(self, filename):
+        return self.api.get(f'/api/admin/backups/download/{filename}/')
+
+    def test_catalogued_backup_is_served(self):
+        response = self.download('b.sqlite3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'data')
+
+    def test_digest_comes_from_the_record(self):
+        digest = base64.b64encode(hashlib.sha256(b'data').digest()).decode()
+        response = self.download('b.sqlite3')
+        self.assertEqual(response['Repr-Digest'], f'sha-256=:{digest}:')
+        self.assertEqual(response['Content-Digest'], f'sha-256=:{digest}:')
+
+        # No sidecar and nothing in the catalogue: served without digests rather than hashed now
+        os.remove(os.path.join(self.dir, 'b.sqlite3.sha256'))
+        with mock.patch('hashlib.sha256') as sha256:
+            response = self.download('b.sqlite3')
+        sha256.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Repr-Digest', response)
+        self.assertTrue(response['ETag'])
+
+        entries = backup_catalog.load(self.dir)
+        entries['b.sqlite3'].update(file_sha256=hashlib.sha256(b'data').hexdigest(), size=4)
+        backup_catalog.save(self.dir, entries)
+        self.assertEqual(self.download('b.sqlite3')['Repr-Digest'], f'sha-256=:{digest}:')
+
+    def test_other_files_are_not_served(self):
+        # Written after the catalogue: not listed until it is rebuilt
+        self.download('b.sqlite3')
+        with open(os.path.join(self.dir, 'late.sqlite3'), 'wb') as fh:
+            fh.write(b'data')
+        for name in ('b.sqlite3.sha256', 'notes.txt', '.partial.sqlite3', 'catalog.json', 'late.sqlite3'):
+            with self.subTest(name=name):
+                self.assertEqual(self.download(name).status_code, 404)
+
+
+    def test_only_catalogued_backups_are_deleted(self):
+        self.download('b.sqlite3')
+        for name in ('late.sqlite3', '.scheduler_state.json', '.catalog.lock'):
+            with open(os.path.join(self.dir, name), 'wb') as fh:
+                fh.write(b'data')
+        for name in ('b.sqlite3.sha256', 'notes.txt', '.partial.sqlite3', 'catalog.json', 'late.sqlite3',
+                     '.scheduler_state.json', '.catalog.lock', 'missing.snapshot'):
+            with self.subTest(name=name):
+                self.assertEqual(self.api.delete(f'/api/admin/backups/delete/{name}/').status_code, 404)
+                self.assertEqual(os.path.exists(os.path.join(self.dir, name)), name != 'missing.snapshot')
+
+        self.assertEqual(self.api.delete('/api/admin/backups/delete/b.sqlite3/').status_code, 200)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'b.sqlite3')))
+        self.assertFalse(os.path.exists(os.path.join(self.dir, 'b.sqlite3.sha256')))
+        self.assertNotIn('b.sqlite3', backup_catalog.load(self.dir))
+
+class BackupSchedulerTests(TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        overrides = override_settings(BACKUP_DIR=self.dir)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.db_path = os.path.join(self.dir, 'live.sqlite3')
+        self.write("CREATE TABLE t (v INTEGER)")
+        self.detector = ChangeDetector(self.db_path, os.path.join(self.dir, '.scheduler_state.json'))
+        self.options = {'full': False, 'budget_mb': 0}
+
+    def write(self, sql="INSERT INTO t VALUES (1)"):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(sql)
+        conn.commit()
+        conn.close()
+
+    def test_gfs_keep(self):
+        entries = [
+            {'filename': name, 'created_at': created_at}
+            for name, created_at in [
+                ('a', '2026-03-02T10:30:00'), ('b', '2026-03-02T10:05:00'), ('c', '2026-03-02T09:00:00'),
+                ('d', '2026-03-01T23:00:00'), ('e', '2026-02-27T12:00:00'), ('f', '2026-01-15T12:00:00'),
+            ]
+        ]
+        self.assertEqual(gfs_keep(entries, [0, 0, 0, 0]), {'a'})
+        self.assertEqual(gfs_keep(entries, [2, 0, 0, 0]), {'a', 'c'})
+        self.assertEqual(gfs_keep(entries, [0, 3, 0, 0]), {'a', 'd', 'e'})
+        # 2026-03-02 is a Monday: the previous week's newest is 'd'
+        self.assertEqual(gfs_keep(entries, [0, 0, 2, 0]), {'a', 'd'})
+        self.assertEqual(gfs_keep(entries, [0, 0, 0, 3]), {'a', 'e', 'f'})
+        self.assertEqual(gfs_keep([], [1, 1, 1, 1]), set())
+
+    def test_change_detection(self):
+        self.assertTrue(self.detector.changed())
+        self.detector.begin()
+        self.assertTrue(self.detector.end(backed_up=True))
+        self.assertFalse(self.detector.changed())
+
+        self.write()
+        self.assertTrue(self.detector.changed())
+
+    def test_write_during_backup_is_not_recorded(self):
+        self.detector.begin()
+        self.write()
+        self.assertFalse(self.detector.end(backed_up=True))
+        self.assertTrue(self.detector.changed())
+
+    def test_failed_backup_is_not_recorded(self):
+        self.detector.begin()
+        self.detector.end(backed_up=True)
+        self.write()
+        self.detector.begin()
+        self.assertTrue(self.detector.end(backed_up=False))
+        self.assertFalse(os.path.exists(self.detector.state_path))
+        self.assertTrue(self.detector.changed())
+
+    def test_round_fails_and_retries_when_the_backup_fails(self):
+        command = SchedulerCommand(stdout=io.StringIO())
+        with mock.patch('exams.management.commands.backup_scheduler.run_snapshot', return_value=None), \
+                mock.patch.object(command, 'apply_retention') as retention, \
+                self.assertRaisesMessage(CommandError, 'Scheduled backup failed'):
+            command.run_round(self.detector, self.options)
+        retention.assert_not_called()
+        self.assertTrue(self.detector.changed())
+
+        with mock.patch('exams.management.commands.backup_scheduler.run_snapshot', return_value={}) as snapshot, \
+                mock.patch.object(command, 'apply_retention'):
+            command.run_round(self.detector, self.options)
+            command.run_round(self.detector, self.options)
+        snapshot.assert_called_once()
+        self.assertIn('No changes since the last scheduled backup', command.stdout.getvalue())
+
+    def test_a_failing_round_does_not_stop_the_loop(self):
+        command = SchedulerCommand(stdout=io.StringIO(), stderr=io.StringIO())
+        rounds = []
+
+        def run_round(detector, options):
+            rounds.append(detector)
+            if len(rounds) == 1:
+                raise RuntimeError('disk full')
+            command.stopping = True
+
+        with mock.patch.object(command, 'run_round', side_effect=run_round), \
+                mock.patch('exams.management.commands.backup_scheduler.signal.signal'), \
+                self.assertLogs('exams.management.commands.backup_scheduler'):
+            command.handle(once=False, interval=0, full=False, budget_mb=0)
+        self.assertEqual(len(rounds), 2)
+        self.assertIn('disk full', command.stderr.getvalue())
+
+
+class AppendImportTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(title='Translation I', duration_minutes=60)
+
+    def row(self, text, options='', correct='', **extra):
+        return dict({
+            'exam_id': str(self.exam.id), 'section': 'Section A', 'question_text': text,
+            'question_type': 'mcq' if options else 'theory', 'options': options, 'correct_answer': correct,
+        }, **extra)
+
+    def test_options_go_to_their_own_questions_across_chunks(self):
+        rows = [
+            self.row('Q1', 'A|B', 'A'), self.row('Q2', 'C|D|E', 'E'), self.row('Essay'),
+            self.row('Q4', 'F|G', 'G'), self.row('Q5', 'H|I', 'H'),
+        ]
+        report = import_question_rows(enumerate(rows, start=2), chunk_size=2)
+
+        self.assertEqual((report.rows, report.created, report.error_count), (5, 5, 0))
+        options = {
+            q.text: [(o.text, o.is_correct) for o in q.options.order_by('id')]
+            for q in Question.objects.prefetch_related('options')
+        }
+        self.assertEqual(options, {
+            'Q1': [('A', True), ('B', False)],
+            'Q2': [('C', False), ('D', False), ('E', True)],
+            'Essay': [],
+            'Q4': [('F', False), ('G', True)],
+            'Q5': [('H', True), ('I', False)],
+        })
+
+    def test_bad_rows_are_reported_and_skipped(self):
+        rows = [
+            self.row('Good', 'A|B', 'A'),
+            self.row('No answer', 'A|B', 'C'),
+            self.row('', 'A|B', 'A'),
+            self.row('Bad exam', exam_id='999'),
+            self.row('Bad points', points='lots'),
+            self.row('Good essay'),
+        ]
+        report = import_question_rows(enumerate(rows, start=2), chunk_size=4)
+
+        self.assertEqual((report.rows, report.created), (6, 2))
+        self.assertEqual([e['row'] for e in report.errors], [3, 4, 5, 6])
+        self.assertEqual(sorted(Question.objects.values_list('text', flat=True)), ['Good', 'Good essay'])
+
+    def test_a_chunk_that_fails_to_insert_leaves_nothing_behind(self):
+        rows = [self.row('Q1', 'A|B', 'A'), self.row('Q2', 'A|B', 'A'), self.row('Q3', 'A|B', 'A')]
+        real_bulk_create = Option.objects.bulk_create
+        calls = []
+
+        def failing_second_chunk(objs, *args, **kwargs):
+            calls.append(objs)
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            return real_bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(Option.objects, 'bulk_create', side_effect=failing_second_chunk), \
+                self.assertRaises(RuntimeError):
+            import_question_rows(enumerate(rows, start=2), chunk_size=2)
+
+        # The first chunk stays whole; the second has neither questions nor options
+        self.assertEqual(list(Question.objects.values_list('text', flat=True)), ['Q1', 'Q2'])
+        self.assertEqual(Option.objects.count(), 4)
+
+    def test_upload_endpoint(self):
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', is_staff=True, role=User.Role.ADMIN
+        )
+        api = APIClient()
+        api.force_authenticate(admin)
+        upload = io.BytesIO(b"section,question_text,question_type,options,correct_answer\n"
+                            b"Section A,Pick one,mcq,A|B,B\nSection A,,mcq,A|B,B\n")
+        upload.name = 'bank.csv'
+
+        response = api.post('/api/questions/bulk-upload/', {'file': upload, 'exam_id': self.exam.id})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['errors'][0]['row']), (1, 3))
+        question = Question.objects.get()
+        self.assertEqual(question.exam, self.exam)
+        self.assertEqual(list(question.options.values_list('text', 'is_correct')), [('A', False), ('B', True)])
+
+
+class SyncImportTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(title='Translation I', duration_minutes=60)
+        self.question = Question.objects.create(
+            exam=self.exam, section='Section A', text='Capital of France?', question_type='MCQ', points=1,
+        )
+        self.paris = Option.objects.create(question=self.question, text='Paris', is_correct=True)
+        self.lyon = Option.objects.create(question=self.question, text='Lyon', is_correct=False)
+
+    def row(self, text='Capital of France?', options='Paris|Lyon', correct='Paris', **extra):
+        return dict({
+            'exam_id': str(self.exam.id), 'section': 'Section A', 'question_text': text,
+            'question_type': 'mcq', 'options': options, 'correct_answer': correct,
+        }, **extra)
+
+    def plan(self, *rows):
+        return plan_question_import(enumerate(rows, start=2))
+
+    def test_matching_row_is_skipped(self):
+        plan = self.plan(self.row())
+        self.assertEqual((len(plan.inserts), len(plan.updates), plan.skips), (0, 0, [(2, self.question.pk)]))
+
+    def test_fingerprint_ignores_case_and_spacing(self):
+        # Matched to the existing question; the file's spelling replaces the stored text
+        plan = self.plan(self.row(text='  capital OF   france? '))
+        self.assertEqual(plan.inserts, [])
+        (_, question, fields, options), = plan.updates
+        self.assertEqual((question.pk, fields, options), (self.question.pk, ['text'], None))
+
+    def test_changed_fields_and_options_are_planned(self):
+        plan = self.plan(
+            self.row(difficulty='hard', options='Paris|Marseille', correct='Paris'),
+            self.row(text='A new question', options='Yes|No', correct='No'),
+        )
+
+        self.assertEqual(len(plan.inserts), 1)
+        (row, question, fields, options), = plan.updates
+        self.assertEqual((row, question.pk), (2, self.question.pk))
+        self.assertIn('difficulty', fields)
+        self.assertEqual(options['delete'], [self.lyon.pk])
+        self.assertEqual(options['create'], [('Marseille', False)])
+        self.assertEqual(options['flip'], [])
+
+    def test_dry_run_writes_nothing(self):
+        data = sync_questions_file(
+            io.BytesIO(b"exam_id,section,question_text,question_type,options,correct_answer\n"
+                       + f"{self.exam.id},Section A,Capital of France?,mcq,Paris|Lyon,Lyon\n".encode()
+                       + f"{self.exam.id},Section A,Brand new,theory,,\n".encode()),
+            dry_run=True, filename='bank.csv',
+        )
+
+        self.assertEqual((data['to_create'], data['to_update'], data['unchanged']), (1, 1, 0))
+        self.assertEqual(data['plan']['update'][0]['fields'], ['options'])
+        self.assertTrue(data['dry_run'])
+        self.assertEqual(Question.objects.count(), 1)
+        self.paris.refresh_from_db()
+        self.assertTrue(self.paris.is_correct)
+
+    def test_apply_keeps_option_ids(self):
+        plan = self.plan(self.row(correct='Lyon', points='2'))
+        data = plan.apply()
+
+        self.assertEqual(data['updated'], 1)
+        self.question.refresh_from_db()
+        self.assertEqual(self.question.points, 2)
+        self.assertEqual(
+            set(self.question.options.values_list('id', 'is_correct')),
+            {(self.paris.pk, False), (self.lyon.pk, True)},
+        )
+
+    def test_duplicates_and_locked_questions_are_errors(self):
+        Question.objects.filter(pk=self.question.pk).update(status=Question.ApprovalStatus.LOCKED)
+        plan = self.plan(self.row(difficulty='hard'), self.row(difficulty='easy'))
+
+        self.assertEqual(plan.updates, [])
+        self.assertEqual([e['row'] for e in plan.report.errors], [2, 3])
+        self.assertIn('locked', plan.report.errors[0]['error'])
+        self.assertIn('Duplicate of row 2', plan.report.errors[1]['error'])
+
+    def test_diff_options(self):
+        existing = [(1, 'A', True), (2, 'B', False)]
+        self.assertIsNone(diff_options(existing, [('A', True), ('B', False)]))
+        changes = diff_options(existing, [('A', False), ('B', True), ('C', False)])
+        self.assertEqual([(o.id, o.is_correct) for o in changes['flip']], [(1, False), (2, True)])
+        self.assertEqual((changes['delete'], changes['create']), ([], [('C', False)]))
+
+
+class RowReaderTests(TestCase):
+    def test_xlsx_rows(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['Question_Text', 'Points', 'Options', None])
+        sheet.append(['  First  ', 2.0, 'A|B', 'ignored'])
+        sheet.append([None, None, None, None])
+        sheet.append(['Third', 1.5, None, None])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        buffer.seek(0)
+        buffer.name = 'bank.XLSX'
+
+        rows = list(iter_upload_rows(buffer))
+
+        self.assertEqual(rows, [
+            (2, {'question_text': 'First', 'points': '2', 'options': 'A|B'}),
+            (3, {'question_text': '', 'points': '', 'options': ''}),
+            (4, {'question_text': 'Third', 'points': '1.5', 'options': ''}),
+        ])
+
+    def test_jsonl_rows(self):
+        lines = [
+            '{"Question_Text": "Pick one", "points": 2, "options": ["A", {"text": "B", "is_correct": true}]}',
+            '',
+            'not json',
+            '[1, 2]',
+        ]
+        rows = list(iter_upload_rows(io.BytesIO('\n'.join(lines).encode('utf-8-sig')), 'bank.jsonl'))
+
+        self.assertEqual(rows[0], (1, {
+            'question_text': 'Pick one', 'points': '2', 'options': ['A', {'text': 'B', 'is_correct': True}],
+        }))
+        self.assertEqual([n for n, _ in rows], [1, 3, 4])
+        self.assertIn('Invalid JSON', rows[1][1]['_error'])
+        self.assertEqual(rows[2][1], {'_error': 'Each line must be a JSON object'})
+        self.assertEqual(parse_options(rows[0][1]), [('A', False), ('B', True)])
+
+    def test_jsonl_import_reports_bad_lines(self):
+        exam = Exam.objects.create(title='Translation I', duration_minutes=60)
+        lines = [
+            json.dumps({"exam_id": exam.id, "question_text": "Pick one", "options": ["A", "B"], "correct_answer": "b"}),
+            '{broken',
+            json.dumps({"exam_id": exam.id, "question_text": "Essay", "question_type": "essay"}),
+        ]
+        report = import_questions_file(io.BytesIO('\n'.join(lines).encode()), filename='bank.ndjson')
+
+        self.assertEqual((report.rows, report.created, report.error_count), (3, 2, 1))
+        self.assertEqual(report.errors[0]['row'], 2)
+        question = Question.objects.get(text='Pick one')
+        self.assertEqual(list(question.options.values_list('text', 'is_correct')), [('A', False), ('B', True)])
+
+    def test_unknown_extension_reads_csv(self):
+        rows = list(iter_upload_rows(io.BytesIO(b'\xef\xbb\xbfQuestion_Text, Points\nHello , 3\n'), 'bank.txt'))
+        self.assertEqual(rows, [(2, {'question_text': 'Hello', 'points': '3'})])
+
+
+class QuestionSearchTests(TestCase):
+    def setUp(self):
+        self.category = ExamCategory.objects.create(name='Legal')
+        self.exam = Exam.objects.create(title='Translation I', duration_minutes=60, category=self.category)
+        self.other_exam = Exam.objects.create(title='Translation II', duration_minutes=60)
+        self.in_text = Question.objects.create(exam=self.exam, text='Translate the contract clause', section='Section A')
+        self.in_source = Question.objects.create(
+            exam=self.exam, text='Render this passage', source_text='A contract between two parties',
+            section='Section B',
+        )
+        self.elsewhere = Question.objects.create(exam=self.other_exam, text='Contracts in general', section='Section A')
+
+    def test_fts_ranks_text_matches_first(self):
+        fts = SQLiteFTSBackend()
+        ids = fts.search('contract')
+        self.assertEqual(set(ids), {self.in_text.pk, self.in_source.pk, self.elsewhere.pk})
+        # Question text weighs more than the source passage
+        self.assertLess(ids.index(self.in_text.pk), ids.index(self.in_source.pk))
+        # The last word matches as a prefix
+        self.assertEqual(set(fts.search('contra')), {self.in_text.pk, self.in_source.pk, self.elsewhere.pk})
+        self.assertEqual(fts.search('contract clause'), [self.in_text.pk])
+        self.assertEqual(fts.search('!!!'), [])
+
+    def test_fts_filters_and_category(self):
+        fts = SQLiteFTSBackend()
+        self.assertEqual(fts.search('contra', filters={'exam_id': self.other_exam.pk}), [self.elsewhere.pk])
+        self.assertEqual(fts.search('contract', filters={'section': 'Section B'}), [self.in_source.pk])
+        self.assertEqual(set(fts.search('legal')), {self.in_text.pk, self.in_source.pk})
+
+    def test_fts_index_follows_changes(self):
+        fts = SQLiteFTSBackend()
+        self.in_text.text = 'Translate the lease'
+        self.in_text.save()
+        self.elsewhere.delete()
+        self.category.name = 'Medical'
+        self.category.save()
+
+        self.assertEqual(fts.search('contract'), [self.in_source.pk])
+        self.assertEqual(fts.search('contra'), [self.in_source.pk])
+        self.assertEqual(fts.search('lease'), [self.in_text.pk])
+        self.assertEqual(set(fts.search('medical')), {self.in_text.pk, self.in_source.pk})
+
+        # A rebuild gives the same answers
+        fts.rebuild()
+        self.assertEqual(fts.search('lease'), [self.in_text.pk])
+
+    def test_like_backend_matches_the_same_questions(self):
+        like, fts = LikeSearchBackend(), SQLiteFTSBackend()
+        for query, filters in [('contract', None), ('legal', None), ('contract', {'section': 'Section B'})]:
+            with self.subTest(query=query, filters=filters):
+                self.assertEqual(set(like.search(query, filters)), set(fts.search(query, filters)))
+
+    def test_search_param_orders_by_rank(self):
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', is_staff=True, role=User.Role.ADMIN
+        )
+        api = APIClient()
+        api.force_authenticate(admin)
+        response = api.get('/api/questions/', {'search': 'contract', 'exam_id': self.exam.pk})
+
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertEqual([q['id'] for q in results], [self.in_text.pk, self.in_source.pk])
+
+    def test_filters_apply_before_the_result_limit(self):
+        pair = LanguagePair.objects.create(source_language='English', target_language='French', pair_code='EN-FR')
+        paired_exam = Exam.objects.create(title='Translation III', duration_minutes=60, language_pair=pair)
+        # Better matches that the filters exclude fill the first max_results
+        for n in range(6):
+            Question.objects.create(exam=self.exam, text=f'Contract clause {n}', specialization='General')
+        legal = Question.objects.create(exam=paired_exam, text='Render this', source_text='contract',
+                                        specialization='Legal')
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', is_staff=True, role=User.Role.ADMIN
+        )
+        api = APIClient()
+        api.force_authenticate(admin)
+
+        with mock.patch.object(QuestionSearchFilter, 'max_results', 3):
+            for params in ({'specialization': 'Legal'}, {'language_pair': 'EN-FR'}):
+                with self.subTest(params=params):
+                    response = api.get('/api/questions/', dict(params, search='contract'))
+                    results = response.data['results'] if isinstance(response.data, dict) else response.data
+                    self.assertEqual([q['id'] for q in results], [legal.pk])
+        for backend in (SQLiteFTSBackend(), LikeSearchBackend()):
+            self.assertEqual(backend.search('contract', {'specialization': 'Legal'}, limit=1), [legal.pk])
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        self.pair = LanguagePair.objects.create(source_language='English', target_language='French', pair_code='EN-FR')
+        self.exam = Exam.objects.create(title='Translation I', duration_minutes=60, language_pair=self.pair)
+        self.draft = Question.objects.create(exam=self.exam, text='One', section='Section A', difficulty='easy')
+        Question.objects.create(exam=self.exam, text='Two', section='Section A', difficulty='hard')
+        Question.objects.create(exam=self.exam, text='Three', section='Section B', difficulty='hard')
+        admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', is_staff=True, role=User.Role.ADMIN
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(admin)
+        # Each web worker has its own cache; nothing invalidates one worker's entries from another
+        self.workers = [LocMemCache(f'facets-{n}', {}) for n in range(2)]
+        for worker in self.workers:
+            self.addCleanup(worker.clear)
+
+    def facets(self, worker=0, **params):
+        with mock.patch.object(facets, 'cache', self.workers[worker]):
+            response = self.api.get('/api/questions/facets/', dict(params, exam_id=self.exam.pk))
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def counts(self, data, name):
+        return {row['value']: row['count'] for row in data['facets'][name]}
+
+    def test_counts(self):
+        data = self.facets()
+        self.assertEqual(data['total'], 3)
+        self.assertEqual(self.counts(data, 'section'), {'Section A': 2, 'Section B': 1})
+        self.assertEqual(self.counts(data, 'difficulty'), {'hard': 2, 'easy': 1})
+        self.assertEqual(self.counts(data, 'language_pair'), {'EN-FR': 3})
+        # Sorted by count, then value
+        self.assertEqual([row['value'] for row in data['facets']['difficulty']], ['hard', 'easy'])
+
+        data = self.facets(section='Section A')
+        self.assertEqual(data['total'], 2)
+        self.assertEqual(self.counts(data, 'difficulty'), {'hard': 1, 'easy': 1})
+
+    def test_cached_counts_are_reused(self):
+        self.facets()
+        with mock.patch.object(facets, 'compute_facets') as compute:
+            self.facets()
+        compute.assert_not_called()
+
+    def test_changes_invalidate_every_worker(self):
+        for worker in range(2):
+            self.facets(worker)
+
+        with mock.patch.object(facets, 'cache', self.workers[0]):
+            self.draft.section = 'Section B'
+            self.draft.save()
+        self.assertEqual(self.counts(self.facets(1), 'section'), {'Section A': 1, 'Section B': 2})
+
+        Question.objects.filter(pk=self.draft.pk).update(difficulty='hard', updated_at=timezone.now())
+        self.assertEqual(self.counts(self.facets(1), 'difficulty'), {'hard': 3})
+
+        Question.objects.create(exam=self.exam, text='Four', section='Section C')
+        self.assertEqual(self.facets(1)['total'], 4)
+
+        self.pair.pair_code = 'EN-DE'
+        self.pair.save()
+        self.assertEqual(self.counts(self.facets(1), 'language_pair'), {'EN-DE': 4})
+
+        self.draft.delete()
+        self.assertEqual(self.facets(0)['total'], 3)
+
+    def test_bulk_approve_invalidates(self):
+        self.facets()
+        response = self.api.post('/api/questions/bulk-approve/', {'question_ids': [self.draft.pk]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counts(self.facets(), 'status'), {'draft': 2, 'approved': 1})
+
+
+CLAUSE = (
+    'The parties agree that any dispute arising out of or in connection with this contract '
+    'shall be referred to and finally resolved by arbitration under the rules of the court'
+)
+
+
+class DuplicateDetectionTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(title='Translation I', duration_minutes=60)
+        self.original = Question.objects.create(exam=self.exam, text=CLAUSE)
+
+    def matches(self, question, threshold=0.6):
+        return {row['question_id']: row['similarity'] for row in duplicates_of_question(question, threshold)}
+
+    def test_near_duplicates_are_found_above_the_threshold(self):
+        near = Question.objects.create(exam=self.exam, text=CLAUSE.replace('finally', 'ultimately'))
+        half = Question.objects.create(
+            exam=self.exam, text=CLAUSE.split(' with ')[0] + ' with the laws of the republic as amended from time to time',
+        )
+        Question.objects.create(exam=self.exam, text='Translate the following letter of credit into French')
+
+        score = similarity(minhash(near.text), minhash(CLAUSE))
+        self.assertGreaterEqual(score, 0.6)
+        self.assertLess(similarity(minhash(half.text), minhash(CLAUSE)), 0.6)
+
+        self.assertEqual(list(self.matches(self.original)), [near.pk])
+        self.assertEqual(self.matches(near), {self.original.pk: round(score, 2)})
+        # The same pair, with the bar set above its similarity
+        self.assertEqual(self.matches(near, threshold=score + 0.01), {})
+
+    def test_rows_are_checked_against_the_bank_and_each_other(self):
+        report = duplicates_in_rows([
+            (2, {'question_text': CLAUSE.upper()}),
+            (3, {'question_text': 'Summarise the attached press release in two hundred words'}),
+            (4, {'question_text': 'summarise the attached press release in two hundred words please'}),
+        ])
+        by_row = {entry['row']: entry for entry in report}
+        self.assertEqual(set(by_row), {2, 4})
+        self.assertEqual([m['question_id'] for m in by_row[2]['bank_matches']], [self.original.pk])
+        self.assertEqual([m['row'] for m in by_row[4]['file_matches']], [3])
+
+    def test_text_changes_are_reindexed(self):
+        other = Question.objects.create(exam=self.exam, text='Translate the following letter of credit into French')
+        self.assertEqual(self.matches(self.original), {})
+
+        other.text = CLAUSE + ' seated in London'
+        other.save()
+        self.assertEqual(list(self.matches(self.original)), [other.pk])
+
+        other.text = 'Translate the following letter of credit into French'
+        other.save()
+        self.assertEqual(self.matches(self.original), {})
+        self.assertEqual(QuestionSignature.objects.filter(question=other).count(), 1)
+
+    def test_bulk_changes_are_reindexed(self):
+        other = Question.objects.create(exam=self.exam, text='Translate the following letter of credit into French')
+        Question.objects.filter(pk=other.pk).update(text=CLAUSE)
+        questions_changed([other.pk])
+        self.assertEqual(list(self.matches(self.original)), [other.pk])
+
+    def test_deleted_questions_are_dropped(self):
+        copy = Question.objects.create(exam=self.exam, text=CLAUSE)
+        self.assertEqual(self.matches(self.original), {copy.pk: 1.0})
+
+        copy_id = copy.pk
+        copy.delete()
+        self.assertEqual(self.matches(self.original), {})
+        self.assertFalse(QuestionSignature.objects.filter(question_id=copy_id).exists())
+        self.assertFalse(QuestionLSHBucket.objects.filter(question_id=copy_id).exists())
+
+
+def bank(*pools):
+    """BankIndex rows: (section, difficulty, count, points) -> ids numbered from 1."""
+    rows = [(section, difficulty, points) for section, difficulty, count, points in pools for _ in range(count)]
+    return BankIndex([(n, section, difficulty, points) for n, (section, difficulty, points) in enumerate(rows, 1)])
+
+
+class FormPlanningTests(TestCase):
+    def test_each_section_meets_its_target(self):
+        index = bank(('Section A', 'easy', 10, 1.0), ('Section B', 'hard', 10, 2.0), ('section b', 'easy', 4, 5.0))
+        selection, report = select_form(index, {'Section A': 5.0, 'Section B': 20.0}, None, random.Random(1))
+
+        self.assertEqual(len(selection['Section A']), 5)
+        self.assertEqual(report['Section A'], {'target_points': 5.0, 'points': 5.0, 'questions': 5, 'shortfall': 0.0})
+        self.assertEqual(report['Section B']['points'], 20.0)
+        self.assertEqual(report['Section B']['shortfall'], 0.0)
+        self.assertEqual(len(set(selection['Section B'])), len(selection['Section B']))
+
+    def test_difficulty_mix_splits_the_target(self):
+        index = bank(('Section A', 'easy', 10, 1.0), ('Section A', 'medium', 10, 1.0), ('Section A', 'hard', 10, 1.0))
+        level = {qid: difficulty for (_, difficulty), pool in index.pools.items() for qid, _ in pool}
+
+        selection, report = select_form(index, {'Section A': 8.0}, {'easy': 0.75, 'hard': 0.25}, random.Random(1))
+
+        picked = [level[qid] for qid in selection['Section A']]
+        self.assertEqual((picked.count('easy'), picked.count('hard'), picked.count('medium')), (6, 2, 0))
+        self.assertEqual(report['Section A']['shortfall'], 0.0)
+
+    def test_short_difficulties_are_topped_up_from_the_section(self):
+        index = bank(('Section A', 'easy', 10, 1.0), ('Section A', 'hard', 1, 1.0))
+        _, report = select_form(index, {'Section A': 6.0}, {'hard': 1.0}, random.Random(1))
+        self.assertEqual(report['Section A']['points'], 6.0)
+        self.assertEqual(report['Section A']['shortfall'], 0.0)
+
+    def test_shortfall_is_reported(self):
+        index = bank(('Section A', 'easy', 3, 2.0), ('Section C', 'easy', 2, 1.0))
+        selection, report = select_form(index, {'Section A': 10.0, 'Section B': 5.0}, None, random.Random(1))
+
+        self.assertEqual(report['Section A'], {'target_points': 10.0, 'points': 6.0, 'questions': 3, 'shortfall': 4.0})
+        self.assertEqual(report['Section B'], {'target_points': 5.0, 'points': 0.0, 'questions': 0, 'shortfall': 5.0})
+        self.assertEqual(selection['Section B'], [])
+
+    def test_no_overlap_forms_share_no_questions(self):
+        index = bank(('Section A', 'easy', 9, 1.0), ('Section B', 'hard', 12, 1.0))
+        _, plans = plan_forms(index, {'Section A': 3.0, 'Section B': 4.0}, forms=3, no_overlap=True, seed=7)
+
+        forms = [{qid for ids in plan['selection'].values() for qid in ids} for plan in plans]
+        self.assertEqual([len(ids) for ids in forms], [7, 7, 7])
+        self.assertEqual(len(set().union(*forms)), 21)
+        self.assertTrue(all(s['shortfall'] == 0 for plan in plans for s in plan['sections'].values()))
+
+    def test_same_seed_same_forms(self):
+        first = plan_forms(bank(('Section A', 'easy', 20, 1.0)), {'Section A': 5.0}, forms=2, seed=42)
+        second = plan_forms(bank(('Section A', 'easy', 20, 1.0)), {'Section A': 5.0}, forms=2, seed=42)
+        self.assertEqual(first, second)
+
+
+class AssembleTests(TestCase):
+    def setUp(self):
+        self.bank_exam = Exam.objects.create(title='Bank', duration_minutes=60)
+        self.blueprint = Exam.objects.create(
+            title='CPT', duration_minutes=90, is_blueprint=True,
+            weight_section_a=100, weight_section_b=0, weight_section_c=0,
+        )
+        self.questions = [
+            Question.objects.create(
+                exam=self.bank_exam, section='Section A', status=Question.ApprovalStatus.APPROVED,
+                text=f'{CLAUSE} under clause {n}', points=2.0,
+            )
+            for n in range(4)
+        ]
+
+    def test_insufficient_bank_for_non_overlapping_forms(self):
+        with self.assertRaisesMessage(AssemblyError, 'Section A: the bank has 8 points, 12 are needed'):
+            assemble(self.blueprint, forms=3, total_points=4, no_overlap=True)
+        self.assertFalse(Exam.objects.filter(blueprint=self.blueprint).exists())
+
+        result = assemble(self.blueprint, forms=2, total_points=4, no_overlap=True, seed=3)
+        first, second = (set(form['question_ids']) for form in result['forms'])
+        self.assertEqual((len(first), len(second)), (2, 2))
+        self.assertFalse(first & second)
+
+    def test_form_copies_stay_out_of_the_duplicate_index(self):
+        assemble(self.blueprint, forms=2, total_points=4)
+        clones = Question.objects.filter(exam__blueprint=self.blueprint)
+        self.assertEqual(clones.count(), 4)
+        self.assertFalse(QuestionSignature.objects.filter(question__in=clones).exists())
+
+        # Bank questions still match each other, not their copies
+        original = self.questions[0]
+        matches = {row['question_id'] for row in duplicates_of_question(original)}
+        self.assertEqual(matches, {q.pk for q in self.questions[1:]})
+
+        # Nor after a copy is edited
+        clone = clones.first()
+        clone.text = original.text
+        clone.save()
+        self.assertNotIn(clone.pk, {row['question_id'] for row in duplicates_of_question(original)})
+
+
+class BulkTransitionTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(title='Translation I', duration_minutes=60)
+        self.other_exam = Exam.objects.create(title='Translation II', duration_minutes=60)
+        self.draft = Question.objects.create(exam=self.exam, text='One', section='Section A')
+        self.review = Question.objects.create(exam=self.exam, text='Two', section='Section B', status='review')
+        self.locked = Question.objects.create(exam=self.exam, text='Three', section='Section A', status='locked')
+        self.elsewhere = Question.objects.create(exam=self.other_exam, text='Four', section='Section A')
+        self.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='pw', is_staff=True, role=User.Role.ADMIN
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def post(self, action, data):
+        return self.api.post(f'/api/questions/bulk-{action}/', data, format='json')
+
+    def statuses(self):
+        return dict(Question.objects.values_list('id', 'status'))
+
+    def test_approve_by_ids(self):
+        response = self.post('approve', {'question_ids': [self.draft.pk, self.review.pk, self.locked.pk]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['skipped']), (2, 1))
+        self.assertEqual(sorted(response.data['question_ids']), [self.draft.pk, self.review.pk])
+        self.assertEqual(self.statuses(), {
+            self.draft.pk: 'approved', self.review.pk: 'approved', self.locked.pk: 'locked', self.elsewhere.pk: 'draft',
+        })
+        self.assertEqual(
+            set(Question.objects.filter(status='approved').values_list('approved_by', flat=True)), {self.admin.pk}
+        )
+        audit = AuditLog.objects.filter(target_model='Question')
+        self.assertEqual(sorted(audit.values_list('target_object_id', flat=True)),
+                         sorted([str(self.draft.pk), str(self.review.pk)]))
+        self.assertTrue(all(entry.actor_id == self.admin.pk for entry in audit))
+
+    def test_lock_by_filter(self):
+        response = self.post('lock', {'filter': {'exam_id': self.exam.pk, 'section': 'Section A'}})
+
+        self.assertEqual(response.status_code, 200)
+        # The already locked question is matched but skipped
+        self.assertEqual((response.data['updated'], response.data['skipped']), (1, 1))
+        self.assertEqual(self.statuses()[self.draft.pk], 'locked')
+        self.assertEqual(self.statuses()[self.review.pk], 'review')
+        self.assertEqual(self.statuses()[self.elsewhere.pk], 'draft')
+        self.assertEqual(list(AuditLog.objects.values_list('target_object_id', flat=True)), [str(self.draft.pk)])
+
+    def test_illegal_transitions_change_nothing(self):
+        response = self.post('approve', {'question_ids': [self.locked.pk]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['updated'], response.data['skipped']), (0, 1))
+        self.assertEqual(self.statuses()[self.locked.pk], 'locked')
+        self.assertFalse(AuditLog.objects.exists())
+
+    def test_bad_requests(self):
+        for data in (
+            {'filter': {'exam': self.exam.pk}},
+            {'question_ids': str(self.draft.pk)},
+            {'question_ids': [str(self.draft.pk)]},
+            {'question_ids': {'id': self.draft.pk}},
+            {'filter': 'section=Section A'},
+            {},
+        ):
+            with self.subTest(data=data):
+                self.assertEqual(self.post('approve', data).status_code, 400)
+        self.assertEqual(self.statuses()[self.draft.pk], 'draft')
+        self.assertFalse(AuditLog.objects.exists())
+
+
+class CloneFormTests(TestCase):
+    def test_clone_keeps_price_and_randomisation_settings(self):
+        blueprint = Exam.objects.create(
+            title='CPT', duration_minutes=90, is_blueprint=True, price=Decimal('15000.00'),
+            randomize_questions=True, shuffle_options=True, questions_per_section=5,
+        )
+        question = Question.objects.create(exam=blueprint, section='Section A', text='Pick', question_type='MCQ')
+        Option.objects.create(question=question, text='A', is_correct=True)
+
+        form, question_ids = clone_form(blueprint, 1, [question.pk])
+
+        form.refresh_from_db()
+        self.assertEqual(form.price, Decimal('15000.00'))
+        self.assertEqual(
+            (form.randomize_questions, form.shuffle_options, form.questions_per_section), (True, True, 5)
+        )
+        self.assertEqual(form.blueprint, blueprint)
+        self.assertEqual(list(Option.objects.filter(question_id__in=question_ids).values_list('text', 'is_correct')),
+                         [('A', True)])
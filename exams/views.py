@@ -3,10 +3,24 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.db import transaction
 
 from .models import Exam, Question, Option, ExamCategory, ExaminerAssignment
 from assessments.models import ExamSession, StudentAnswer
 from cores.models import AuditLog, LanguagePair
+from cores.audit import client_ip, record as record_audit
+from .importers import import_questions_file, sync_questions_file, iter_upload_rows
+from .dedup import DEFAULT_THRESHOLD, duplicates_in_rows, duplicates_of_question
+from .exporters import stream_csv, stream_jsonl, write_xlsx
+from .search import QuestionSearchFilter
+from .signals import questions_changed
+from .facets import cached_facets
+from .assembly import AssemblyError, assemble
+from cores.jobs import enqueue, job_file_path
+from cores.maintenance import streams_from_database
+from scripts import backup_catalog
+from scripts.backup_store import SNAPSHOT_SUFFIX, default_store
+from .backup_downloads import serve_backup_file, serve_snapshot
 from .serializers import (
     ExamSerializer, ExamDetailSerializer, ExamListSerializer,
     QuestionSerializer, ExamCategorySerializer, OptionSerializer,
@@ -14,9 +28,9 @@ from .serializers import (
 )
 
 import csv
-import io
-
 import os
+import uuid
+import zipfile
 from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAdminUser
@@ -24,7 +38,7 @@ from django.core.management import call_command
 
 from rest_framework.response import Response
 from django.core.management import call_command
-from django.http import FileResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 
 
 import shutil
@@ -81,36 +95,69 @@ class ExamViewSet(viewsets.ModelViewSet):
         except User.DoesNotExist:
             return Response({"error": f"User with email '{email}' not found."}, status=status.HTTP_404_NOT_FOUND)
         
-        # Check if already assigned
-        from payments.models import Payment
-        if Payment.objects.filter(user=user, exam=exam, status='success').exists():
+        # Grant a zero-amount payment, unless the student already has access
+        from payments.entitlements import grant
+        if grant(user, exam) is None:
              return Response({"message": "User already has access to this exam."}, status=status.HTTP_200_OK)
 
-        # Create a "Grant" Payment
-        Payment.objects.create(
-            user=user,
-            exam=exam,
-            amount=0.00,
-            reference=f"ADMIN-GRANT-{int(timezone.now().timestamp())}",
-            status='success',
-            verified_at=timezone.now()
-        )
-        
         return Response({"status": f"Successfully assigned '{exam.title}' to {user.first_name}"})
 
     @action(detail=True, methods=['post'], url_path='assign-questions')
     def assign_questions(self, request, pk=None):
         exam = self.get_object()
         question_ids = request.data.get('question_ids', [])
-        count = Question.objects.filter(id__in=question_ids).update(exam=exam)
+        count = Question.objects.filter(id__in=question_ids).update(exam=exam, updated_at=timezone.now())
+        questions_changed(question_ids, text_changed=False)
         return Response({"status": f"Added {count} questions to {exam.title}"})
 
     @action(detail=True, methods=['post'], url_path='remove-questions')
     def remove_questions(self, request, pk=None):
         question_ids = request.data.get('question_ids', [])
-        Question.objects.filter(id__in=question_ids, exam=self.get_object()).update(exam=None)
+        Question.objects.filter(id__in=question_ids, exam=self.get_object()).update(
+            exam=None, updated_at=timezone.now()
+        )
         return Response({"status": "Questions returned to bank"})
 
+    @action(detail=True, methods=['post'])
+    def assemble(self, request, pk=None):
+        """
+        Builds parallel forms from this blueprint using approved/locked bank questions.
+        Body: forms, total_points or section_points {"Section A": 15, ...},
+        difficulty_mix {"easy": 30, "medium": 50, "hard": 20}, specialization,
+        language_pair (id, defaults to the blueprint's), no_overlap, seed, dry_run.
+        """
+        blueprint = self.get_object()
+        data = request.data
+        language_pair = None
+        if data.get('language_pair'):
+            language_pair = get_object_or_404(LanguagePair, pk=data['language_pair'])
+        try:
+            result = assemble(
+                blueprint,
+                forms=int(data.get('forms', 1)),
+                total_points=float(data.get('total_points', 100)),
+                section_points=data.get('section_points'),
+                difficulty_mix=data.get('difficulty_mix'),
+                specialization=data.get('specialization') or None,
+                language_pair=language_pair,
+                no_overlap=str(data.get('no_overlap', '')).lower() == 'true',
+                seed=data.get('seed'),
+                dry_run=str(data.get('dry_run', '')).lower() == 'true',
+            )
+        except (AssemblyError, TypeError, ValueError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not result["forms"] or "exam_id" not in result["forms"][0]:
+            return Response(result)
+        record_audit(
+            request,
+            action='CREATE',
+            target_model='Exam',
+            target_object_id=str(blueprint.id),
+            details=f"Assembled {len(result['forms'])} form(s) from {blueprint.title} (seed {result['seed']})"
+        )
+        return Response(result, status=status.HTTP_201_CREATED)
+
     @action(detail=True, methods=['post'], url_path='assign-examiner')
     def assign_examiner(self, request, pk=None):
         """
@@ -134,8 +181,8 @@ class ExamViewSet(viewsets.ModelViewSet):
             }
         )
 
-        AuditLog.objects.create(
-            actor=request.user,
+        record_audit(
+            request,
             action='UPDATE',
             target_model='Exam',
             target_object_id=str(exam.id),
@@ -145,14 +192,21 @@ class ExamViewSet(viewsets.ModelViewSet):
         return Response({"status": "Examiner assigned successfully"})
 
 class QuestionViewSet(viewsets.ModelViewSet):
-    queryset = Question.objects.all().order_by('-id')
+    queryset = Question.objects.select_related('exam').prefetch_related('options').order_by('-id')
     serializer_class = QuestionSerializer
     authentication_classes = [JWTAuthentication]  # Explicit JWT for Next.js frontend
     permission_classes = [permissions.IsAdminUser]
 
-    # Enable Search and Filtering for the Question Bank
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['text', 'category']
+    # Ranked full-text search (?search=) backed by exams.search
+    filter_backends = [QuestionSearchFilter]
+    filter_params = {
+        'section': 'section',
+        'status': 'status',
+        'difficulty': 'difficulty',
+        'specialization': 'specialization',
+        'language_pair': 'exam__language_pair__pair_code',
+    }
+    facet_params = ['exam_id', 'search', *filter_params]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -160,59 +214,139 @@ class QuestionViewSet(viewsets.ModelViewSet):
         exam_id = self.request.query_params.get('exam_id')
         if exam_id:
             queryset = queryset.filter(exam_id=exam_id)
+        # ?section=Section A&status=approved&difficulty=hard&language_pair=EN-FR
+        for param, lookup in self.filter_params.items():
+            value = self.request.query_params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: value})
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """
+        Counts by section, difficulty, status, specialization and language pair
+        for the current filters, computed in one grouped query and cached.
+        """
+        params = {k: v for k, v in request.query_params.items() if k in self.facet_params}
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(cached_facets(queryset, params))
+
     # --- FIX 2: Add JSONParser here so regular API requests work ---
     parser_classes = (MultiPartParser, FormParser, JSONParser) 
 
     @action(detail=False, methods=['post'], url_path='bulk-upload')
     def bulk_upload(self, request):
         """
-        Upload questions via CSV.
-        Expected CSV Header: question_text, question_type, category, difficulty, points, options, correct_answer
+        Upload questions via CSV, XLSX or JSONL (streamed, validated and inserted in chunks).
+        Expected columns: exam_id (optional), section, question_text, question_type, points,
+        difficulty, specialization, source_text, reference_translation, translation_brief, options, correct_answer
+        The `exam_id` form field, when sent, overrides the column for every row.
+
+        mode=sync matches rows against existing questions (normalized text + section + exam)
+        and only creates/updates what changed; add dry_run=true to preview the plan.
         """
         file_obj = request.FILES.get('file')
         if not file_obj:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        exam_id = request.data.get('exam_id')
+        mode = request.data.get('mode') or request.query_params.get('mode', 'append')
+        dry_run = str(request.data.get('dry_run') or request.query_params.get('dry_run', '')).lower() == 'true'
+        if mode not in ('append', 'sync'):
+            return Response({"error": "mode must be 'append' or 'sync'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # ?background=true hands large files to the job worker
+        if request.query_params.get('background') == 'true':
+            ext = os.path.splitext(file_obj.name)[1].lower() or '.csv'
+            path = job_file_path(f"upload_{uuid.uuid4().hex}{ext}")
+            with open(path, 'wb') as fh:
+                for chunk in file_obj.chunks():
+                    fh.write(chunk)
+            job = enqueue('question_bulk_upload', {
+                "path": path, "exam_id": exam_id, "mode": mode, "dry_run": dry_run
+            }, user=request.user)
+            return Response({"status": "queued", "job_id": job.id}, status=status.HTTP_202_ACCEPTED)
 
         try:
-            decoded_file = file_obj.read().decode('utf-8')
-            io_string = io.StringIO(decoded_file)
-            reader = csv.DictReader(io_string)
-            
-            created_count = 0
-            
-            for row in reader:
-                # 1. Create Question
-                question = Question.objects.create(
-                    text=row['question_text'],
-                    question_type=row.get('question_type', 'mcq').lower(),
-                    category=row.get('category', 'General'),
-                    difficulty=row.get('difficulty', 'medium').lower(),
-                    points=int(row.get('points', 1)) 
-                )
+            if mode == 'sync':
+                data = sync_questions_file(file_obj, exam_id=exam_id, dry_run=dry_run)
+                if dry_run:
+                    return Response(data)
+                data["status"] = f"Created {data['created']} and updated {data['updated']} questions"
+                return Response(data, status=status.HTTP_200_OK)
+            report = import_questions_file(file_obj, exam_id=exam_id)
+        except (UnicodeDecodeError, csv.Error, zipfile.BadZipFile, KeyError) as e:
+            return Response({"error": f"Could not read file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = report.as_dict()
+        data["status"] = f"Successfully uploaded {report.created} questions"
+        if report.rows and not report.created:
+            return Response(data, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Streams the question bank (with options and translation fields).
+        ?file_format=jsonl|csv|xlsx, honours ?exam_id= and ?search=
+        """
+        file_format = request.query_params.get('file_format', 'jsonl')
+        queryset = self.filter_queryset(self.get_queryset())
+        stamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+
+        if file_format == 'jsonl':
+            response = streams_from_database(
+                StreamingHttpResponse(stream_jsonl(queryset), content_type='application/x-ndjson')
+            )
+        elif file_format == 'csv':
+            response = streams_from_database(StreamingHttpResponse(stream_csv(queryset), content_type='text/csv'))
+        elif file_format == 'xlsx':
+            return FileResponse(write_xlsx(queryset), as_attachment=True, filename=f"question_bank_{stamp}.xlsx")
+        else:
+            return Response({"error": "file_format must be jsonl, csv or xlsx"}, status=status.HTTP_400_BAD_REQUEST)
+
+        response['Content-Disposition'] = f'attachment; filename="question_bank_{stamp}.{file_format}"'
+        return response
 
-                # 2. Handle Options (for MCQs)
-                if question.question_type == 'mcq':
-                    raw_options = row.get('options', '').split('|')
-                    correct_ans_text = row.get('correct_answer', '').strip().lower()
-
-                    for opt_text in raw_options:
-                        clean_text = opt_text.strip()
-                        if clean_text:
-                            is_correct = (clean_text.lower() == correct_ans_text)
-                            Option.objects.create(
-                                question=question,
-                                text=clean_text,
-                                is_correct=is_correct
-                            )
-                
-                created_count += 1
-                
-            return Response({"status": f"Successfully uploaded {created_count} questions"}, status=status.HTTP_201_CREATED)
-
-        except Exception as e:
-            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    def get_threshold(self, request):
+        try:
+            threshold = float(request.query_params.get('threshold', DEFAULT_THRESHOLD))
+        except ValueError:
+            return None
+        return threshold if 0 < threshold <= 1 else None
+
+    @action(detail=True, methods=['get'])
+    def duplicates(self, request, pk=None):
+        """
+        Near-duplicates of this question (text or source passage) from the
+        MinHash/LSH index. ?threshold= is the minimum estimated Jaccard similarity.
+        """
+        threshold = self.get_threshold(request)
+        if threshold is None:
+            return Response({"error": "threshold must be a number between 0 and 1"}, status=status.HTTP_400_BAD_REQUEST)
+        question = self.get_object()
+        return Response({
+            "question_id": question.id,
+            "threshold": threshold,
+            "duplicates": duplicates_of_question(question, threshold),
+        })
+
+    @action(detail=False, methods=['post'], url_path='check-duplicates')
+    def check_duplicates(self, request):
+        """
+        Checks an upload file (same formats as bulk-upload) for rows that
+        near-duplicate the bank or each other, without importing anything.
+        """
+        file_obj = request.FILES.get('file')
+        if not file_obj:
+            return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        threshold = self.get_threshold(request)
+        if threshold is None:
+            return Response({"error": "threshold must be a number between 0 and 1"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            report = duplicates_in_rows(iter_upload_rows(file_obj), threshold)
+        except (UnicodeDecodeError, csv.Error, zipfile.BadZipFile) as e:
+            return Response({"error": f"Could not read file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"threshold": threshold, "flagged_rows": len(report), "rows": report})
 
     @action(detail=False, methods=['get'], url_path='bulk-upload/template')
     def bulk_upload_template(self, request):
@@ -226,14 +360,14 @@ class QuestionViewSet(viewsets.ModelViewSet):
         writer.writerow([
             'section', 'question_text', 'question_type', 'points', 
             'difficulty', 'category', 'specialization', 'language_pair', 
-            'source_text_reference', 'reference_translation', 'options', 'correct_answer'
+            'source_text_reference', 'reference_translation', 'translation_brief', 'options', 'correct_answer'
         ])
         
         # Add a sample row
         writer.writerow([
             'Section A', 'Sample MCQ Question?', 'mcq', '1.0', 
             'medium', 'General', '', '', 
-            '', '', 'Option 1;Option 2;Option 3', 'Option 1'
+            '', '', '', 'Option 1;Option 2;Option 3', 'Option 1'
         ])
         
         return response
@@ -254,8 +388,8 @@ class QuestionViewSet(viewsets.ModelViewSet):
         question.approved_by = request.user
         question.save()
 
-        AuditLog.objects.create(
-            actor=request.user,
+        record_audit(
+            request,
             action='UPDATE',
             target_model='Question',
             target_object_id=str(question.id),
@@ -278,6 +412,99 @@ class QuestionViewSet(viewsets.ModelViewSet):
 
         return Response({"status": "Question locked and ready for exam sitting."})
 
+    # --- Bulk workflow transitions ---
+    # action -> (statuses it applies to, new status, staff only)
+    TRANSITIONS = {
+        'approve': (['draft', 'review'], 'approved', False),
+        'lock': (['draft', 'review', 'approved'], 'locked', True),
+    }
+
+    def bulk_transition(self, request, transition):
+        """
+        Applies a workflow transition to `question_ids` or to the questions
+        matching `filter` (exam_id/section/status/difficulty/specialization/language_pair).
+        Permissions are checked once per exam; the update and its audit entries
+        are written in one transaction.
+        """
+        from_statuses, new_status, staff_only = self.TRANSITIONS[transition]
+        if staff_only and not request.user.is_staff:
+            return Response({"error": f"Only administrators can {transition} content."}, status=403)
+
+        question_ids = request.data.get('question_ids')
+        criteria = request.data.get('filter') or {}
+        valid_ids = isinstance(question_ids, list) and all(
+            isinstance(qid, int) and not isinstance(qid, bool) for qid in question_ids
+        )
+        if question_ids is not None and not valid_ids:
+            return Response({"error": "question_ids must be a list of question ids"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(criteria, dict):
+            return Response({"error": "filter must be an object"}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = Question.objects.all()
+        if question_ids:
+            queryset = queryset.filter(id__in=question_ids)
+        elif criteria:
+            lookups = dict(self.filter_params, exam_id='exam_id')
+            unknown = set(criteria) - set(lookups)
+            if unknown:
+                return Response({"error": f"Unknown filter: {', '.join(sorted(unknown))}"}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(**{lookups[key]: value for key, value in criteria.items()})
+        else:
+            return Response({"error": "Send question_ids or a filter"}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            matched = queryset.count()
+            rows = list(queryset.filter(status__in=from_statuses).values_list('id', 'exam_id', 'exam__title'))
+            exam_titles = {exam_id: title for _, exam_id, title in rows}
+
+            # Ensure the user is an assigned examiner for every exam involved, or an admin
+            if not request.user.is_staff:
+                assigned = set(ExaminerAssignment.objects.filter(
+                    user=request.user, exam_id__in=exam_titles
+                ).values_list('exam_id', flat=True))
+                denied = sorted(set(exam_titles) - assigned)
+                if denied:
+                    return Response({
+                        "error": "You are not authorized to change content for these exams.",
+                        "exam_ids": denied,
+                    }, status=403)
+
+            ids = [question_id for question_id, _, _ in rows]
+            # updated_at versions the cached facets and exam papers
+            changes = {'status': new_status, 'updated_at': timezone.now()}
+            if transition == 'approve':
+                changes['approved_by'] = request.user
+            updated = Question.objects.filter(id__in=ids).update(**changes)
+
+            # Written with the transition itself rather than through the batched sink
+            ip_address = client_ip(request)
+            AuditLog.objects.bulk_create([
+                AuditLog(
+                    actor=request.user,
+                    action='UPDATE',
+                    target_model='Question',
+                    target_object_id=str(question_id),
+                    details=f"{new_status.capitalize()} question ID {question_id} for {exam_title} (bulk)",
+                    ip_address=ip_address
+                )
+                for question_id, _, exam_title in rows
+            ], batch_size=500)
+
+        questions_changed(ids, text_changed=False)
+        return Response({
+            "status": f"{updated} question(s) {new_status}",
+            "updated": updated,
+            "skipped": max(matched - updated, 0),
+            "question_ids": ids,
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-approve')
+    def bulk_approve(self, request):
+        return self.bulk_transition(request, 'approve')
+
+    @action(detail=False, methods=['post'], url_path='bulk-lock')
+    def bulk_lock(self, request):
+        return self.bulk_transition(request, 'lock')
+
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = ExamCategory.objects.all()
@@ -302,28 +529,23 @@ class LanguagePairViewSet(viewsets.ModelViewSet):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def list_backups(request):
-    backup_dir = os.path.join(settings.BASE_DIR, 'backups')
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
-        return Response([])
-    
+    # One read of backups/catalog.json; see scripts/backup_catalog.py
+    entries = backup_catalog.entries_or_scan(settings.BACKUP_DIR, default_store())
+
     files = []
-    for f in os.listdir(backup_dir):
-        if f.endswith('.sqlite3'):
-            path = os.path.join(backup_dir, f)
-            stats = os.stat(path)
-            
-            # --- FIX: Convert timestamp to a readable ISO string ---
-            from datetime import datetime
-            dt_object = datetime.fromtimestamp(stats.st_mtime)
-            readable_date = dt_object.isoformat() 
-
-            files.append({
-                "filename": f,
-                "size": stats.st_size, # Reverted back to raw integer so frontend math (.toFixed) doesn't crash with NaN
-                "size_formatted": f"{round(stats.st_size / 1024, 2)} KB", # Provided alongside just in case
-                "created_at": readable_date  # ISO String
-            })
+    for entry in entries.values():
+        files.append({
+            "filename": entry['filename'],
+            "size": entry['size'], # Raw integer so frontend math (.toFixed) doesn't crash with NaN
+            "size_formatted": f"{round(entry['size'] / 1024, 2)} KB",
+            "created_at": entry['created_at'],  # ISO String
+            "type": entry['type'],
+            "source": entry.get('source'),
+            "sha256": entry.get('sha256'),
+            "tables": entry.get('tables'),
+            # current / older (migrate after restoring) / newer (can't be restored) / unknown
+            "compatibility": backup_catalog.compatibility(entry.get('migrations')),
+        })
     
     files.sort(key=lambda x: x['created_at'], reverse=True)
     return Response(files)
@@ -331,30 +553,46 @@ def list_backups(request):
 @api_view(['POST'])
 @permission_classes([IsAdminUser])
 def create_backup_view(request):
-    try:
-        from scripts.backup_local import run_backup
-        run_backup()
-        return Response({
-            "status": "success",
-            "message": "System snapshot created successfully."
-        })
-    except Exception as e:
-        return Response({"status": "error", "message": str(e)}, status=500)
+    # Runs in the job worker; poll /api/core/jobs/<job_id>/ for the result.
+    # {"incremental": true} stores a deduplicated snapshot instead of a full copy
+    incremental = str(request.data.get('incremental', '')).lower() in ('1', 'true')
+    job = enqueue('backup', {"incremental": True} if incremental else None, user=request.user)
+    return Response({
+        "status": "queued",
+        "job_id": job.id,
+        "message": "System snapshot has been queued."
+    }, status=202)
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def download_backup(request, filename):
-    backup_file = os.path.join(settings.BASE_DIR, 'backups', filename)
-    if os.path.exists(backup_file):
-        return FileResponse(open(backup_file, 'rb'), as_attachment=True)
+    # Range requests resume interrupted downloads; ?compress=gzip compresses on the fly
+    if filename.endswith(SNAPSHOT_SUFFIX):
+        store = default_store()
+        try:
+            manifest = store.manifest(filename[:-len(SNAPSHOT_SUFFIX)])
+        except KeyError:
+            return Response({"error": "File not found"}, status=404)
+        return serve_snapshot(request, store, manifest)
+
+    # Only catalogued backups: BACKUP_DIR also holds the catalogue, sidecars and temporaries
+    backup_file = os.path.join(settings.BACKUP_DIR, filename)
+    entry = None
+    if (
+        os.path.basename(filename) == filename
+        and not filename.startswith('.')
+        and filename.endswith(backup_catalog.BACKUP_SUFFIXES)
+    ):
+        entry = backup_catalog.entries_or_scan(settings.BACKUP_DIR, default_store()).get(filename)
+    if entry is not None and os.path.isfile(backup_file):
+        return serve_backup_file(request, backup_file, entry)
     return Response({"error": "File not found"}, status=404)
 
 @api_view(['DELETE'])
 @permission_classes([IsAdminUser])
 def delete_backup(request, filename):
-    backup_file = os.path.join(settings.BASE_DIR, 'backups', filename)
-    if os.path.exists(backup_file):
-        os.remove(backup_file)
+    # Snapshot chunks are reclaimed by `python manage.py prune_backups`
+    if backup_catalog.delete_backup(settings.BACKUP_DIR, filename):
         return Response({"message": "Backup deleted"})
     return Response({"error": "File not found"}, status=404)
 
@@ -364,9 +602,9 @@ def perform_restore(request):
     filename = request.data.get('filename')
     if not filename:
         return Response({"error": "No filename provided"}, status=400)
-    try:
-        # Note: 'restore_db' must be a custom management command you've created
-        call_command('restore_db', filename)
-        return Response({"message": "Database successfully restored."})
-    except Exception as e:
-        return Response({"error": str(e)}, status=500)
\ No newline at end of file
+    job = enqueue('restore', {"filename": filename}, user=request.user)
+    return Response({
+        "status": "queued",
+        "job_id": job.id,
+        "message": "Database restore has been queued."
+    }, status=202)
\ No newline at end of file
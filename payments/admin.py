@@ -1,4 +1,11 @@
 from django.contrib import admin
-from .models import Payment
+from .models import Payment, PaystackEvent
 
 admin.site.register(Payment)
+
+
+@admin.register(PaystackEvent)
+class PaystackEventAdmin(admin.ModelAdmin):
+    list_display = ('event', 'reference', 'received_at', 'processed_at', 'outcome')
+    list_filter = ('event', 'outcome')
+    search_fields = ('reference',)
@@ -0,0 +1,93 @@
+"""
+Exam entitlements.
+
+The exams a student has paid for (or been granted) are loaded with one
+query into a per-user set of exam ids and cached, so listing the catalogue
+and starting an exam don't query payments. The set is dropped whenever one
+of the user's payments changes: Payment save/delete signals, plus the bulk
+writers (webhook batches, reconciliation) calling `invalidate`.
+Free exams (price 0) need no entitlement.
+
+`invalidate` only reaches the cache of the process that wrote the payment
+when the cache is per-process (the default LocMemCache): a webhook batch
+in the job worker can't clear a web process's set. So a "no" is never
+answered from the cache: `has_paid` asks the database before denying an
+exam missing from a cached set (empty sets are cached too, so unpaid
+students browsing the catalogue don't query payments). What a stale set
+can still do is show the catalogue's `has_paid` a little late, or keep a
+removed payment's access for up to CACHE_TIMEOUT; a shared cache (Redis,
+Memcached) avoids both.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payment
+
+CACHE_TIMEOUT = 10 * 60
+
+
+def _cache_key(user_id):
+    return f"entitlements:{user_id}"
+
+
+def _load(user):
+    """(exam ids, whether they came from the cache)."""
+    key = _cache_key(user.pk)
+    exam_ids = cache.get(key)
+    if exam_ids is not None:
+        return exam_ids, True
+    exam_ids = frozenset(
+        Payment.objects.filter(user_id=user.pk, status='success').values_list('exam_id', flat=True)
+    )
+    cache.set(key, exam_ids, CACHE_TIMEOUT)
+    return exam_ids, False
+
+
+def paid_exam_ids(user):
+    """Ids of the exams `user` has a successful payment for."""
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    return _load(user)[0]
+
+
+def has_paid(user, exam):
+    if user is None or not user.is_authenticated:
+        return False
+    exam_ids, cached = _load(user)
+    if exam.pk in exam_ids:
+        return True
+    if not cached:
+        return False
+    # The cached set may predate a payment written by another process
+    if Payment.objects.filter(user_id=user.pk, exam_id=exam.pk, status='success').exists():
+        cache.delete(_cache_key(user.pk))
+        return True
+    return False
+
+
+def can_sit(user, exam):
+    return exam.price <= 0 or has_paid(user, exam)
+
+
+def invalidate(*user_ids):
+    """Drops the cached sets once the current transaction commits (so a reload can't see old rows)."""
+    keys = [_cache_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def grant(user, exam):
+    """Admin grant: a zero-amount successful payment, or None if the user already has access."""
+    if has_paid(user, exam):
+        return None
+    now = timezone.now()
+    payment = Payment.objects.create(
+        user=user,
+        exam=exam,
+        amount=0,
+        reference=f"ADMIN-GRANT-{exam.pk}-{user.pk}-{int(now.timestamp())}",
+        status='success',
+        verified_at=now,
+    )
+    return payment
@@ -0,0 +1,10 @@
+from cores.jobs import register
+from .webhooks import process_events
+
+
+@register('paystack_events')
+def paystack_events(job):
+    def on_progress(counts):
+        job.set_progress(0, ", ".join(f"{n} {outcome}" for outcome, n in counts.items()))
+
+    return process_events(on_progress=on_progress)
@@ -0,0 +1,114 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from payments.entitlements import invalidate
+from payments.models import Payment, PaystackEvent, Transaction
+from payments.paystack import PaystackError, get_client
+from payments.webhooks import process_events
+
+# Paystack status -> local status; anything else (abandoned, ongoing, pending, ...) is still open
+FINAL_STATUSES = {'success': 'success', 'failed': 'failed', 'reversed': 'failed'}
+
+
+class Command(BaseCommand):
+    help = 'Compares recent Paystack transactions with Payment/Transaction records and fixes their status (run from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'PAYSTACK_RECONCILE_DAYS', 3),
+                            help='Reconcile transactions from the last N days')
+        parser.add_argument('--per-page', type=int, default=100, help='Transactions per Paystack API page')
+        parser.add_argument('--dry-run', action='store_true', help='Only report the differences')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        remote = {}
+        try:
+            for tx in get_client().iter_transactions(per_page=options['per_page'], **{'from': since.isoformat()}):
+                if tx.get('reference'):
+                    remote[tx['reference']] = tx
+        except PaystackError as e:
+            raise CommandError(f"Could not list Paystack transactions: {e}")
+
+        # One query per model for the whole window, then compare in memory
+        references = list(remote)
+        payments = Payment.objects.select_related('exam').in_bulk(references, field_name='reference')
+        local_transactions = Transaction.objects.in_bulk(references, field_name='reference')
+
+        now = timezone.now()
+        changed_payments, changed_transactions, missing, reversed_paid = [], [], [], []
+        for reference, tx in remote.items():
+            wanted = FINAL_STATUSES.get(tx.get('status'))
+            if wanted is None:
+                continue
+            amount = Decimal(tx.get('amount') or 0) / 100
+
+            payment = payments.get(reference)
+            if payment is not None and payment.status == 'success':
+                # Never taken back here: the exam may have been sat already, or repriced since
+                if wanted != 'success':
+                    reversed_paid.append(payment)
+            elif payment is not None:
+                # The price is checked when a payment becomes a success, as the verify view does
+                status = 'failed' if wanted == 'success' and amount < payment.exam.price else wanted
+                if payment.status != status:
+                    payment.status, payment.amount, payment.verified_at = status, amount, now
+                    changed_payments.append(payment)
+            elif wanted == 'success':
+                # Paid, but neither verified by the student nor received by webhook
+                missing.append(tx)
+
+            local = local_transactions.get(reference)
+            if local is not None and local.status != wanted:
+                local.status = wanted
+                changed_transactions.append(local)
+
+        for payment in changed_payments:
+            self.stdout.write(f"Payment {payment.reference}: -> {payment.status}")
+        for local in changed_transactions:
+            self.stdout.write(f"Transaction {local.reference}: -> {local.status}")
+        for tx in missing:
+            self.stdout.write(f"Unrecorded payment {tx['reference']}")
+        for payment in reversed_paid:
+            self.stdout.write(self.style.WARNING(
+                f"Payment {payment.reference} is {remote[payment.reference].get('status')} on Paystack "
+                f"but was already a success here; left unchanged, review it by hand"
+            ))
+
+        recorded = {}
+        if not options['dry_run']:
+            with transaction.atomic():
+                Payment.objects.bulk_update(changed_payments, ['status', 'amount', 'verified_at'], batch_size=500)
+                Transaction.objects.bulk_update(changed_transactions, ['status'], batch_size=500)
+                invalidate(*(payment.user_id for payment in changed_payments))
+            if missing:
+                # Recorded exactly like a webhook delivery (matched by metadata / customer email).
+                # A delivery that matched no student before (say, they registered later) is
+                # queued again with Paystack's current data; bulk_create would drop it as a duplicate.
+                by_reference = {tx['reference']: tx for tx in missing}
+                unmatched = list(PaystackEvent.objects.filter(
+                    event='charge.success', reference__in=by_reference, outcome='unmatched',
+                ))
+                for event in unmatched:
+                    event.payload, event.processed_at, event.outcome = by_reference[event.reference], None, ''
+                PaystackEvent.objects.bulk_update(unmatched, ['payload', 'processed_at', 'outcome'], batch_size=500)
+                PaystackEvent.objects.bulk_create(
+                    [PaystackEvent(event='charge.success', reference=tx['reference'], payload=tx) for tx in missing],
+                    ignore_conflicts=True,
+                )
+                recorded = process_events()
+
+        summary = (
+            f"{len(remote)} Paystack transactions since {since:%Y-%m-%d %H:%M}: "
+            f"{len(changed_payments)} payments and {len(changed_transactions)} transactions "
+            f"{'to update' if options['dry_run'] else 'updated'}, {len(missing)} unrecorded payments"
+        )
+        if reversed_paid:
+            summary += f", {len(reversed_paid)} successful payments to review"
+        if recorded:
+            summary += " (" + ", ".join(f"{n} {outcome}" for outcome, n in recorded.items()) + ")"
+        self.stdout.write(self.style.SUCCESS(summary))
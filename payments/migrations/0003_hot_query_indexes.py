@@ -0,0 +1,20 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0012_exam_candidate_forms'),
+        ('payments', '0002_payment'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['user', 'exam', 'status'], name='payments_user_exam_status_idx'),
+        ),
+    ]
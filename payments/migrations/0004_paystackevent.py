@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-19 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaystackEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(max_length=50)),
+                ('reference', models.CharField(max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('outcome', models.CharField(blank=True, max_length=100)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['processed_at'], name='payments_event_processed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('event', 'reference'), name='payments_event_reference_uniq')],
+            },
+        ),
+    ]
@@ -35,6 +35,38 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     verified_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # has_paid checks
+            models.Index(fields=['user', 'exam', 'status'], name='payments_user_exam_status_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.exam.title} - {self.status}"
 
+
+
+class PaystackEvent(models.Model):
+    """
+    A webhook event as Paystack sent it. Paystack retries deliveries, so the
+    same event can arrive several times; (event, reference) is unique and
+    duplicates are dropped on insert. The `paystack_events` job turns
+    unprocessed rows into Payment records.
+    """
+    event = models.CharField(max_length=50)  # e.g. charge.success
+    reference = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    outcome = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'reference'], name='payments_event_reference_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['processed_at'], name='payments_event_processed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.event} {self.reference}"
@@ -0,0 +1,245 @@
+"""
+Paystack API client.
+
+One `requests.Session` per process keeps its connections to Paystack open
+(keep-alive, pooled), so verifying a payment costs one round trip instead of
+a fresh TCP/TLS handshake. Idempotent GETs are retried on connection errors
+and 502/503/504.
+
+`verify_reference()` is what views call:
+- a successful verification is cached by reference (PAYSTACK_VERIFY_CACHE_TTL),
+  so a student clicking "verify" again doesn't reach Paystack,
+- concurrent verifications of one reference share a single call: threads of
+  this process wait for the call in flight, other processes see an in-flight
+  marker in the cache (with a shared cache backend) and poll for its result,
+- failed, abandoned or unknown references are remembered for
+  PAYSTACK_RETRY_TTL seconds only, as the student may still complete them.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from urllib.parse import quote
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = 'https://api.paystack.co'
+
+
+class PaystackError(Exception):
+    """Paystack couldn't be asked or gave an unusable answer."""
+
+
+class PaystackTimeout(PaystackError):
+    pass
+
+
+class PaystackUnavailable(PaystackError):
+    pass
+
+
+class VerificationInProgress(PaystackError):
+    """Another process is verifying the same reference right now."""
+
+
+@dataclass(frozen=True)
+class Verification:
+    reference: str
+    # Paystack's transaction status (success, failed, abandoned, ...) or 'not_found'
+    status: str
+    amount: Decimal  # naira; Paystack reports kobo
+    currency: str = ''
+    paid_at: str | None = None
+
+    @property
+    def succeeded(self):
+        return self.status == 'success'
+
+    @classmethod
+    def from_transaction(cls, data):
+        return cls(
+            reference=data.get('reference') or '',
+            status=data.get('status') or 'unknown',
+            amount=Decimal(data.get('amount') or 0) / 100,
+            currency=data.get('currency') or '',
+            paid_at=data.get('paid_at') or data.get('paidAt'),
+        )
+
+
+class PaystackClient:
+    def __init__(self, secret_key, base_url=DEFAULT_BASE_URL, timeout=(3.05, 10), pool_size=10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        retry = Retry(
+            total=2, connect=2, read=1, backoff_factor=0.2,
+            status_forcelist=(502, 503, 504), allowed_methods=frozenset(['GET']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            'Authorization': f'Bearer {secret_key}',
+            'Accept': 'application/json',
+        })
+
+    def get(self, path, params=None):
+        """(HTTP status, decoded JSON body) of a GET to the API."""
+        try:
+            resp = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+        except requests.Timeout as e:
+            raise PaystackTimeout("Paystack did not answer in time") from e
+        except requests.RequestException as e:
+            raise PaystackUnavailable(f"Could not connect to Paystack: {e}") from e
+        if resp.status_code >= 500:
+            raise PaystackUnavailable(f"Paystack returned HTTP {resp.status_code}")
+        if resp.status_code in (401, 403):
+            raise PaystackError("Paystack rejected the secret key")
+        try:
+            return resp.status_code, resp.json()
+        except ValueError as e:
+            raise PaystackError(f"Paystack returned a non-JSON response (HTTP {resp.status_code})") from e
+
+    def verify(self, reference):
+        status_code, body = self.get(f"/transaction/verify/{quote(reference, safe='')}")
+        if status_code != 200 or not body.get('status') or not body.get('data'):
+            return Verification(reference=reference, status='not_found', amount=Decimal(0))
+        return Verification.from_transaction(dict(body['data'], reference=reference))
+
+    def list_transactions(self, page=1, per_page=100, **filters):
+        """
+        One page of transactions, newest first: (transaction dicts, meta).
+        Filters are Paystack's query parameters (status, from, to, customer).
+        """
+        status_code, body = self.get('/transaction', params=dict(filters, page=page, perPage=per_page))
+        if status_code != 200 or not body.get('status'):
+            raise PaystackError(f"Listing transactions failed: {body.get('message') or status_code}")
+        return body.get('data') or [], body.get('meta') or {}
+
+    def iter_transactions(self, per_page=100, **filters):
+        """Every transaction matching `filters`, fetched page by page."""
+        page = 1
+        while True:
+            transactions, meta = self.list_transactions(page, per_page, **filters)
+            yield from transactions
+            page_count = meta.get('pageCount')
+            if not transactions or (page_count is not None and page >= int(page_count)):
+                return
+            if page_count is None and len(transactions) < per_page:
+                return
+            page += 1
+
+
+_client = None
+_client_key = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """The process-wide client (a new one after fork or when the settings change)."""
+    global _client, _client_key
+    key = (
+        os.getpid(),
+        getattr(settings, 'PAYSTACK_BASE_URL', DEFAULT_BASE_URL),
+        settings.PAYSTACK_SECRET_KEY,
+    )
+    with _client_lock:
+        if _client is None or _client_key != key:
+            _client = PaystackClient(
+                secret_key=key[2], base_url=key[1],
+                timeout=getattr(settings, 'PAYSTACK_TIMEOUT', (3.05, 10)),
+                pool_size=getattr(settings, 'PAYSTACK_POOL_SIZE', 10),
+            )
+            _client_key = key
+        return _client
+
+
+# --- Idempotent verification ---
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def _cache_key(reference):
+    return f"paystack:verify:{reference}"
+
+
+def _wait_seconds():
+    timeout = getattr(settings, 'PAYSTACK_TIMEOUT', (3.05, 10))
+    timeout = sum(timeout) if isinstance(timeout, (tuple, list)) else timeout
+    # Worst case of the client's own retries
+    return timeout * 3 + 1
+
+
+def verify_reference(reference):
+    """The Verification of `reference`, asking Paystack at most once at a time."""
+    key = _cache_key(reference)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    with _calls_lock:
+        call = _calls.get(reference)
+        leader = call is None
+        if leader:
+            call = _calls[reference] = _Call()
+    if not leader:
+        if not call.done.wait(_wait_seconds()):
+            raise VerificationInProgress(f"Verification of {reference} is still running")
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _verify_once(reference, key)
+        return call.result
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            _calls.pop(reference, None)
+        call.done.set()
+
+
+def _verify_once(reference, key):
+    lock_key = key + ':inflight'
+    wait = _wait_seconds()
+    if not cache.add(lock_key, os.getpid(), timeout=wait):
+        # Another process is asking Paystack; use its answer
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.2)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+            if cache.get(lock_key) is None:
+                break
+        raise VerificationInProgress(f"Verification of {reference} is still running")
+
+    try:
+        result = get_client().verify(reference)
+    finally:
+        cache.delete(lock_key)
+    if result.succeeded:
+        cache.set(key, result, getattr(settings, 'PAYSTACK_VERIFY_CACHE_TTL', 24 * 60 * 60))
+    else:
+        cache.set(key, result, getattr(settings, 'PAYSTACK_RETRY_TTL', 30))
+        logger.info("Paystack reference %s is %s", reference, result.status)
+    return result
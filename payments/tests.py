@@ -1,3 +1,422 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import io
+import json
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, unquote, urlparse
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from cores.jobs import claim_next, run_job
+from exams.models import Exam
+from users.models import User
+from .entitlements import can_sit, paid_exam_ids
+from .models import Payment, PaystackEvent, Transaction
+from .paystack import PaystackClient, verify_reference
+from .webhooks import process_events
+
+
+class FakePaystack:
+    """
+    A local stand-in for the Paystack API: answers /transaction/verify/<ref>
+    and the paginated /transaction list from `self.transactions` and counts
+    requests and TCP connections.
+    """
+
+    def __init__(self):
+        self.transactions = {}
+        self.hits = []
+        self.connections = 0
+        self.delay = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive
+
+            def setup(self):
+                fake.connections += 1
+                super().setup()
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                fake.hits.append(path)
+                if fake.delay:
+                    time.sleep(fake.delay)
+                if path == '/transaction':
+                    query = parse_qs(urlparse(self.path).query)
+                    page, per_page = int(query['page'][0]), int(query['perPage'][0])
+                    items = list(fake.transactions.values())
+                    self.reply(200, {
+                        "status": True,
+                        "data": items[(page - 1) * per_page:page * per_page],
+                        "meta": {"total": len(items), "page": page, "perPage": per_page,
+                                 "pageCount": max(-(-len(items) // per_page), 1)},
+                    })
+                elif path.startswith('/transaction/verify/'):
+                    data = fake.transactions.get(unquote(path.rsplit('/', 1)[1]))
+                    if data is None:
+                        self.reply(400, {"status": False, "message": "Transaction reference not found"})
+                    else:
+                        self.reply(200, {"status": True, "message": "Verification successful", "data": data})
+                else:
+                    self.reply(404, {"status": False, "message": "Not found"})
+
+            def reply(self, code, body):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def add(self, reference, amount_naira, status='success', **extra):
+        self.transactions[reference] = dict({
+            "reference": reference,
+            "status": status,
+            "amount": int(Decimal(amount_naira) * 100),
+            "currency": "NGN",
+            "paid_at": "2026-01-01T10:00:00.000Z",
+        }, **extra)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PaystackTestCase(TestCase):
+    def setUp(self):
+        self.fake = FakePaystack().__enter__()
+        self.addCleanup(self.fake.__exit__)
+        settings_override = override_settings(PAYSTACK_BASE_URL=self.fake.url, PAYSTACK_SECRET_KEY='sk_test_fake')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+        self.exam = Exam.objects.create(
+            title='Translation I', duration_minutes=60, price=Decimal('5000.00')
+        )
+        self.student = User.objects.create_user(email='student@example.com', password='pw', username='student')
+        self.api = APIClient()
+        self.api.force_authenticate(self.student)
+
+    def verify(self, reference, exam=None, client=None):
+        return (client or self.api).post(
+            '/api/payments/verify/', {"reference": reference, "exam_id": (exam or self.exam).id}, format='json'
+        )
+
+
+class VerifyPaymentTests(PaystackTestCase):
+    def test_success_creates_payment_and_retry_is_idempotent(self):
+        self.fake.add('ref-1', 5000)
+
+        first = self.verify('ref-1')
+        second = self.verify('ref-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        payment = Payment.objects.get(reference='ref-1')
+        self.assertEqual((payment.user, payment.exam, payment.status), (self.student, self.exam, 'success'))
+        self.assertEqual(payment.amount, Decimal('5000.00'))
+        self.assertEqual(len(self.fake.hits), 1)
+
+    def test_underpayment_is_rejected(self):
+        self.fake.add('ref-low', 4999.99)
+
+        response = self.verify('ref-low')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Incomplete payment', response.data['error'])
+        self.assertFalse(Payment.objects.exists())
+
+    def test_failed_reference_is_cached_briefly(self):
+        self.fake.add('ref-failed', 5000, status='failed')
+
+        self.assertEqual(self.verify('ref-failed').status_code, 400)
+        self.assertEqual(self.verify('ref-failed').status_code, 400)
+        self.assertEqual(len(self.fake.hits), 1)
+
+        # Once the short TTL is over, Paystack is asked again (the student may have paid meanwhile)
+        cache.clear()
+        self.fake.add('ref-failed', 5000)
+        self.assertEqual(self.verify('ref-failed').status_code, 200)
+        self.assertEqual(len(self.fake.hits), 2)
+
+    def test_receipt_of_another_student_is_rejected(self):
+        self.fake.add('ref-1', 5000)
+        self.assertEqual(self.verify('ref-1').status_code, 200)
+
+        other = User.objects.create_user(email='other@example.com', password='pw', username='other')
+        other_api = APIClient()
+        other_api.force_authenticate(other)
+        response = self.verify('ref-1', client=other_api)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Payment.objects.get().user, self.student)
+
+    def test_paystack_down_is_a_503(self):
+        self.fake.__exit__()
+        response = self.verify('ref-1')
+        self.assertEqual(response.status_code, 503)
+
+    def test_start_exam_requires_payment(self):
+        self.assertEqual(self.api.post(f'/api/exams/{self.exam.id}/start/').status_code, 402)
+        self.fake.add('ref-1', 5000)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.verify('ref-1')
+        self.assertIn(self.api.post(f'/api/exams/{self.exam.id}/start/').status_code, (200, 201))
+
+
+class VerifyReferenceTests(PaystackTestCase):
+    def test_concurrent_verifications_share_one_call(self):
+        self.fake.add('ref-1', 5000)
+        self.fake.delay = 0.3
+        results = []
+
+        threads = [threading.Thread(target=lambda: results.append(verify_reference('ref-1'))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result.succeeded for result in results))
+        self.assertEqual(len(self.fake.hits), 1)
+
+    def test_connections_are_reused(self):
+        client = PaystackClient('sk_test_fake', base_url=self.fake.url)
+        for n in range(3):
+            self.fake.add(f'ref-{n}', 5000)
+            self.assertTrue(client.verify(f'ref-{n}').succeeded)
+
+        self.assertEqual(len(self.fake.hits), 3)
+        self.assertEqual(self.fake.connections, 1)
+
+    def test_unknown_reference(self):
+        result = verify_reference('nope')
+        self.assertFalse(result.succeeded)
+        self.assertEqual(result.status, 'not_found')
+
+
+class WebhookTests(PaystackTestCase):
+    def deliver(self, reference, amount_naira=5000, signature=None, **metadata):
+        body = json.dumps({
+            "event": "charge.success",
+            "data": {
+                "reference": reference,
+                "status": "success",
+                "amount": int(Decimal(amount_naira) * 100),
+                "customer": {"email": "Student@example.com"},
+                "metadata": dict({"exam_id": self.exam.id}, **metadata),
+            },
+        }).encode()
+        if signature is None:
+            signature = hmac.new(b'sk_test_fake', body, hashlib.sha512).hexdigest()
+        return APIClient().post(
+            '/api/payments/webhook/', body, content_type='application/json',
+            HTTP_X_PAYSTACK_SIGNATURE=signature,
+        )
+
+    def run_jobs(self):
+        while (job := claim_next()) is not None:
+            self.assertTrue(run_job(job))
+
+    def test_bad_signature_is_rejected(self):
+        self.assertEqual(self.deliver('ref-1', signature='0' * 128).status_code, 401)
+        self.assertFalse(PaystackEvent.objects.exists())
+
+    def test_charge_success_records_payment_without_calling_paystack(self):
+        self.assertEqual(self.deliver('ref-1').status_code, 200)
+        self.assertFalse(Payment.objects.exists())
+
+        self.run_jobs()
+
+        payment = Payment.objects.get(reference='ref-1')
+        self.assertEqual((payment.user, payment.exam, payment.status), (self.student, self.exam, 'success'))
+        # The student's own verify call is answered from the recorded payment
+        self.assertEqual(self.verify('ref-1').status_code, 200)
+        self.assertEqual(self.fake.hits, [])
+
+    def test_replayed_events_are_idempotent(self):
+        for _ in range(3):
+            self.assertEqual(self.deliver('ref-1').status_code, 200)
+        self.deliver('ref-2', user_id=self.student.id)
+        self.run_jobs()
+        self.deliver('ref-1')
+        self.run_jobs()
+
+        self.assertEqual(PaystackEvent.objects.count(), 2)
+        self.assertEqual(Payment.objects.filter(status='success').count(), 2)
+
+    def test_underpaid_and_unmatched_events(self):
+        self.deliver('ref-low', amount_naira=100)
+        self.deliver('ref-nobody', exam_id=999999)
+        self.run_jobs()
+
+        self.assertEqual(Payment.objects.get(reference='ref-low').status, 'failed')
+        self.assertFalse(Payment.objects.filter(reference='ref-nobody').exists())
+        self.assertEqual(PaystackEvent.objects.get(reference='ref-nobody').outcome, 'unmatched')
+
+
+class ReconcileTests(PaystackTestCase):
+    def setUp(self):
+        super().setUp()
+        meta = {"metadata": {"exam_id": self.exam.id, "user_id": self.student.id}}
+        self.fake.add('ref-pending', 5000, **meta)
+        self.fake.add('ref-reversed', 5000, status='reversed', **meta)
+        self.fake.add('ref-missed', 5000, **meta)
+        self.fake.add('ref-abandoned', 5000, status='abandoned', **meta)
+        self.fake.add('ref-ok', 5000, **meta)
+        for reference, status in [('ref-reversed', 'success'), ('ref-abandoned', 'pending'), ('ref-ok', 'success')]:
+            Payment.objects.create(user=self.student, exam=self.exam, amount=5000, reference=reference, status=status)
+        Transaction.objects.create(user=self.student, exam=self.exam, amount=5000, reference='ref-pending')
+
+    def reconcile(self, *args):
+        out = io.StringIO()
+        call_command('reconcile_payments', '--per-page', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_reconcile_applies_provider_statuses(self):
+        output = self.reconcile()
+
+        statuses = dict(Payment.objects.values_list('reference', 'status'))
+        self.assertEqual(statuses, {
+            # Reported for review, never taken back automatically
+            'ref-reversed': 'success',
+            'ref-abandoned': 'pending',
+            'ref-ok': 'success',
+            'ref-pending': 'success',
+            'ref-missed': 'success',
+        })
+        self.assertEqual(Transaction.objects.get().status, Transaction.Status.SUCCESS)
+        # 5 transactions, 2 per page
+        self.assertEqual(self.fake.hits, ['/transaction'] * 3)
+        self.assertIn('2 unrecorded payments', output)
+        self.assertIn('Payment ref-reversed is reversed on Paystack', output)
+
+        # A second run has nothing left to do
+        self.assertIn('0 payments and 0 transactions updated, 0 unrecorded', self.reconcile())
+
+    def test_price_check_only_applies_to_new_successes(self):
+        self.fake.add('ref-low', 4000, metadata={"exam_id": self.exam.id, "user_id": self.student.id})
+        Payment.objects.create(user=self.student, exam=self.exam, amount=4000, reference='ref-low', status='pending')
+        # Repriced after ref-ok was paid
+        Exam.objects.filter(pk=self.exam.pk).update(price=Decimal('6000.00'))
+
+        self.reconcile()
+
+        self.assertEqual(Payment.objects.get(reference='ref-ok').status, 'success')
+        self.assertEqual(Payment.objects.get(reference='ref-low').status, 'failed')
+
+    def test_unmatched_delivery_is_matched_again(self):
+        # The webhook came before the student's account existed
+        PaystackEvent.objects.create(
+            event='charge.success', reference='ref-missed', payload={"reference": "ref-missed", "amount": 500000},
+            processed_at=timezone.now(), outcome='unmatched',
+        )
+
+        self.reconcile()
+
+        self.assertEqual(Payment.objects.get(reference='ref-missed').status, 'success')
+        self.assertEqual(PaystackEvent.objects.get(reference='ref-missed').outcome, 'recorded')
+
+    def test_dry_run_changes_nothing(self):
+        output = self.reconcile('--dry-run')
+
+        self.assertIn('Unrecorded payment ref-missed', output)
+        self.assertEqual(Payment.objects.get(reference='ref-reversed').status, 'success')
+        self.assertFalse(Payment.objects.filter(reference='ref-missed').exists())
+        self.assertEqual(Transaction.objects.get().status, Transaction.Status.PENDING)
+
+
+class EntitlementTests(PaystackTestCase):
+    def payment_queries(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            response = func()
+        return response, [q['sql'] for q in queries if 'payments_payment' in q['sql']]
+
+    def test_catalogue_and_start_use_the_cached_set(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(user=self.student, exam=self.exam, amount=5000, reference='ref-1', status='success')
+        self.assertEqual(paid_exam_ids(self.student), {self.exam.id})
+
+        response, queries = self.payment_queries(lambda: self.api.get('/api/exams/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({exam['id']: exam['has_paid'] for exam in response.data}, {self.exam.id: True})
+        self.assertEqual(queries, [])
+
+        response, queries = self.payment_queries(lambda: self.api.post(f'/api/exams/{self.exam.id}/start/'))
+        self.assertIn(response.status_code, (200, 201))
+        self.assertEqual(queries, [])
+
+    def test_free_exams_need_no_payment(self):
+        free = Exam.objects.create(title='Free practice', duration_minutes=30)
+        self.assertIn(self.api.post(f'/api/exams/{free.id}/start/').status_code, (200, 201))
+
+    def test_webhook_batch_updates_entitlements(self):
+        self.assertEqual(paid_exam_ids(self.student), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            PaystackEvent.objects.create(event='charge.success', reference='ref-1', payload={
+                "reference": "ref-1", "amount": 500000,
+                "metadata": {"exam_id": self.exam.id, "user_id": self.student.id},
+            })
+            process_events()
+        self.assertEqual(paid_exam_ids(self.student), {self.exam.id})
+
+    def test_stale_set_in_another_process_does_not_deny(self):
+        # Separate LocMem caches stand for a web process and the job worker
+        web, worker = LocMemCache('web', {}), LocMemCache('worker', {})
+        second = Exam.objects.create(title='Translation II', duration_minutes=60, price=Decimal('5000.00'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Payment.objects.create(user=self.student, exam=self.exam, amount=5000, reference='ref-1', status='success')
+
+        with mock.patch('payments.entitlements.cache', web):
+            self.assertEqual(paid_exam_ids(self.student), {self.exam.id})
+        with mock.patch('payments.entitlements.cache', worker), self.captureOnCommitCallbacks(execute=True):
+            # Invalidates the worker's cache only
+            Payment.objects.create(user=self.student, exam=second, amount=5000, reference='ref-2', status='success')
+
+        with mock.patch('payments.entitlements.cache', web):
+            self.assertTrue(can_sit(self.student, second))
+            self.assertEqual(paid_exam_ids(self.student), {self.exam.id, second.id})
+
+    def test_no_entitlement_is_cached_but_never_denies(self):
+        self.assertEqual(paid_exam_ids(self.student), frozenset())
+        response, queries = self.payment_queries(lambda: self.api.get('/api/exams/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({exam['id']: exam['has_paid'] for exam in response.data}, {self.exam.id: False})
+        self.assertEqual(queries, [])
+
+        # Starting an exam asks the database before saying no
+        response, queries = self.payment_queries(lambda: self.api.post(f'/api/exams/{self.exam.id}/start/'))
+        self.assertNotIn(response.status_code, (200, 201))
+        self.assertEqual(len(queries), 1)
+
+        # As if the payment came from a process whose invalidation this cache never sees
+        Payment.objects.bulk_create([
+            Payment(user=self.student, exam=self.exam, amount=5000, reference='ref-1', status='success')
+        ])
+        self.assertTrue(can_sit(self.student, self.exam))
+        self.assertEqual(paid_exam_ids(self.student), {self.exam.id})
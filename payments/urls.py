@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import VerifyPaystackPaymentView
+from .views import PaystackWebhookView, VerifyPaystackPaymentView
 
 urlpatterns = [
     # The actual URL will be: /api/payments/verify/
     path('verify/', VerifyPaystackPaymentView.as_view(), name='verify-payment'),
+    # Paystack dashboard -> Settings -> Webhook URL: /api/payments/webhook/
+    path('webhook/', PaystackWebhookView.as_view(), name='paystack-webhook'),
 ]
\ No newline at end of file
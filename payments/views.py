@@ -1,10 +1,15 @@
-import requests
+import json
 import logging
 from django.conf import settings
+from django.db import IntegrityError
 from django.utils import timezone
 from rest_framework import views, permissions, status
 from rest_framework.response import Response
 from .models import Payment
+from .paystack import (
+    PaystackError, PaystackTimeout, PaystackUnavailable, VerificationInProgress, verify_reference,
+)
+from .webhooks import HANDLED_EVENTS, record_event, valid_signature
 from exams.models import Exam
 
 logger = logging.getLogger(__name__)
@@ -12,68 +17,98 @@ logger = logging.getLogger(__name__)
 class VerifyPaystackPaymentView(views.APIView):
     """
     Verifies a Reference Code provided manually by the student.
+    Verifying the same reference again is safe: a receipt already recorded
+    for this student and exam answers success without asking Paystack, and
+    Paystack's answers are cached per reference (payments.paystack).
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request):
-        reference = request.data.get('reference')
+        reference = str(request.data.get('reference') or '').strip()
         exam_id = request.data.get('exam_id')
 
         if not reference or not exam_id:
             return Response({"error": "Please enter the Reference Code"}, status=400)
 
-        # 1. Check if this reference was already used
-        if Payment.objects.filter(reference=reference).exists():
-            return Response({"error": "This payment receipt has already been used."}, status=400)
+        try:
+            exam = Exam.objects.get(id=exam_id)
+        except (Exam.DoesNotExist, ValueError):
+            return Response({"error": "Exam not found."}, status=404)
+
+        # 1. Already recorded? A retry by the same student succeeds again; anyone else's receipt doesn't
+        existing = Payment.objects.filter(reference=reference).first()
+        if existing is not None:
+            return self.recorded(existing, request.user, exam)
 
         # 2. Verify with Paystack
-        # Ensure PAYSTACK_SECRET_KEY is in settings.py
-        if not hasattr(settings, 'PAYSTACK_SECRET_KEY'):
+        if not getattr(settings, 'PAYSTACK_SECRET_KEY', None):
             logger.error("PAYSTACK_SECRET_KEY missing in settings.")
             return Response({"error": "Server misconfiguration: Missing Paystack Key"}, status=500)
 
-        headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
-        url = f"https://api.paystack.co/transaction/verify/{reference}"
-        
         try:
-            # Timeout is crucial to prevent server hanging
-            resp = requests.get(url, headers=headers, timeout=20) 
-            resp_data = resp.json()
-
-            if resp_data['status'] and resp_data['data']['status'] == 'success':
-                # 3. Validation: Did they pay the correct amount?
-                try:
-                    exam = Exam.objects.get(id=exam_id)
-                except Exam.DoesNotExist:
-                    return Response({"error": "Exam not found."}, status=404)
-
-                amount_paid = resp_data['data']['amount'] / 100 # Convert kobo to naira
-                
-                # Check price (allow floating point tolerance)
-                if float(amount_paid) < float(exam.price):
-                      return Response({
-                          "error": f"Incomplete payment. Exam costs {exam.price} but you paid {amount_paid}"
-                      }, status=400)
-
-                # 4. Success! Save the record
-                Payment.objects.create(
-                    user=request.user,
-                    exam=exam,
-                    amount=amount_paid,
-                    reference=reference,
-                    status='success',
-                    verified_at=timezone.now()
-                )
-                return Response({"status": "success", "message": "Payment verified! You can now start."})
-            else:
-                return Response({"error": "Invalid or failed transaction reference."}, status=400)
-                
-        except requests.exceptions.Timeout:
+            verification = verify_reference(reference)
+        except VerificationInProgress:
+            return Response({"error": "This payment is already being verified. Please try again shortly."}, status=409)
+        except PaystackTimeout:
             return Response({"error": "Verification timed out. Paystack is slow right now."}, status=504)
-            
-        except requests.exceptions.ConnectionError:
+        except PaystackUnavailable:
             return Response({"error": "Network error. Could not connect to Paystack."}, status=503)
-
-        except Exception as e:
+        except PaystackError as e:
             logger.error(f"Payment Verification Error: {str(e)}")
-            return Response({"error": "An internal error occurred during verification."}, status=500)
\ No newline at end of file
+            return Response({"error": "An internal error occurred during verification."}, status=500)
+
+        if not verification.succeeded:
+            return Response({"error": "Invalid or failed transaction reference."}, status=400)
+
+        # 3. Validation: Did they pay the correct amount?
+        if verification.amount < exam.price:
+            return Response({
+                "error": f"Incomplete payment. Exam costs {exam.price} but you paid {verification.amount}"
+            }, status=400)
+
+        # 4. Success! Save the record (a concurrent request may have saved it first)
+        try:
+            payment, created = Payment.objects.get_or_create(
+                reference=reference,
+                defaults={
+                    'user': request.user,
+                    'exam': exam,
+                    'amount': verification.amount,
+                    'status': 'success',
+                    'verified_at': timezone.now(),
+                },
+            )
+        except IntegrityError:
+            payment, created = Payment.objects.get(reference=reference), False
+        if not created:
+            return self.recorded(payment, request.user, exam)
+        return Response({"status": "success", "message": "Payment verified! You can now start."})
+
+    def recorded(self, payment, user, exam):
+        if payment.user_id == user.id and payment.exam_id == exam.id and payment.status == 'success':
+            return Response({"status": "success", "message": "Payment verified! You can now start."})
+        return Response({"error": "This payment receipt has already been used."}, status=400)
+
+
+class PaystackWebhookView(views.APIView):
+    """
+    Receives Paystack webhook events (payments.webhooks). Only the signature
+    is checked and the event stored here; the job worker records the
+    payment, so Paystack gets its 200 quickly and doesn't redeliver.
+    """
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+
+    def post(self, request):
+        body = request.body
+        if not valid_signature(body, request.headers.get('x-paystack-signature')):
+            return Response({"error": "Invalid signature."}, status=401)
+        try:
+            event = json.loads(body)
+        except ValueError:
+            return Response({"error": "Invalid JSON."}, status=400)
+
+        data = event.get('data') or {}
+        if event.get('event') in HANDLED_EVENTS and data.get('reference'):
+            record_event(event['event'], data)
+        return Response({"status": "received"})
@@ -0,0 +1,158 @@
+"""
+Paystack webhooks.
+
+Paystack POSTs events to /api/payments/webhook/, signed with an
+HMAC-SHA512 of the raw body under the secret key (`x-paystack-signature`).
+The view only checks the signature and stores `charge.success` events;
+the `paystack_events` job turns stored events into Payment rows in
+batches, so a confirmed payment needs no call to Paystack.
+
+The payment form must put `exam_id` (and ideally `user_id`) in the
+transaction metadata; without `user_id` the student is looked up by the
+customer's email.
+"""
+import hashlib
+import hmac
+import json
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from cores.jobs import enqueue
+from cores.models import BackgroundJob
+from exams.models import Exam
+from .entitlements import invalidate
+from .models import Payment, PaystackEvent, Transaction
+
+logger = logging.getLogger(__name__)
+
+HANDLED_EVENTS = {'charge.success'}
+BATCH_SIZE = 500
+
+
+def valid_signature(body, signature):
+    if not signature:
+        return False
+    expected = hmac.new(settings.PAYSTACK_SECRET_KEY.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected.encode(), signature.strip().lower().encode())
+
+
+def record_event(event, data):
+    """Stores a webhook event (a repeated delivery is dropped) and makes sure a job will process it."""
+    PaystackEvent.objects.bulk_create(
+        [PaystackEvent(event=event, reference=data['reference'], payload=data)],
+        ignore_conflicts=True,
+    )
+    # One queued job drains every stored event; a running one may have read its batch already
+    if not BackgroundJob.objects.filter(kind='paystack_events', status=BackgroundJob.Status.PENDING).exists():
+        enqueue('paystack_events')
+
+
+def process_events(batch_size=BATCH_SIZE, on_progress=None):
+    """Applies unprocessed events in batches; returns {outcome: count}."""
+    counts = defaultdict(int)
+    while True:
+        events = list(PaystackEvent.objects.filter(processed_at__isnull=True).order_by('id')[:batch_size])
+        if not events:
+            break
+        for outcome, ids in apply_events(events).items():
+            counts[outcome] += len(ids)
+        if on_progress:
+            on_progress(dict(counts))
+    return dict(counts)
+
+
+def _metadata(data):
+    # Paystack echoes metadata back as given; some integrations send it as a JSON string
+    metadata = data.get('metadata')
+    if isinstance(metadata, str):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return {}
+    return metadata if isinstance(metadata, dict) else {}
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def apply_events(events):
+    """
+    Upserts the Payments for one batch of events with a handful of queries:
+    exams, users and existing payments are fetched for the whole batch.
+    Returns {outcome: [event ids]}; every event is marked processed.
+    """
+    User = get_user_model()
+    references = [e.reference for e in events]
+    exams = Exam.objects.in_bulk({_int_or_none(_metadata(e.payload).get('exam_id')) for e in events} - {None})
+    users = User.objects.in_bulk({_int_or_none(_metadata(e.payload).get('user_id')) for e in events} - {None})
+    emails = {((e.payload.get('customer') or {}).get('email') or '').lower() for e in events} - {''}
+    users_by_email = {
+        u.email.lower(): u
+        for u in User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails)
+    }
+    payments = Payment.objects.in_bulk(references, field_name='reference')
+
+    now = timezone.now()
+    created, updated, paid = [], [], []
+    outcomes = defaultdict(list)
+    for event in events:
+        data = event.payload
+        metadata = _metadata(data)
+        payment = payments.get(event.reference)
+        if event.event not in HANDLED_EVENTS:
+            outcomes['ignored'].append(event.id)
+            continue
+        if payment is not None and payment.status == 'success':
+            # Verified by the student already, or a replayed delivery
+            outcomes['already recorded'].append(event.id)
+            continue
+
+        exam = exams.get(_int_or_none(metadata.get('exam_id')))
+        user = users.get(_int_or_none(metadata.get('user_id'))) or users_by_email.get(
+            ((data.get('customer') or {}).get('email') or '').lower()
+        )
+        if exam is None or user is None:
+            logger.warning("Paystack event %s (%s) matches no student/exam", event.id, event.reference)
+            outcomes['unmatched'].append(event.id)
+            continue
+
+        amount = Decimal(data.get('amount') or 0) / 100
+        status = 'success' if amount >= exam.price else 'failed'
+        if payment is not None:
+            payment.status, payment.amount, payment.verified_at = status, amount, now
+            updated.append(payment)
+        else:
+            created.append(Payment(
+                user=user, exam=exam, amount=amount, reference=event.reference,
+                status=status, verified_at=now,
+            ))
+        if status == 'success':
+            paid.append(event.reference)
+            outcomes['recorded'].append(event.id)
+        else:
+            outcomes['underpaid'].append(event.id)
+
+    with transaction.atomic():
+        # ignore_conflicts: a student may verify the same reference while the batch runs
+        Payment.objects.bulk_create(created, ignore_conflicts=True)
+        Payment.objects.bulk_update(updated, ['status', 'amount', 'verified_at'])
+        if paid:
+            Transaction.objects.filter(reference__in=paid).exclude(
+                status=Transaction.Status.SUCCESS
+            ).update(status=Transaction.Status.SUCCESS)
+        for outcome, ids in outcomes.items():
+            PaystackEvent.objects.filter(id__in=ids).update(processed_at=now, outcome=outcome)
+        # Bulk writes send no post_save
+        invalidate(*(p.user_id for p in created + updated))
+    return outcomes
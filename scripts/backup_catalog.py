@@ -0,0 +1,271 @@
+"""
+Backup catalogue.
+
+`backups/catalog.json` describes every full backup and snapshot: size,
+checksums, row counts per table, the migration applied last for each app,
+who/what took it and when. Listing backups is a single read of this file,
+and restore checks a backup's migrations against the code before touching
+the backup itself.
+
+Entries are added when a backup is taken (scripts/backup_local.py,
+scripts/backup_store.py) and removed when it is deleted or pruned;
+`python manage.py rebuild_backup_catalog` recreates the file from what is
+on disk.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
+from urllib.request import pathname2url
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, writes are still atomic
+    fcntl = None
+
+CATALOG_NAME = 'catalog.json'
+BACKUP_SUFFIXES = ('.sqlite3', '.sqlite3.gz')
+
+
+def connect_readonly(path):
+    # immutable: read the file as-is, without locks or creating -wal/-shm files next to it
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?immutable=1", uri=True)
+
+
+def applied_migrations(conn):
+    """{app: last applied migration} from django_migrations ({} if the table is missing)."""
+    migrations = {}
+    try:
+        for app, name in conn.execute("SELECT app, name FROM django_migrations ORDER BY id"):
+            migrations[app] = name
+    except sqlite3.OperationalError:
+        pass
+    return migrations
+
+
+def describe_database(path):
+    """Row counts per table and the last applied migration per app of an SQLite file."""
+    conn = connect_readonly(path)
+    try:
+        tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        counts = {
+            table: conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            for table in tables
+        }
+        migrations = applied_migrations(conn)
+    finally:
+        conn.close()
+    return {"tables": counts, "migrations": migrations}
+
+
+def describe_backup_file(path):
+    """Checksums, sizes and contents of a full backup file (.sqlite3 or .sqlite3.gz)."""
+    file_digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b''):
+            file_digest.update(block)
+    if not path.endswith('.gz'):
+        return dict(describe_database(path), sha256=file_digest.hexdigest(),
+                    file_sha256=file_digest.hexdigest(), db_size=os.path.getsize(path))
+
+    fd, raw_path = tempfile.mkstemp(prefix='.describe_', suffix='.sqlite3', dir=os.path.dirname(path))
+    try:
+        digest = hashlib.sha256()
+        with gzip.open(path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            for block in iter(lambda: src.read(1024 * 1024), b''):
+                digest.update(block)
+                dst.write(block)
+        return dict(describe_database(raw_path), sha256=digest.hexdigest(),
+                    file_sha256=file_digest.hexdigest(), db_size=os.path.getsize(raw_path))
+    finally:
+        os.remove(raw_path)
+
+
+# --- Catalogue file ---
+
+def catalog_path(backup_dir):
+    return os.path.join(backup_dir, CATALOG_NAME)
+
+
+@contextmanager
+def locked(backup_dir):
+    os.makedirs(backup_dir, exist_ok=True)
+    with open(os.path.join(backup_dir, '.catalog.lock'), 'a') as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def load(backup_dir):
+    """{filename: entry}, or None when there is no catalogue yet."""
+    try:
+        with open(catalog_path(backup_dir)) as fh:
+            return json.load(fh)['backups']
+    except FileNotFoundError:
+        return None
+
+
+def save(backup_dir, entries):
+    path = catalog_path(backup_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as fh:
+        json.dump({"version": 1, "backups": entries}, fh, indent=1, sort_keys=True)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp_path, path)
+
+
+def add(backup_dir, entry):
+    with locked(backup_dir):
+        entries = load(backup_dir)
+        if entries is None:
+            # First catalogued backup: include whatever was already on disk
+            entries = scan(backup_dir, describe=False)
+        entries[entry['filename']] = entry
+        save(backup_dir, entries)
+
+
+def remove(backup_dir, *filenames):
+    with locked(backup_dir):
+        entries = load(backup_dir)
+        if entries is None:
+            return
+        for filename in filenames:
+            entries.pop(filename, None)
+        save(backup_dir, entries)
+
+
+def get(backup_dir, filename):
+    return (load(backup_dir) or {}).get(filename)
+
+
+def delete_backup(backup_dir, filename):
+    """
+    Deletes a full backup (with its checksum sidecars) or a snapshot manifest
+    and its catalogue entry; returns False if there was no such backup.
+    Only catalogued backup files are deleted: never the catalogue itself,
+    sidecars, lock or state files. Snapshot chunks are reclaimed later by
+    ChunkStore.gc().
+    """
+    from scripts.backup_store import SNAPSHOT_SUFFIX, ChunkStore
+
+    if os.path.basename(filename) != filename or filename.startswith('.'):
+        return False
+    store = ChunkStore(os.path.join(backup_dir, 'store'))
+    if filename.endswith(SNAPSHOT_SUFFIX):
+        try:
+            store.delete_snapshot(filename[:-len(SNAPSHOT_SUFFIX)])
+        except (KeyError, FileNotFoundError):
+            return False
+    else:
+        path = os.path.join(backup_dir, filename)
+        if (
+            not filename.endswith(BACKUP_SUFFIXES)
+            or filename not in entries_or_scan(backup_dir, store)
+            or not os.path.isfile(path)
+        ):
+            return False
+        os.remove(path)
+        for sidecar in (path + '.sha256', path.removesuffix('.gz') + '.sha256'):
+            if os.path.exists(sidecar):
+                os.remove(sidecar)
+    remove(backup_dir, filename)
+    return True
+
+
+def scan(backup_dir, store=None, describe=True, previous=None):
+    """
+    Catalogue entries for every backup file and snapshot on disk. Entries in
+    `previous` are reused for files of the same size; describe=False skips
+    checksums and row counts for the rest (a quick listing only).
+    """
+    from scripts.backup_store import ChunkStore, catalog_entry
+
+    store = store or ChunkStore(os.path.join(backup_dir, 'store'))
+    previous = previous or {}
+    entries = {}
+    if os.path.isdir(backup_dir):
+        for filename in sorted(os.listdir(backup_dir)):
+            # Dot-files are temporaries of a backup being written
+            if filename.startswith('.') or not filename.endswith(BACKUP_SUFFIXES):
+                continue
+            path = os.path.join(backup_dir, filename)
+            stats = os.stat(path)
+            known = previous.get(filename)
+            if known and known.get('size') == stats.st_size and (known.get('sha256') or not describe):
+                entries[filename] = known
+                continue
+            entry = {
+                "filename": filename,
+                "type": "full",
+                "size": stats.st_size,
+                "created_at": datetime.fromtimestamp(stats.st_mtime).isoformat(),
+                "source": "unknown",
+            }
+            if describe:
+                entry.update(describe_backup_file(path))
+            entries[filename] = entry
+
+    for manifest in store.manifests():
+        entry = catalog_entry(manifest)
+        if describe and 'tables' not in manifest:
+            # Taken before the catalogue existed: reassemble once to count rows
+            fd, raw_path = tempfile.mkstemp(prefix='.describe_', suffix='.sqlite3', dir=store.root)
+            os.close(fd)
+            try:
+                store.write_snapshot(manifest['name'], raw_path)
+                entry.update(describe_database(raw_path))
+            finally:
+                os.remove(raw_path)
+        entries[entry['filename']] = entry
+    return entries
+
+
+def rebuild(backup_dir, store, describe=True, reuse=True):
+    with locked(backup_dir):
+        entries = scan(backup_dir, store, describe=describe, previous=load(backup_dir) if reuse else None)
+        save(backup_dir, entries)
+    return entries
+
+
+def entries_or_scan(backup_dir, store):
+    """The catalogue; the first call without one writes a quick one from a directory scan."""
+    entries = load(backup_dir)
+    if entries is None:
+        entries = rebuild(backup_dir, store, describe=False)
+    return entries
+
+
+# --- Compatibility with the code ---
+
+@lru_cache(maxsize=1)
+def migration_graph():
+    from django.db.migrations.loader import MigrationLoader
+
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    return frozenset(loader.graph.nodes), frozenset(loader.graph.leaf_nodes())
+
+
+def compatibility(migrations):
+    """
+    'current' when the backup is at the code's latest migrations, 'older'
+    when it predates some (restore, then migrate), 'newer' when it was made
+    by code this checkout doesn't have (restoring it would break), or
+    'unknown' when nothing is recorded.
+    """
+    if not migrations:
+        return 'unknown'
+    nodes, leaves = migration_graph()
+    if any((app, name) not in nodes for app, name in migrations.items()):
+        return 'newer'
+    heads = set(migrations.items())
+    if all(leaf in heads for leaf in leaves):
+        return 'current'
+    return 'older'
@@ -1,33 +1,194 @@
+"""
+Takes a consistent snapshot of the live SQLite database.
+
+The copy goes through SQLite's online backup API, so the result is never a
+torn file: in WAL mode as one read snapshot (which doesn't block writers),
+otherwise in steps of BACKUP_STEP_PAGES pages so writers are only held off
+for one step at a time instead of the whole copy. The snapshot is checked
+with `PRAGMA integrity_check`, gzip-compressed while it is hashed, and the
+compressed file is read back and compared against that hash before it is
+published as
+
+    backups/manual_backup_<timestamp>.sqlite3.gz
+    backups/manual_backup_<timestamp>.sqlite3.sha256     (the decompressed database)
+    backups/manual_backup_<timestamp>.sqlite3.gz.sha256  (the file as served for download)
+
+Both checksum files are in `sha256sum` format.
+"""
+import gzip
+import hashlib
 import os
-import shutil
+import sqlite3
+import tempfile
 from datetime import datetime
+
 import django
 
+from scripts import backup_catalog
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class BackupError(Exception):
+    pass
+
+
+def sha256_file(fh):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def open_backup(path):
+    """Opens a backup for reading its database bytes, compressed or not."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _paged_copy(source, target, pages, sleep, max_restarts):
+    """
+    Copies in steps of `pages`. Between steps the source is unlocked; if
+    another connection writes meanwhile SQLite restarts the copy from page 1.
+    Returns False when that happened more than max_restarts times.
+    """
+    state = {"remaining": None, "restarts": 0}
+
+    def progress(status, remaining, total):
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > max_restarts:
+                raise _Restarted()
+        state["remaining"] = remaining
+
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+    except _Restarted:
+        return False
+    return True
+
+
+def snapshot(db_path, dest_path, pages=1024, sleep=0.005, max_restarts=3):
+    """Online backup of db_path into dest_path; raises BackupError if the copy is damaged."""
+    source = sqlite3.connect(db_path, timeout=30)
+    target = sqlite3.connect(dest_path)
+    try:
+        wal = source.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        # In WAL mode a reader never blocks writers, so one step holding a
+        # read snapshot is both consistent and non-blocking. With a rollback
+        # journal, paged steps let writers in between; if they keep forcing
+        # restarts, finish in one step (writers wait on their busy timeout).
+        if wal or not _paged_copy(source, target, pages, sleep, max_restarts):
+            source.backup(target)
+        result = target.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    if result != 'ok':
+        raise BackupError(f"Snapshot failed integrity check: {result}")
+
+
+def compress(raw_path, gz_path, level=6):
+    """Gzips raw_path into gz_path and returns the sha256 of the raw bytes."""
+    digest = hashlib.sha256()
+    with open(raw_path, 'rb') as src, open(gz_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=level, mtime=0) as gz:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                gz.write(chunk)
+        raw.flush()
+        os.fsync(raw.fileno())
+    return digest.hexdigest()
+
+
+def write_backup(db_path, backup_dir, name, pages=1024, sleep=0.005, level=6):
+    """
+    Snapshots db_path into backup_dir/<name>.sqlite3.gz plus its checksum
+    files and returns its catalogue entry. Nothing is published unless the
+    compressed file reads back to the same hash.
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    dest_path = os.path.join(backup_dir, f"{name}.sqlite3.gz")
+    fd, raw_path = tempfile.mkstemp(prefix='.snapshot_', suffix='.sqlite3', dir=backup_dir)
+    os.close(fd)
+    part_path = dest_path + '.part'
+    try:
+        snapshot(db_path, raw_path, pages=pages, sleep=sleep)
+        description = backup_catalog.describe_database(raw_path)
+        db_size = os.path.getsize(raw_path)
+        checksum = compress(raw_path, part_path, level=level)
+        with gzip.open(part_path, 'rb') as fh:
+            if sha256_file(fh) != checksum:
+                raise BackupError("Compressed backup does not match the snapshot")
+        with open(part_path, 'rb') as fh:
+            file_checksum = sha256_file(fh)
+        os.replace(part_path, dest_path)
+        with open(os.path.join(backup_dir, f"{name}.sqlite3.sha256"), 'w') as fh:
+            fh.write(f"{checksum}  {name}.sqlite3\n")
+        with open(dest_path + '.sha256', 'w') as fh:
+            fh.write(f"{file_checksum}  {name}.sqlite3.gz\n")
+    finally:
+        for path in (raw_path, part_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return {
+        "filename": os.path.basename(dest_path),
+        "type": "full",
+        "size": os.path.getsize(dest_path),
+        "db_size": db_size,
+        "sha256": checksum,
+        "file_sha256": file_checksum,
+        **description,
+    }
+
+
+def database_path():
+    """Path of the SQLite database to back up; BackupError saying why there is none."""
+    from django.conf import settings
+
+    database = settings.DATABASES['default']
+    if database['ENGINE'] != 'django.db.backends.sqlite3':
+        raise BackupError("Local backups are only supported for SQLite databases")
+    db_path = str(database['NAME'])
+    if not os.path.exists(db_path):
+        raise BackupError(f"Database not found at {db_path}")
+    return db_path
+
+
 # This allows the script to be run standalone or via Django views
-def run_backup():
+def run_backup(prefix='manual_backup', source='manual'):
     # Set up Django environment if not already loaded
     if not os.environ.get('DJANGO_SETTINGS_MODULE'):
         os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ciltra_platform.settings')
         django.setup()
 
     from django.conf import settings
-    
-    # Dynamic paths based on the project root
-    db_path = os.path.join(settings.BASE_DIR, 'db.sqlite3')
-    backup_dir = os.path.join(settings.BASE_DIR, 'backups')
-
-    if not os.path.exists(backup_dir):
-        os.makedirs(backup_dir)
-        
+
+    try:
+        db_path = database_path()
+    except BackupError as e:
+        print(f"❌ Error: {e}")
+        return None
+    backup_dir = getattr(settings, 'BACKUP_DIR', os.path.join(settings.BASE_DIR, 'backups'))
+
     timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
-    backup_name = f"manual_backup_{timestamp}.sqlite3"
-    dest_path = os.path.join(backup_dir, backup_name)
-    
-    if os.path.exists(db_path):
-        shutil.copy2(db_path, dest_path)
-        print(f"✅ Backup created successfully at {dest_path}")
-    else:
-        print(f"❌ Error: Database not found at {db_path}")
+    entry = write_backup(
+        db_path, backup_dir, f"{prefix}_{timestamp}",
+        pages=getattr(settings, 'BACKUP_STEP_PAGES', 1024),
+        sleep=getattr(settings, 'BACKUP_STEP_SLEEP', 0.005),
+        level=getattr(settings, 'BACKUP_COMPRESSLEVEL', 6),
+    )
+    entry.update(created_at=datetime.now().isoformat(), source=source)
+    backup_catalog.add(backup_dir, entry)
+    dest_path = os.path.join(backup_dir, entry['filename'])
+    print(f"✅ Backup created successfully at {dest_path} (sha256 {entry['sha256']})")
+    return dest_path
+
 
 if __name__ == "__main__":
-    run_backup()
\ No newline at end of file
+    run_backup()
@@ -0,0 +1,261 @@
+"""
+Content-addressed, deduplicated snapshot store.
+
+A snapshot is taken with the online backup API (see backup_local.snapshot),
+split into fixed-size chunks and each chunk is stored once, named by the
+sha256 of its bytes. Consecutive snapshots of a database that changed a
+little share almost all of their chunks, so frequent snapshots cost only
+the chunks that changed:
+
+    backups/store/chunks/ab/ab12...ef      zlib-compressed chunk
+    backups/store/snapshots/<name>.snapshot  JSON manifest: ordered chunk list + sha256
+
+Snapshots are reassembled on the fly for download and restore, and every
+chunk is verified against its name while it is read. Deleting a snapshot
+only removes its manifest; `python manage.py prune_backups` applies the
+retention policy and garbage-collects chunks no manifest refers to.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+import zlib
+from datetime import datetime
+
+import django
+
+from scripts import backup_catalog
+from scripts.backup_local import BackupError, database_path, snapshot
+
+SNAPSHOT_SUFFIX = '.snapshot'
+# Chunks touched this recently are never collected: a snapshot being taken
+# right now may rely on them before its manifest exists
+GC_GRACE_SECONDS = 60 * 60
+
+
+def write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ChunkStore:
+    def __init__(self, root, chunk_size=256 * 1024, level=6):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.level = level
+        self.chunk_dir = os.path.join(root, 'chunks')
+        self.snapshot_dir = os.path.join(root, 'snapshots')
+
+    # --- Chunks ---
+
+    def chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def put_chunk(self, data):
+        """Stores data unless an identical chunk exists; returns (digest, bytes written)."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if os.path.exists(path):
+            # Refresh mtime so a concurrent GC treats it as in use
+            os.utime(path)
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(data, self.level)
+        write_atomic(path, compressed)
+        return digest, len(compressed)
+
+    def get_chunk(self, digest):
+        try:
+            with open(self.chunk_path(digest), 'rb') as fh:
+                data = zlib.decompress(fh.read())
+        except (OSError, zlib.error) as exc:
+            raise BackupError(f"Chunk {digest} is missing or unreadable: {exc}")
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise BackupError(f"Chunk {digest} is corrupt")
+        return data
+
+    # --- Snapshots ---
+
+    def manifest_path(self, name):
+        if not name or os.path.basename(name) != name:
+            raise KeyError(name)
+        return os.path.join(self.snapshot_dir, name + SNAPSHOT_SUFFIX)
+
+    def create_snapshot(self, db_path, name, pages=1024, sleep=0.005, source='manual'):
+        """Snapshots db_path into the store and returns its manifest."""
+        if os.path.exists(self.manifest_path(name)):
+            raise BackupError(f"Snapshot {name} already exists")
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        fd, raw_path = tempfile.mkstemp(prefix='.snapshot_', suffix='.sqlite3', dir=self.root)
+        os.close(fd)
+        try:
+            snapshot(db_path, raw_path, pages=pages, sleep=sleep)
+            description = backup_catalog.describe_database(raw_path)
+            digest = hashlib.sha256()
+            chunks, new_chunks, stored = [], 0, 0
+            with open(raw_path, 'rb') as fh:
+                for data in iter(lambda: fh.read(self.chunk_size), b''):
+                    digest.update(data)
+                    chunk, written = self.put_chunk(data)
+                    chunks.append(chunk)
+                    if written:
+                        new_chunks += 1
+                        stored += written
+            size = os.path.getsize(raw_path)
+        finally:
+            os.remove(raw_path)
+
+        manifest = {
+            "name": name,
+            "created_at": datetime.now().isoformat(),
+            "source": source,
+            "size": size,
+            "sha256": digest.hexdigest(),
+            "chunk_size": self.chunk_size,
+            "chunks": chunks,
+            "new_chunks": new_chunks,
+            "stored_bytes": stored,
+            **description,
+        }
+        write_atomic(self.manifest_path(name), json.dumps(manifest).encode('utf-8'))
+        return manifest
+
+    def manifest(self, name):
+        try:
+            with open(self.manifest_path(name), 'rb') as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            raise KeyError(name)
+
+    def manifests(self):
+        """All snapshot manifests, newest first."""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        found = []
+        for entry in os.listdir(self.snapshot_dir):
+            if entry.endswith(SNAPSHOT_SUFFIX):
+                try:
+                    found.append(self.manifest(entry[:-len(SNAPSHOT_SUFFIX)]))
+                except (KeyError, ValueError):
+                    continue
+        found.sort(key=lambda m: m['created_at'], reverse=True)
+        return found
+
+    def iter_snapshot(self, name):
+        """Yields the snapshot's database bytes chunk by chunk, verifying each one."""
+        manifest = self.manifest(name)
+        for digest in manifest['chunks']:
+            yield self.get_chunk(digest)
+
+    def write_snapshot(self, name, dest_path):
+        """Reassembles a snapshot into dest_path and checks the whole-file sha256."""
+        manifest = self.manifest(name)
+        digest = hashlib.sha256()
+        with open(dest_path, 'wb') as fh:
+            for data in self.iter_snapshot(name):
+                digest.update(data)
+                fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        if digest.hexdigest() != manifest['sha256']:
+            raise BackupError(f"Snapshot {name} does not match its checksum")
+        return manifest
+
+    def delete_snapshot(self, name):
+        os.remove(self.manifest_path(name))
+
+    # --- Garbage collection ---
+
+    def referenced_chunks(self):
+        return {digest for manifest in self.manifests() for digest in manifest['chunks']}
+
+    def gc(self, grace=GC_GRACE_SECONDS, dry_run=False):
+        """Removes chunks no manifest refers to; returns (chunks removed, bytes freed)."""
+        if not os.path.isdir(self.chunk_dir):
+            return 0, 0
+        live = self.referenced_chunks()
+        cutoff = time.time() - grace
+        removed = freed = 0
+        for prefix in os.listdir(self.chunk_dir):
+            directory = os.path.join(self.chunk_dir, prefix)
+            for entry in os.listdir(directory):
+                path = os.path.join(directory, entry)
+                if entry in live:
+                    continue
+                # Anything else old enough goes, including temp files left
+                # behind by an interrupted write
+                stats = os.stat(path)
+                if stats.st_mtime > cutoff:
+                    continue
+                removed += 1
+                freed += stats.st_size
+                if not dry_run:
+                    os.remove(path)
+        return removed, freed
+
+    def stored_bytes(self):
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
+        return total
+
+
+def catalog_entry(manifest):
+    entry = {key: value for key, value in manifest.items() if key not in ('name', 'chunks', 'chunk_size')}
+    entry.update(filename=manifest['name'] + SNAPSHOT_SUFFIX, type='snapshot')
+    return entry
+
+
+def default_store():
+    from django.conf import settings
+
+    backup_dir = getattr(settings, 'BACKUP_DIR', os.path.join(settings.BASE_DIR, 'backups'))
+    return ChunkStore(
+        os.path.join(backup_dir, 'store'),
+        chunk_size=getattr(settings, 'BACKUP_CHUNK_SIZE', 256 * 1024),
+        level=getattr(settings, 'BACKUP_COMPRESSLEVEL', 6),
+    )
+
+
+def run_snapshot(prefix='snapshot', source='manual'):
+    """Takes an incremental snapshot of the SQLite database; returns its manifest or None."""
+    if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ciltra_platform.settings')
+        django.setup()
+
+    from django.conf import settings
+
+    try:
+        db_path = database_path()
+    except BackupError as e:
+        print(f"❌ Error: {e}")
+        return None
+
+    store = default_store()
+    os.makedirs(store.root, exist_ok=True)
+    # Microseconds: snapshots taken within the same second must not share a manifest
+    name = f"{prefix}_{datetime.now().strftime('%Y-%m-%d_%H%M%S_%f')}"
+    manifest = store.create_snapshot(
+        db_path, name,
+        pages=getattr(settings, 'BACKUP_STEP_PAGES', 1024),
+        sleep=getattr(settings, 'BACKUP_STEP_SLEEP', 0.005),
+        source=source,
+    )
+    backup_catalog.add(os.path.dirname(store.root), catalog_entry(manifest))
+    print(f"✅ Snapshot {name}: {manifest['new_chunks']}/{len(manifest['chunks'])} new chunks, "
+          f"{manifest['stored_bytes']} bytes stored")
+    return manifest
+
+
+if __name__ == "__main__":
+    run_snapshot()
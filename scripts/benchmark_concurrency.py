@@ -0,0 +1,134 @@
+"""
+Measures exam submissions per second with concurrent writers under each
+DB_MODE (see ciltra_platform/settings.py).
+
+For every mode a fresh database is migrated and seeded with one exam and
+one open session per submit; worker processes then submit those sessions
+in parallel (one transaction each: bulk insert of the answers plus the
+session update) and the script reports throughput, latency and lock
+errors. SQLite modes use a throwaway file; `postgres` uses the database
+from the POSTGRES_* environment variables, which should be a scratch one.
+
+    python scripts/benchmark_concurrency.py --modes sqlite sqlite-wal --workers 8 --submits 2000
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTIONS = 20
+
+
+def bootstrap(mode, db_path):
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ['DJANGO_SETTINGS_MODULE'] = 'ciltra_platform.settings'
+    os.environ['DB_MODE'] = mode
+    if db_path:
+        os.environ['SQLITE_PATH'] = db_path
+    os.environ['AUDIT_LOG_ASYNC'] = 'false'
+    import django
+    django.setup()
+
+
+def prepare(mode, db_path, submits):
+    """Migrates and seeds; returns the ids of the open sessions."""
+    bootstrap(mode, db_path)
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from exams.models import Exam, Question
+    from assessments.models import ExamSession
+
+    call_command('migrate', verbosity=0)
+    User = get_user_model()
+    exam = Exam.objects.create(title='Concurrency benchmark', duration_minutes=60)
+    Question.objects.bulk_create([Question(exam=exam, text=f"Q{i}", points=1) for i in range(QUESTIONS)])
+    users = User.objects.bulk_create([
+        User(email=f"bench{i}@example.com", username=f"bench{i}@example.com", password='!', role=User.Role.CANDIDATE)
+        for i in range(submits)
+    ])
+    sessions = ExamSession.objects.bulk_create([ExamSession(user=u, exam=exam) for u in users])
+    return exam.id, [s.id for s in sessions]
+
+
+def submit_worker(args):
+    exam_id, session_ids = args
+    from django.db import OperationalError, transaction
+    from django.utils import timezone
+    from exams.models import Question
+    from assessments.models import ExamSession, StudentAnswer
+
+    question_ids = list(Question.objects.filter(exam_id=exam_id).values_list('id', flat=True))
+    latencies, errors = [], 0
+    for session_id in session_ids:
+        started = time.perf_counter()
+        try:
+            with transaction.atomic():
+                StudentAnswer.objects.bulk_create([
+                    StudentAnswer(session_id=session_id, question_id=qid, text_answer='answer', awarded_marks=1)
+                    for qid in question_ids
+                ])
+                ExamSession.objects.filter(id=session_id).update(
+                    end_time=timezone.now(), score=100, is_graded=True, passed=True
+                )
+        except OperationalError:
+            errors += 1
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, errors
+
+
+def run_mode(mode, workers, submits):
+    tmp_dir = None
+    db_path = None
+    if mode.startswith('sqlite'):
+        tmp_dir = tempfile.mkdtemp(prefix='ciltra_concurrency_')
+        db_path = os.path.join(tmp_dir, 'bench.sqlite3')
+
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(1) as pool:
+        exam_id, session_ids = pool.apply(prepare, (mode, db_path, submits))
+
+    chunks = [(exam_id, session_ids[i::workers]) for i in range(workers)]
+    with ctx.Pool(workers, initializer=bootstrap, initargs=(mode, db_path)) as pool:
+        # Let every worker finish importing Django before the clock starts
+        pool.map(time.sleep, [0.5] * workers, chunksize=1)
+        started = time.perf_counter()
+        results = pool.map(submit_worker, chunks)
+        elapsed = time.perf_counter() - started
+
+    if tmp_dir:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    latencies = [ms for worker_latencies, _ in results for ms in worker_latencies]
+    errors = sum(e for _, e in results)
+    return {
+        "mode": mode,
+        "ok": len(latencies),
+        "errors": errors,
+        "per_sec": len(latencies) / elapsed if elapsed else 0,
+        "p50": statistics.median(latencies) if latencies else 0,
+        "p95": statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=['sqlite', 'sqlite-wal'],
+                        choices=['sqlite', 'sqlite-wal', 'postgres'])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--submits', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {args.submits} submits of {QUESTIONS} answers each\n")
+    print(f"{'mode':<12} {'ok':>6} {'errors':>7} {'submits/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for mode in args.modes:
+        r = run_mode(mode, args.workers, args.submits)
+        print(f"{r['mode']:<12} {r['ok']:>6} {r['errors']:>7} {r['per_sec']:>10.1f} {r['p50']:>8.2f} {r['p95']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
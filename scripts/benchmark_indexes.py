@@ -0,0 +1,170 @@
+"""
+Benchmarks the hot ExamSession / Payment / Certificate lookups with and
+without the indexes added in assessments 0004, payments 0003 and
+certificates 0004.
+
+A throwaway SQLite database is migrated, seeded with a large synthetic
+dataset, and every query is timed and EXPLAINed first with those index
+migrations unapplied, then with them applied. The project database is
+never touched.
+
+    python scripts/benchmark_indexes.py --sessions 200000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import django
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Index migrations under test: app -> migration to roll back to for the "before" run
+BASELINE = {
+    'assessments': '0003_examsession_seed',
+    'payments': '0002_payment',
+    'certificates': '0003_certificate_is_revoked_certificate_revocation_reason_and_more',
+}
+
+
+def setup(db_path):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ciltra_platform.settings')
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_path
+    django.setup()
+
+
+def seed(users, exams, sessions, rng):
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    from exams.models import Exam
+    from assessments.models import ExamSession
+    from payments.models import Payment
+    from certificates.models import Certificate
+
+    User = get_user_model()
+    now = timezone.now()
+    User.objects.bulk_create([
+        User(email=f"student{i}@example.com", username=f"student{i}@example.com",
+             password='!', role=User.Role.CANDIDATE, first_name='S', last_name=str(i))
+        for i in range(users)
+    ], batch_size=5000)
+    user_ids = list(User.objects.values_list('id', flat=True))
+    Exam.objects.bulk_create([Exam(title=f"Exam {i}", duration_minutes=60) for i in range(exams)])
+    exam_ids = list(Exam.objects.values_list('id', flat=True))
+
+    batch = []
+    for i in range(sessions):
+        finished = rng.random() < 0.95
+        batch.append(ExamSession(
+            user_id=rng.choice(user_ids), exam_id=rng.choice(exam_ids),
+            end_time=now - timezone.timedelta(minutes=i) if finished else None,
+            # ~1% of submitted sessions are waiting for a grader
+            is_graded=finished and rng.random() > 0.01,
+            score=rng.randint(0, 100),
+        ))
+        if len(batch) == 5000:
+            ExamSession.objects.bulk_create(batch)
+            batch = []
+    ExamSession.objects.bulk_create(batch)
+
+    Payment.objects.bulk_create([
+        Payment(user_id=rng.choice(user_ids), exam_id=rng.choice(exam_ids), amount=100,
+                reference=f"REF-{i}", status=rng.choice(['success', 'success', 'failed', 'pending']))
+        for i in range(sessions // 2)
+    ], batch_size=5000)
+
+    session_ids = list(ExamSession.objects.filter(is_graded=True).values_list('id', flat=True)[:sessions // 4])
+    Certificate.objects.bulk_create([
+        Certificate(session_id=sid, certificate_code=f"CERT-{i:08X}") for i, sid in enumerate(session_ids)
+    ], batch_size=5000)
+    return user_ids, exam_ids, len(session_ids)
+
+
+def hot_queries(user_ids, exam_ids, certificates, rng):
+    from django.db.models.functions import Upper
+    from assessments.models import ExamSession
+    from payments.models import Payment
+    from certificates.models import Certificate
+
+    user, exam = rng.choice(user_ids), rng.choice(exam_ids)
+    code = f"cert-{rng.randrange(certificates):08x}"
+    # name -> (queryset, how the views evaluate it)
+    return {
+        'pending_grading': (ExamSession.objects.filter(end_time__isnull=False, is_graded=False), 'count'),
+        'graded_history': (ExamSession.objects.filter(is_graded=True).order_by('-end_time')[:50], 'list'),
+        'active_session': (ExamSession.objects.filter(user=user, exam=exam, end_time__isnull=True), 'list'),
+        'has_paid': (Payment.objects.filter(user=user, exam=exam, status='success'), 'exists'),
+        'verify_certificate': (Certificate.objects.alias(code_upper=Upper('certificate_code')).filter(
+            code_upper=code.upper()
+        ), 'list'),
+    }
+
+
+def measure(queries, repeat):
+    results = {}
+    for name, (queryset, mode) in queries.items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            if mode == 'count':
+                queryset.count()
+            elif mode == 'exists':
+                queryset.exists()
+            else:
+                list(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = (statistics.median(timings), queryset.explain())
+    return results
+
+
+def analyze():
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--exams', type=int, default=50)
+    parser.add_argument('--sessions', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='ciltra_bench_'), 'bench.sqlite3')
+    setup(db_path)
+    from django.core.management import call_command
+
+    print(f"Migrating {db_path}...")
+    call_command('migrate', verbosity=0)
+    for app, migration in BASELINE.items():
+        call_command('migrate', app, migration, verbosity=0)
+
+    rng = random.Random(7)
+    started = time.perf_counter()
+    user_ids, exam_ids, certificates = seed(args.users, args.exams, args.sessions, rng)
+    print(f"Seeded {args.sessions} sessions in {time.perf_counter() - started:.1f}s")
+
+    analyze()
+    queries = hot_queries(user_ids, exam_ids, certificates, random.Random(11))
+    before = measure(queries, args.repeat)
+
+    call_command('migrate', verbosity=0)
+    analyze()
+    after = measure(queries, args.repeat)
+
+    print(f"\n{'query':<20} {'before ms':>10} {'after ms':>10} {'speedup':>8}")
+    for name in queries:
+        b, a = before[name][0], after[name][0]
+        print(f"{name:<20} {b:>10.3f} {a:>10.3f} {b / a if a else 0:>7.1f}x")
+    for name in queries:
+        print(f"\n== {name}\n-- before\n{before[name][1]}\n-- after\n{after[name][1]}")
+    os.remove(db_path)
+
+
+if __name__ == '__main__':
+    main()
@@ -9,8 +9,8 @@ from django.contrib.auth import get_user_model
 from exams.models import Exam
 from assessments.models import ExamSession
 from certificates.models import Certificate
-# --- FIX: Ensure AuditLog is imported ---
-from cores.models import AuditLog 
+# --- Audit trail (batched, see cores.audit) ---
+from cores.audit import record as record_audit
 
 from .serializers import (
     RegisterSerializer, 
@@ -55,8 +55,8 @@ class UserViewSet(viewsets.ModelViewSet):
         user.is_active = True
         user.save()
 
-        AuditLog.objects.create(
-            actor=request.user,
+        record_audit(
+            request,
             action='RESTORE',
             target_model='User',
             target_object_id=str(user.id),
@@ -80,8 +80,8 @@ class UserViewSet(viewsets.ModelViewSet):
         
         action_type = "ACTIVATE" if user.is_active else "SUSPEND"
         
-        AuditLog.objects.create(
-            actor=request.user,
+        record_audit(
+            request,
             action=action_type,
             target_model='User',
             target_object_id=str(user.id),
@@ -103,8 +103,8 @@ class UserViewSet(viewsets.ModelViewSet):
         user = serializer.save()
         
         # --- AUDIT LOG: CREATE ---
-        AuditLog.objects.create(
-            actor=self.request.user,
+        record_audit(
+            self.request,
             action='CREATE',
             target_model='User',
             target_object_id=str(user.id),
@@ -119,8 +119,8 @@ class UserViewSet(viewsets.ModelViewSet):
             user.save()
 
         # --- AUDIT LOG: UPDATE ---
-        AuditLog.objects.create(
-            actor=self.request.user,
+        record_audit(
+            self.request,
             action='UPDATE',
             target_model='User',
             target_object_id=str(user.id),
@@ -136,8 +136,8 @@ class UserViewSet(viewsets.ModelViewSet):
         instance.save()
 
         # --- AUDIT LOG: DELETE ---
-        AuditLog.objects.create(
-            actor=self.request.user,
+        record_audit(
+            self.request,
             action='DELETE',
             target_model='User',
             target_object_id=str(instance.id),